@@ -1,24 +1,44 @@
 """Xiaomi Vacuum 1C – modern integration with config_flow."""
 
 import logging
+import os
+from datetime import timedelta
 
 from homeassistant.config_entries import ConfigEntry
-from homeassistant.core import HomeAssistant
+from homeassistant.core import HomeAssistant, callback
+from homeassistant.helpers.event import async_track_time_interval
+from homeassistant.helpers.storage import STORAGE_DIR
 
 from .const import (
     DOMAIN,
     PLATFORMS,
     DATA_CLIENT,
     DATA_COORDINATOR,
+    DATA_PROBER,
+    DATA_DISCOVERY,
+    DATA_MAP_TRACKER,
+    DATA_HISTORY,
+    DATA_SNAPSHOT,
+    HISTORY_FLUSH_INTERVAL,
 )
 from .miio import DreameVacuum
 from .coordinator import async_create_coordinator
+from .discovery import FleetDiscovery
+from .exporter import MetricsView
+from .history import DeviceHistory
+from .snapshot import SnapshotStore
+from .liveness import LivenessProber
+from .map_tracker import MapTracker
 
 _LOGGER = logging.getLogger(__name__)
 
 
 async def async_setup(hass: HomeAssistant, config: dict) -> bool:
-    """YAML setup is no longer used."""
+    """YAML setup is no longer used; serve the OpenMetrics endpoint and
+    discover the configured vacuums with a single broadcast."""
+    hass.http.register_view(MetricsView(hass))
+    discovery = hass.data[DATA_DISCOVERY] = FleetDiscovery(hass)
+    discovery.async_start()
     return True
 
 
@@ -31,20 +51,98 @@ async def async_setup_entry(hass: HomeAssistant, entry: ConfigEntry) -> bool:
 
     _LOGGER.info("Setting up Xiaomi Vacuum 1C at %s (name: %s)", host, name)
 
+    found = None
+    discovery = hass.data.get(DATA_DISCOVERY)
+    if discovery is not None:
+        found = await discovery.async_lookup(entry.data.get("device_id"), host)
+    if found is not None and found.ip != host:
+        _LOGGER.info("Vacuum %s moved from %s to %s", name, host, found.ip)
+        host = found.ip
+        hass.config_entries.async_update_entry(entry, data={**entry.data, "host": host})
+
     client = DreameVacuum(host, token)
+    if found is not None:
+        client.prime_handshake(found)
+    if entry.options.get("enable_metrics", False):
+        client.enable_metrics()
+    # Keep (redacted) payloads in the packet trace
+    client.trace.payloads = entry.options.get("debug_mode", False)
 
     # Recupero info reali dal robot (miIO.info)
     try:
-        info = client.info()
+        info = await hass.async_add_executor_job(client.info)
     except Exception as e:
         _LOGGER.warning("Unable to read device info: %s", e)
         info = None
 
-    coordinator = await async_create_coordinator(hass, client, entry)
+    # Remember the device id to recognise the vacuum in later discoveries
+    if client.device_id is not None and entry.data.get("device_id") != client.device_id:
+        hass.config_entries.async_update_entry(
+            entry, data={**entry.data, "device_id": client.device_id}
+        )
+
+    # The integration works without its history, e.g. on a read-only disk
+    try:
+        history = await hass.async_add_executor_job(
+            DeviceHistory,
+            hass.config.path(STORAGE_DIR, f"{DOMAIN}_history_{entry.entry_id}.bin"),
+        )
+    except OSError as err:
+        _LOGGER.warning("Unable to open the poll history of %s: %s", name, err)
+        history = None
+
+    prober = LivenessProber(hass, host)
+    await prober.async_start()
+
+    @callback
+    def _async_address_changed(new_host: str) -> None:
+        """Follow the vacuum to the address it was rediscovered at."""
+        _LOGGER.info("Vacuum %s moved from %s to %s", name, entry.data.get("host"), new_host)
+        prober.async_set_host(new_host)
+        hass.config_entries.async_update_entry(
+            entry, data={**entry.data, "host": new_host}
+        )
+
+    client.on_address_change = lambda new_host: hass.add_job(
+        _async_address_changed, new_host
+    )
+
+    snapshots = SnapshotStore(
+        hass, hass.config.path(STORAGE_DIR, f"{DOMAIN}_status_{entry.entry_id}.bin")
+    )
+
+    try:
+        coordinator = await async_create_coordinator(
+            hass, client, entry, prober, history, snapshots
+        )
+    except Exception:
+        await prober.async_stop()
+        if history is not None:
+            await hass.async_add_executor_job(history.close)
+        raise
+
+    if history is not None:
+
+        async def _async_flush_history(_now) -> None:
+            await hass.async_add_executor_job(history.flush)
+
+        entry.async_on_unload(
+            async_track_time_interval(
+                hass, _async_flush_history, timedelta(seconds=HISTORY_FLUSH_INTERVAL)
+            )
+        )
+
+    # Shared by the map camera and the zone cleaning service
+    tracker = MapTracker(hass, client, coordinator)
+    entry.async_on_unload(tracker.async_start())
 
     hass.data[DOMAIN][entry.entry_id] = {
         DATA_CLIENT: client,
         DATA_COORDINATOR: coordinator,
+        DATA_PROBER: prober,
+        DATA_MAP_TRACKER: tracker,
+        DATA_HISTORY: history,
+        DATA_SNAPSHOT: snapshots,
         "device_info_raw": info,   # <── SALVATO QUI
     }
 
@@ -57,11 +155,31 @@ async def async_unload_entry(hass: HomeAssistant, entry: ConfigEntry) -> bool:
     unload_ok = await hass.config_entries.async_unload_platforms(entry, PLATFORMS)
 
     if unload_ok:
-        hass.data[DOMAIN].pop(entry.entry_id, None)
+        data = hass.data[DOMAIN].pop(entry.entry_id, None)
+        if data and data.get(DATA_PROBER):
+            await data[DATA_PROBER].async_stop()
+        if data and data.get(DATA_HISTORY):
+            await hass.async_add_executor_job(data[DATA_HISTORY].close)
+        if data and data.get(DATA_SNAPSHOT):
+            await data[DATA_SNAPSHOT].async_flush()
 
     return unload_ok
 
 
+async def async_remove_entry(hass: HomeAssistant, entry: ConfigEntry) -> None:
+    """Delete the poll history and status snapshot of a removed entry."""
+    for kind in ("history", "status"):
+        path = hass.config.path(STORAGE_DIR, f"{DOMAIN}_{kind}_{entry.entry_id}.bin")
+        await hass.async_add_executor_job(_remove_file, path)
+
+
+def _remove_file(path: str) -> None:
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+
+
 async def async_reload_entry(hass: HomeAssistant, entry: ConfigEntry) -> None:
     """Reload when entry is updated."""
     await async_unload_entry(hass, entry)
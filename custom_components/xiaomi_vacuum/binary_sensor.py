@@ -7,27 +7,34 @@ from homeassistant.components.binary_sensor import (
 from homeassistant.helpers.update_coordinator import CoordinatorEntity
 from homeassistant.helpers.entity import DeviceInfo
 
-from .const import DOMAIN, DATA_COORDINATOR
+from .const import DOMAIN, DATA_CLIENT, DATA_COORDINATOR, DATA_PROBER
 
 
 async def async_setup_entry(hass, entry, async_add_entities):
     """Set up diagnostic binary sensors."""
     data = hass.data[DOMAIN][entry.entry_id]
     coordinator = data[DATA_COORDINATOR]
+    client = data[DATA_CLIENT]
+    prober = data.get(DATA_PROBER)
 
     name = entry.data.get("name")
     uid = f"xiaomi_vacuum_{name.lower().replace(' ', '_')}"
 
-    async_add_entities([VacuumOnlineBinarySensor(name, uid, coordinator)])
+    async_add_entities(
+        [VacuumOnlineBinarySensor(name, uid, coordinator, client, prober)]
+    )
 
 
 class VacuumOnlineBinarySensor(CoordinatorEntity, BinarySensorEntity):
     """Binary sensor indicating if the vacuum is online."""
 
     _attr_device_class = BinarySensorDeviceClass.CONNECTIVITY
+    _unrecorded_attributes = frozenset({"latency_ms", "circuit_retry_in"})
 
-    def __init__(self, name, uid, coordinator):
+    def __init__(self, name, uid, coordinator, client, prober=None):
         super().__init__(coordinator)
+        self._client = client
+        self._prober = prober
         self._attr_name = f"{name} Online"
         self._attr_unique_id = f"{uid}_online"
 
@@ -38,7 +45,40 @@ class VacuumOnlineBinarySensor(CoordinatorEntity, BinarySensorEntity):
             model="Vacuum 1C",
         )
 
+    async def async_added_to_hass(self) -> None:
+        """Follow the liveness prober as well as the coordinator."""
+        await super().async_added_to_hass()
+        if self._prober is not None:
+            self.async_on_remove(
+                self._prober.async_add_listener(self.async_write_ha_state)
+            )
+
+    @property
+    def available(self):
+        """The connectivity sensor itself is always available."""
+        return True
+
     @property
     def is_on(self):
         """Return True if the vacuum is reachable."""
-        return self.coordinator.last_update_success
\ No newline at end of file
+        if self._prober is not None:
+            return self._prober.available
+        return self.coordinator.last_update_success
+
+    @property
+    def extra_state_attributes(self):
+        """Return probe latency and the transport circuit breaker state."""
+        breaker = self._client.circuit_breaker.as_dict()
+        attributes = {
+            "circuit": breaker["state"],
+            "circuit_failures": breaker["failures"],
+            "circuit_retry_in": breaker["retry_in"],
+        }
+
+        if self._prober is not None:
+            latency = self._prober.latency
+            attributes["latency_ms"] = (
+                round(latency * 1000, 1) if latency is not None else None
+            )
+
+        return attributes
\ No newline at end of file
@@ -0,0 +1,254 @@
+"""Map camera for Xiaomi Vacuum 1C."""
+
+import asyncio
+import io
+import logging
+import threading
+
+import numpy as np
+from PIL import Image, ImageDraw
+
+from homeassistant.components.camera import Camera
+from homeassistant.helpers.entity import DeviceInfo
+
+from .const import (
+    DOMAIN,
+    DATA_COORDINATOR,
+    DATA_MAP_TRACKER,
+    DEFAULT_MAP_PALETTE,
+    DEFAULT_MAP_SCALE,
+)
+from .entity import DreameCoordinatorEntity
+from .map_decoder import FREE, MapData
+
+_LOGGER = logging.getLogger(__name__)
+
+# RGBA colours: unknown, free floor and wall pixels, rooms (cycled by room
+# id), then the path and the charger/robot markers drawn on top.
+PALETTES = {
+    "default": {
+        "unknown": (0, 0, 0, 0),
+        "free": (198, 220, 238, 255),
+        "wall": (96, 110, 125, 255),
+        "rooms": (
+            (171, 199, 248, 255),
+            (249, 224, 125, 255),
+            (184, 227, 255, 255),
+            (184, 217, 141, 255),
+            (255, 188, 154, 255),
+            (216, 190, 246, 255),
+        ),
+        "path": (255, 255, 255, 255),
+        "charger": (70, 200, 80, 255),
+        "robot": (40, 110, 255, 255),
+    },
+    "dark": {
+        "unknown": (0, 0, 0, 0),
+        "free": (60, 66, 77, 255),
+        "wall": (150, 160, 170, 255),
+        "rooms": (
+            (52, 84, 122, 255),
+            (112, 94, 40, 255),
+            (40, 100, 110, 255),
+            (70, 100, 50, 255),
+            (120, 70, 60, 255),
+            (90, 70, 120, 255),
+        ),
+        "path": (230, 230, 230, 255),
+        "charger": (90, 220, 100, 255),
+        "robot": (90, 160, 255, 255),
+    },
+    "mono": {
+        "unknown": (0, 0, 0, 0),
+        "free": (235, 235, 235, 255),
+        "wall": (40, 40, 40, 255),
+        "rooms": ((235, 235, 235, 255),),
+        "path": (120, 120, 120, 255),
+        "charger": (0, 0, 0, 255),
+        "robot": (0, 0, 0, 255),
+    },
+}
+
+
+def _pixel_colors(palette: dict) -> np.ndarray:
+    """Colour table indexed by grid value, then by room id from index 3."""
+    rooms = palette["rooms"]
+    table = [palette["unknown"], palette["free"], palette["wall"]]
+    table += [rooms[(room - 1) % len(rooms)] for room in range(1, 64)]
+    return np.array(table, dtype=np.uint8)
+
+
+class MapRenderer:
+    """Renders the map of one camera, keeping what it drew.
+
+    The base map (rooms, walls, charger) is only rendered again when it
+    changes or the path starts over; new path segments are drawn onto the
+    kept overlay in place, and the robot goes on a copy of it per image."""
+
+    def __init__(self, scale: int, palette_name: str) -> None:
+        self.scale = scale
+        self.palette = PALETTES.get(palette_name, PALETTES[DEFAULT_MAP_PALETTE])
+        self._colors = _pixel_colors(self.palette)
+        self._lock = threading.Lock()
+        self._base = None  # MapData of the overlay
+        self._key = None  # (base key, path generation) of the overlay
+        self._overlay = None  # PIL image, base map and path drawn so far
+        self._drawn = 0  # path points drawn on the overlay
+
+    def render(self, base, base_key, points, starts, generation, robot) -> bytes:
+        """Return the PNG; blocking, run it in the executor."""
+        with self._lock:
+            if (base_key, generation) != self._key or len(points) < self._drawn:
+                self._render_base(base)
+                self._key = (base_key, generation)
+            if len(points) > self._drawn:
+                self._draw_path(points, starts)
+
+            image = self._overlay
+            if robot is not None:
+                image = image.copy()
+                self._draw_marker(ImageDraw.Draw(image), robot, "robot")
+
+            buffer = io.BytesIO()
+            image.save(buffer, "PNG", compress_level=3)
+            return buffer.getvalue()
+
+    def _to_image(self, points: np.ndarray) -> np.ndarray:
+        pixels = self._base.to_pixels(points)
+        # Rows grow with y, images grow downwards
+        pixels[:, 1] = self._base.height - pixels[:, 1]
+        return pixels * self.scale
+
+    def _render_base(self, map_data: MapData) -> None:
+        # Room pixels take their room colour, the others their grid colour
+        index = np.where(
+            (map_data.grid == FREE) & (map_data.segments > 0),
+            map_data.segments.astype(np.intp) + 2,
+            map_data.grid,
+        )
+        image = Image.fromarray(
+            np.ascontiguousarray(self._colors[index][::-1]), "RGBA"
+        )
+        if self.scale > 1:
+            image = image.resize(
+                (map_data.width * self.scale, map_data.height * self.scale),
+                Image.NEAREST,
+            )
+        self._base = map_data
+        self._overlay = image
+        self._drawn = 0
+        if map_data.charger is not None:
+            self._draw_marker(ImageDraw.Draw(image), map_data.charger, "charger")
+
+    def _draw_path(self, points: np.ndarray, starts: np.ndarray) -> None:
+        # Continue from the last drawn point, breaking where polylines start
+        first = max(self._drawn - 1, 0)
+        breaks = starts[(starts > first) & (starts < len(points))] - first
+        draw = ImageDraw.Draw(self._overlay)
+        width = max(1, self.scale // 2)
+        for polyline in np.split(self._to_image(points[first:]), breaks):
+            if len(polyline) > 1:
+                draw.line(polyline.ravel().tolist(), self.palette["path"], width)
+        self._drawn = len(points)
+
+    def _draw_marker(self, draw, pose, color: str) -> None:
+        x, y = self._to_image(np.array([pose[:2]]))[0]
+        radius = max(2, self.scale * 2)
+        draw.ellipse(
+            (x - radius, y - radius, x + radius, y + radius),
+            fill=self.palette[color],
+        )
+
+
+def render_map(map_data: MapData, scale: int, palette_name: str) -> bytes:
+    """Render a decoded map at once, e.g. from a script."""
+    return MapRenderer(scale, palette_name).render(
+        map_data,
+        None,
+        map_data.path,
+        map_data.path_starts,
+        0,
+        map_data.robot,
+    )
+
+
+async def async_setup_entry(hass, entry, async_add_entities):
+    """Set up the map camera."""
+    data = hass.data[DOMAIN][entry.entry_id]
+    coordinator = data[DATA_COORDINATOR]
+
+    name = entry.data.get("name")
+    uid = f"xiaomi_vacuum_{name.lower().replace(' ', '_')}"
+
+    async_add_entities(
+        [
+            VacuumMapCamera(
+                name,
+                uid,
+                coordinator,
+                data[DATA_MAP_TRACKER],
+                scale=entry.options.get("map_scale", DEFAULT_MAP_SCALE),
+                palette=entry.options.get("map_palette", DEFAULT_MAP_PALETTE),
+            )
+        ]
+    )
+
+
+class VacuumMapCamera(DreameCoordinatorEntity, Camera):
+    """The vacuum's map rendered to PNG.
+
+    The map is fetched by the :class:`MapTracker`, not the regular poll.
+    The last image is kept with the map content it shows, so repeated
+    fetches from dashboards are served without rendering or encoding
+    again; concurrent fetches of a new map share a single render."""
+
+    def __init__(self, name, uid, coordinator, tracker, *, scale, palette):
+        super().__init__(coordinator)
+        Camera.__init__(self)
+        self.content_type = "image/png"
+
+        self._tracker = tracker
+        self._renderer = MapRenderer(scale, palette)
+        self._image = None  # last PNG rendered, served when a render fails
+        self._image_key = None  # content key of the map in _image
+        self._rendering = {}  # content key -> Future
+        self._failed_key = None  # not rendered again until the map changes
+
+        self._attr_name = f"{name} Map"
+        self._attr_unique_id = f"{uid}_map"
+        self._attr_icon = "mdi:map"
+        self._attr_device_info = DeviceInfo(identifiers={(DOMAIN, uid)})
+
+    async def async_camera_image(self, width=None, height=None):
+        """Return the PNG of the current map, rendering it only when new."""
+        tracker = self._tracker
+        if tracker.base is None:
+            return None
+
+        key = tracker.content_key
+        if key == self._image_key or key == self._failed_key:
+            return self._image
+
+        future = self._rendering.get(key)
+        if future is None:
+            future = self.hass.async_add_executor_job(
+                self._renderer.render,
+                tracker.base,
+                tracker.base_hash,
+                tracker.path.points,
+                tracker.path.starts,
+                tracker.path.generation,
+                tracker.robot,
+            )
+            self._rendering[key] = future
+            future.add_done_callback(lambda _: self._rendering.pop(key, None))
+        try:
+            image = await asyncio.shield(future)
+        except Exception:  # noqa: BLE001
+            if self._failed_key != key:
+                self._failed_key = key
+                _LOGGER.exception("Unable to render the map of %s", self.name)
+            return self._image
+
+        self._image, self._image_key = image, key
+        return image
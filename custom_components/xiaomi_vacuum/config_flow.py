@@ -4,7 +4,13 @@ import voluptuous as vol
 from homeassistant import config_entries
 from homeassistant.const import CONF_HOST, CONF_NAME, CONF_TOKEN
 
-from .const import DOMAIN, DEFAULT_NAME
+from .const import (
+    DOMAIN,
+    DEFAULT_NAME,
+    DEFAULT_MAP_PALETTE,
+    DEFAULT_MAP_SCALE,
+    DEFAULT_STALE_WINDOW,
+)
 
 
 # -----------------------------
@@ -50,12 +56,22 @@ class XiaomiVacuumConfigFlow(config_entries.ConfigFlow, domain=DOMAIN):
 OPTIONS_SCHEMA = vol.Schema(
     {
         vol.Optional("polling_interval", default=30): vol.All(int, vol.Range(min=5, max=300)),
+        vol.Optional("stale_window", default=DEFAULT_STALE_WINDOW): vol.All(
+            int, vol.Range(min=0, max=3600)
+        ),
         vol.Optional("display_name", default=DEFAULT_NAME): str,
         vol.Optional("default_fan_speed", default="Standard"): vol.In(
             ["Silent", "Standard", "Strong", "Turbo"]
         ),
         vol.Optional("enable_sensors", default=True): bool,
         vol.Optional("debug_mode", default=False): bool,
+        vol.Optional("enable_metrics", default=False): bool,
+        vol.Optional("map_scale", default=DEFAULT_MAP_SCALE): vol.All(
+            int, vol.Range(min=1, max=8)
+        ),
+        vol.Optional("map_palette", default=DEFAULT_MAP_PALETTE): vol.In(
+            ["default", "dark", "mono"]
+        ),
     }
 )
 
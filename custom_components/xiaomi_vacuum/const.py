@@ -14,9 +14,50 @@ CONF_NAME = CONF_NAME
 # Data keys in hass.data
 DATA_COORDINATOR = "coordinator"
 DATA_CLIENT = "client"
+DATA_PROBER = "prober"
+DATA_MAP_TRACKER = "map_tracker"
+DATA_HISTORY = "history"
+DATA_SNAPSHOT = "snapshot"
+# Shared startup discovery, outside hass.data[DOMAIN] which holds entries only
+DATA_DISCOVERY = f"{DOMAIN}_discovery"
 
 # Platforms
-PLATFORMS: list[str] = ["vacuum", "sensor", "binary_sensor"]
+PLATFORMS: list[str] = ["vacuum", "sensor", "binary_sensor", "camera"]
 
 # Update interval (seconds)
-DEFAULT_UPDATE_INTERVAL = 15
\ No newline at end of file
+DEFAULT_UPDATE_INTERVAL = 15
+# Seconds the last status is still served while polls fail
+DEFAULT_STALE_WINDOW = 120
+
+# Hello-packet liveness probe (seconds / consecutive misses before offline)
+LIVENESS_INTERVAL = 10
+LIVENESS_TIMEOUT = 2
+LIVENESS_MAX_MISSES = 3
+
+# Startup broadcast discovery: seconds to wait for replies / to reuse them
+DISCOVERY_TIMEOUT = 2
+DISCOVERY_MAX_AGE = 60
+
+# DreameStatus fields always polled, whatever entities are enabled
+CORE_STATUS_FIELDS = frozenset({"status", "error", "battery"})
+
+# Map camera: default render options
+DEFAULT_MAP_SCALE = 2
+DEFAULT_MAP_PALETTE = "default"
+# Seconds between map_view fetches / map_req actions while cleaning
+MAP_FETCH_INTERVAL = 10
+MAP_REQUEST_INTERVAL = 30
+
+# Seconds between writes of the poll history to disk
+HISTORY_FLUSH_INTERVAL = 300
+# Seconds a changed status waits before it is stored as the last known one
+SNAPSHOT_SAVE_DELAY = 30
+
+# Services
+SERVICE_APPLY_PROFILE = "apply_profile"
+SERVICE_DUMP_TRACE = "dump_trace"
+SERVICE_CLEAN_ZONES = "clean_zones"
+SERVICE_EXPORT_HISTORY = "export_history"
+SERVICE_REMOTE_CONTROL_START = "remote_control_start"
+SERVICE_REMOTE_CONTROL_MOVE = "remote_control_move"
+SERVICE_REMOTE_CONTROL_STOP = "remote_control_stop"
@@ -1,38 +1,251 @@
 """DataUpdateCoordinator for Xiaomi Vacuum 1C."""
 
+import dataclasses
 import logging
+import time
 from datetime import timedelta
 
-from homeassistant.core import HomeAssistant
+from homeassistant.core import HomeAssistant, callback
+from homeassistant.helpers.event import async_call_later
 from homeassistant.helpers.update_coordinator import DataUpdateCoordinator, UpdateFailed
 
-from .const import DOMAIN, DEFAULT_NAME, DEFAULT_UPDATE_INTERVAL
+from .const import (
+    DOMAIN,
+    DEFAULT_UPDATE_INTERVAL,
+    DEFAULT_STALE_WINDOW,
+    CORE_STATUS_FIELDS,
+)
+from .history import HISTORY_FIELDS
+from .miio import metrics
+from .miio.deadline import Deadline
 
 _LOGGER = logging.getLogger(__name__)
 
 
-async def async_create_coordinator(hass: HomeAssistant, client, entry) -> DataUpdateCoordinator:
-    """Create and initialize the DataUpdateCoordinator for the Xiaomi Vacuum 1C."""
+class DreameCoordinator(DataUpdateCoordinator):
+    """Coordinator polling only the properties its entities actually use.
 
-    # Leggi polling_interval dalle options (default a DEFAULT_UPDATE_INTERVAL)
-    polling_interval = entry.options.get("polling_interval", DEFAULT_UPDATE_INTERVAL)
+    Every entity registers the ``DreameStatus`` fields it reads as its
+    coordinator context. Disabled entities are never added to hass, and
+    removed ones drop their listener, so the union of the contexts follows
+    the entity registry. With a history, its fields are always polled and
+    every successful poll is appended to it; with a snapshot store, the
+    polled status is kept as the last known one.
+
+    When polls start failing, entities keep serving the last status for
+    ``stale_window`` seconds (see :class:`.entity.DreameCoordinatorEntity`);
+    listeners are called once more when the window runs out, since a
+    coordinator does not call them again for consecutive failures.
+
+    While the prober gets no answer, polls skip the transport and look for
+    the device at another address instead, at most once every
+    ``rediscover_interval`` of the client."""
+
+    def __init__(
+        self,
+        hass: HomeAssistant,
+        client,
+        entry,
+        update_interval: timedelta,
+        prober=None,
+        history=None,
+        snapshots=None,
+        stale_window: float = DEFAULT_STALE_WINDOW,
+    ):
+        super().__init__(
+            hass,
+            _LOGGER,
+            name=f"{DOMAIN}_{entry.entry_id}",
+            update_interval=update_interval,
+        )
+        self.client = client
+        self.prober = prober
+        self.history = history
+        self.snapshots = snapshots
+        self.last_poll_time = None  # epoch seconds the data was polled at
+        self.stale_window = stale_window
+        self.failing_since = None  # epoch seconds of the first failed poll
+        self._status_fields = None
+        self._unsub_stale_window = None
+
+        if prober is not None:
+            prober.async_add_listener(self._handle_liveness_change)
+
+    @callback
+    def _handle_liveness_change(self) -> None:
+        """Poll right away when the device starts answering hello probes again."""
+        if self.prober.available:
+            self.client.circuit_breaker.reset()
+            self.hass.async_create_task(self.async_request_refresh())
+
+    async def _async_rediscover(self) -> bool:
+        """Look for the device at another address; True if it moved there.
+
+        The prober follows it right away rather than once the address change
+        callback of the client ran, and probes the new address."""
+        try:
+            moved = await self.hass.async_add_executor_job(self.client.rediscover)
+        except Exception:  # noqa: BLE001
+            _LOGGER.exception("Unable to look for %s at another address", self.name)
+            return False
+        if moved:
+            self.prober.async_set_host(self.client.ip)
+            self.hass.async_create_task(self.prober.async_probe())
+        return moved
+
+    @callback
+    def async_update_listeners(self) -> None:
+        """Update all listeners, timing the fan-out when metrics are enabled."""
+        with metrics.timed(self.client.metrics, "fanout"):
+            super().async_update_listeners()
+
+    @property
+    def status_fields(self):
+        """Return the fields to poll, or None to poll all of them."""
+        contexts = list(self.async_contexts())
+        if not contexts:
+            # No entity registered yet (first refresh): fetch everything.
+            return None
+        if self.history is not None:
+            contexts.append(HISTORY_FIELDS)
+        return CORE_STATUS_FIELDS.union(*contexts)
+
+    @property
+    def within_stale_window(self) -> bool:
+        """Return True while the last status may still be served."""
+        if self.data is None:
+            return False
+        if self.failing_since is None:
+            return True
+        return time.time() - self.failing_since < self.stale_window
+
+    @callback
+    def _async_stale_window_expired(self, _now) -> None:
+        self._unsub_stale_window = None
+        self.async_update_listeners()
+
+    @callback
+    def _cancel_stale_window(self) -> None:
+        if self._unsub_stale_window is not None:
+            self._unsub_stale_window()
+            self._unsub_stale_window = None
+
+    async def async_shutdown(self) -> None:
+        """Cancel the stale window timer as well."""
+        self._cancel_stale_window()
+        await super().async_shutdown()
 
-    async def async_update_data():
+    async def _async_update_data(self):
+        """Poll the device, timing how long polls have been failing."""
+        try:
+            state = await self._async_poll()
+        except UpdateFailed:
+            if self.failing_since is None:
+                self.failing_since = time.time()
+                if self.stale_window > 0:
+                    self._unsub_stale_window = async_call_later(
+                        self.hass, self.stale_window, self._async_stale_window_expired
+                    )
+            raise
+        self.failing_since = None
+        self._cancel_stale_window()
+        return state
+
+    async def _async_poll(self):
         """Fetch data from the device."""
+        if (
+            self.prober is not None
+            and not self.prober.available
+            and not await self._async_rediscover()
+        ):
+            # Don't spend a handshake and encrypted retries on a dead host.
+            raise UpdateFailed(
+                f"Xiaomi Vacuum 1C at {self.prober.host} is not answering hello probes"
+            )
+
+        fields = self.status_fields
+        if fields != self._status_fields:
+            _LOGGER.debug(
+                "Request plan for %s: %s",
+                self.name,
+                "all properties" if fields is None else sorted(fields),
+            )
+            self._status_fields = fields
+
+        # The update interval bounds the whole poll, executor queueing included.
+        deadline = Deadline(self.update_interval.total_seconds())
+
+        counters = self.client.counters
+        counters.add("polls")
+        start = time.perf_counter()
         try:
             # DreameVacuum.status() is blocking → run in executor
-            state = await hass.async_add_executor_job(client.status)
-            return state
+            state = await self.hass.async_add_executor_job(
+                self.client.status, fields, deadline
+            )
         except Exception as err:  # noqa: BLE001
+            counters.add("poll_failures")
             raise UpdateFailed(f"Error communicating with Xiaomi Vacuum 1C: {err}") from err
+        finally:
+            elapsed = time.perf_counter() - start
+            counters.observe_poll(elapsed)
+            if self.client.metrics is not None:
+                self.client.metrics.observe("poll", elapsed)
+
+        if state.stale_fields and self.data is not None:
+            _LOGGER.debug(
+                "Poll of %s ran out of time, keeping previous %s",
+                self.name,
+                sorted(state.stale_fields),
+            )
+            state = dataclasses.replace(
+                state,
+                **{name: getattr(self.data, name) for name in state.stale_fields},
+            )
+
+        self.last_poll_time = time.time()
+        if self.history is not None:
+            # A row the history cannot take must not fail the poll
+            try:
+                self.history.append(state, self.last_poll_time)
+            except Exception:  # noqa: BLE001
+                _LOGGER.exception("Unable to record the poll of %s", self.name)
+        if self.snapshots is not None:
+            self.snapshots.async_schedule_save(state)
+        return state
+
 
-    coordinator = DataUpdateCoordinator(
+async def async_create_coordinator(
+    hass: HomeAssistant, client, entry, prober=None, history=None, snapshots=None
+) -> DataUpdateCoordinator:
+    """Create and initialize the DataUpdateCoordinator for the Xiaomi Vacuum 1C.
+
+    With a stored snapshot, the coordinator starts from it and polls in the
+    background, so setup does not wait for the device."""
+
+    # Leggi polling_interval dalle options (default a DEFAULT_UPDATE_INTERVAL)
+    polling_interval = entry.options.get("polling_interval", DEFAULT_UPDATE_INTERVAL)
+    stale_window = entry.options.get("stale_window", DEFAULT_STALE_WINDOW)
+
+    coordinator = DreameCoordinator(
         hass,
-        _LOGGER,
-        name=f"{DOMAIN}_{entry.entry_id}",
-        update_method=async_update_data,
+        client,
+        entry,
         update_interval=timedelta(seconds=polling_interval),  # Usa il valore dalle options
+        prober=prober,
+        history=history,
+        snapshots=snapshots,
+        stale_window=stale_window,
     )
 
-    await coordinator.async_config_entry_first_refresh()
+    snapshot = await snapshots.async_load() if snapshots is not None else None
+    if snapshot is None:
+        await coordinator.async_config_entry_first_refresh()
+        return coordinator
+
+    # Every field is marked stale until the first poll replaces it
+    coordinator.data, coordinator.last_poll_time = snapshot
+    entry.async_create_background_task(
+        hass, coordinator.async_refresh(), f"{coordinator.name} first refresh"
+    )
     return coordinator
\ No newline at end of file
@@ -0,0 +1,49 @@
+"""Diagnostics support for Xiaomi Vacuum 1C."""
+
+from homeassistant.components.diagnostics import async_redact_data
+from homeassistant.config_entries import ConfigEntry
+from homeassistant.const import CONF_TOKEN
+from homeassistant.core import HomeAssistant
+
+from .const import DOMAIN, DATA_CLIENT, DATA_COORDINATOR, DATA_PROBER
+
+TO_REDACT = {CONF_TOKEN}
+
+
+async def async_get_config_entry_diagnostics(
+    hass: HomeAssistant, entry: ConfigEntry
+) -> dict:
+    """Return diagnostics for a config entry."""
+    data = hass.data[DOMAIN][entry.entry_id]
+    client = data[DATA_CLIENT]
+    coordinator = data[DATA_COORDINATOR]
+    prober = data.get(DATA_PROBER)
+
+    fields = coordinator.status_fields
+    diagnostics = {
+        "entry": {
+            "data": async_redact_data(dict(entry.data), TO_REDACT),
+            "options": dict(entry.options),
+        },
+        "coordinator": {
+            "last_update_success": coordinator.last_update_success,
+            "update_interval": coordinator.update_interval.total_seconds(),
+            "status_fields": sorted(fields) if fields is not None else None,
+        },
+        "circuit": client.circuit_breaker.as_dict(),
+        "liveness": None,
+        "metrics": None,
+        "trace": client.trace.dump(),
+    }
+
+    if prober is not None:
+        diagnostics["liveness"] = {
+            "available": prober.available,
+            "latency": prober.latency,
+            "last_reply": prober.last_reply.isoformat() if prober.last_reply else None,
+        }
+
+    if client.metrics is not None:
+        diagnostics["metrics"] = client.metrics.summary()
+
+    return diagnostics
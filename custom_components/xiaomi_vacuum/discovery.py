@@ -0,0 +1,97 @@
+"""Startup broadcast discovery shared by all Xiaomi Vacuum 1C entries."""
+
+import asyncio
+import binascii
+import logging
+import time
+from typing import Optional
+
+from homeassistant.core import HomeAssistant, callback
+
+from .const import DISCOVERY_MAX_AGE, DISCOVERY_TIMEOUT, DOMAIN
+from .miio.miioprotocol import DiscoveredDevice, MiIOProtocol
+
+_LOGGER = logging.getLogger(__name__)
+
+MIIO_PORT = 54321
+
+
+class FleetDiscovery:
+    """Prime the handshake of every configured vacuum from one broadcast.
+
+    A hello reply carries the device id and timestamp a handshake is made
+    for, so one broadcast answered by all vacuums replaces a handshake per
+    entry. Entries are matched by their stored device id, wherever it
+    answers from, or by host until it is known. The broadcast ends once
+    every entry has been matched, and its replies are only reused for
+    ``max_age`` seconds."""
+
+    def __init__(
+        self,
+        hass: HomeAssistant,
+        *,
+        timeout: float = DISCOVERY_TIMEOUT,
+        max_age: float = DISCOVERY_MAX_AGE,
+    ) -> None:
+        self.hass = hass
+        self.timeout = timeout
+        self.max_age = max_age
+        self._task = None
+        self._finished = None  # monotonic time the broadcast ended
+
+    @callback
+    def async_start(self) -> None:
+        """Broadcast once for the entries configured now, if any."""
+        wanted = [
+            (entry.data.get("device_id"), entry.data.get("host"))
+            for entry in self.hass.config_entries.async_entries(DOMAIN)
+        ]
+        if not wanted:
+            return
+        self._task = self.hass.async_create_background_task(
+            self._async_discover(wanted), "xiaomi_vacuum discovery"
+        )
+
+    async def _async_discover(self, wanted) -> dict:
+        def done(found) -> bool:
+            ids = {_hex(device.device_id) for device in found.values()}
+            return all(
+                device_id in ids if device_id else host in found
+                for device_id, host in wanted
+            )
+
+        try:
+            devices = await self.hass.async_add_executor_job(
+                MiIOProtocol.discover, None, self.timeout, MIIO_PORT, done
+            )
+        finally:
+            self._finished = time.monotonic()
+        return {_hex(device.device_id): device for device in devices or []}
+
+    async def async_lookup(
+        self, device_id: Optional[str], host: str
+    ) -> Optional[DiscoveredDevice]:
+        """Return the hello reply of the vacuum, waiting for the broadcast."""
+        if self._task is None:
+            return None
+        if self._finished is not None and (
+            time.monotonic() - self._finished > self.max_age
+        ):
+            return None
+        try:
+            found = await asyncio.shield(self._task)
+        except Exception as err:  # noqa: BLE001
+            _LOGGER.debug("Broadcast discovery failed: %s", err)
+            return None
+
+        if device_id:
+            return found.get(device_id)
+
+        for device in found.values():
+            if device.ip == host:
+                return device
+        return None
+
+
+def _hex(device_id: bytes) -> str:
+    return binascii.hexlify(device_id).decode()
@@ -0,0 +1,37 @@
+"""Base entity for Xiaomi Vacuum 1C."""
+
+import time
+
+from homeassistant.helpers.update_coordinator import CoordinatorEntity
+
+
+class DreameCoordinatorEntity(CoordinatorEntity):
+    """Coordinator entity riding out short outages.
+
+    A failed poll does not make the entity unavailable: the last status is
+    served, flagged ``stale``, until polls have been failing for the
+    coordinator's ``stale_window``. So a Wi-Fi hiccup costs no flip to
+    unavailable and back on every entity of the vacuum."""
+
+    # Grows while polls fail, not worth a recorder row of its own
+    _unrecorded_attributes = frozenset({"age_s"})
+
+    @property
+    def available(self) -> bool:
+        """Return True until polls have failed for the whole stale window."""
+        return self.coordinator.within_stale_window
+
+    @property
+    def freshness_attributes(self) -> dict:
+        """Return whether the status served is stale and its age."""
+        coordinator = self.coordinator
+        polled_at = coordinator.last_poll_time
+        return {
+            "stale": not coordinator.last_update_success
+            or bool(getattr(coordinator.data, "stale_fields", None)),
+            "age_s": None if polled_at is None else int(time.time() - polled_at),
+        }
+
+    @property
+    def extra_state_attributes(self):
+        return self.freshness_attributes
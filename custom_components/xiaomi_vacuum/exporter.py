@@ -0,0 +1,96 @@
+"""OpenMetrics exporter for Xiaomi Vacuum 1C transport and coordinator metrics.
+
+Serves every configured vacuum's counters and histograms at
+``/api/xiaomi_vacuum/metrics``; scrape it with a long-lived access token::
+
+    scrape_configs:
+      - job_name: xiaomi_vacuum
+        metrics_path: /api/xiaomi_vacuum/metrics
+        bearer_token: <token>
+        static_configs:
+          - targets: ["homeassistant.local:8123"]
+"""
+
+from aiohttp import web
+
+from homeassistant.components.http import HomeAssistantView
+from homeassistant.core import HomeAssistant
+
+from .const import DOMAIN, DATA_CLIENT
+from .miio.metrics import COUNTERS
+
+CONTENT_TYPE = "application/openmetrics-text; version=1.0.0; charset=utf-8"
+PREFIX = "xiaomi_vacuum_"
+
+HISTOGRAMS = {
+    "rtt_seconds": "Round trip time of answered requests",
+    "poll_duration_seconds": "Duration of status polls, executor queueing included",
+}
+
+
+def _label(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def render_metrics(devices) -> str:
+    """Render (labels, TransportCounters) pairs in OpenMetrics text format."""
+    snapshots = [
+        (
+            ",".join(f'{key}="{_label(value)}"' for key, value in labels.items()),
+            *counters.snapshot(),
+        )
+        for labels, counters in devices
+    ]
+
+    lines = []
+    for name, help_text in COUNTERS.items():
+        lines.append(f"# TYPE {PREFIX}{name} counter")
+        lines.append(f"# HELP {PREFIX}{name} {help_text}.")
+        for labels, values, _ in snapshots:
+            lines.append(f"{PREFIX}{name}_total{{{labels}}} {values[name]}")
+
+    for name, help_text in HISTOGRAMS.items():
+        lines.append(f"# TYPE {PREFIX}{name} histogram")
+        lines.append(f"# HELP {PREFIX}{name} {help_text}.")
+        for labels, _, histograms in snapshots:
+            histogram = histograms[name]
+            cumulative = 0
+            for bound, count in zip(histogram.bounds, histogram.counts):
+                cumulative += count
+                lines.append(
+                    f'{PREFIX}{name}_bucket{{{labels},le="{bound}"}} {cumulative}'
+                )
+            lines.append(
+                f'{PREFIX}{name}_bucket{{{labels},le="+Inf"}} {histogram.count}'
+            )
+            lines.append(f"{PREFIX}{name}_count{{{labels}}} {histogram.count}")
+            lines.append(f"{PREFIX}{name}_sum{{{labels}}} {histogram.sum}")
+
+    lines.append("# EOF")
+    return "\n".join(lines) + "\n"
+
+
+class MetricsView(HomeAssistantView):
+    """Serve the metrics of all configured vacuums."""
+
+    url = f"/api/{DOMAIN}/metrics"
+    name = f"api:{DOMAIN}:metrics"
+
+    def __init__(self, hass: HomeAssistant) -> None:
+        self.hass = hass
+
+    async def get(self, request: web.Request) -> web.Response:
+        devices = []
+        for entry_id, data in self.hass.data.get(DOMAIN, {}).items():
+            entry = self.hass.config_entries.async_get_entry(entry_id)
+            client = data[DATA_CLIENT]
+            labels = {
+                "device": entry.title if entry else entry_id,
+                "host": client.ip,
+            }
+            devices.append((labels, client.counters))
+
+        return web.Response(
+            body=render_metrics(devices).encode("utf-8"),
+            headers={"Content-Type": CONTENT_TYPE},
+        )
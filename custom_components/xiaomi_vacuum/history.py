@@ -0,0 +1,208 @@
+"""Columnar poll history of one vacuum, memory-mapped to disk.
+
+Every poll appends one row to the ``raw`` tier. The ``1min`` and ``15min``
+tiers keep the last row of each minute / quarter hour, so older data is
+downsampled rather than dropped. Each tier is a ring of fixed capacity.
+
+All tiers live in one file: a small header holding how many rows each
+tier has written, then one contiguous block per column and tier. The file
+is mapped into memory, so appending is a few array stores, reading a range
+is array slicing, and after a restart the history is there without
+loading or parsing anything.
+"""
+import logging
+import os
+import time
+from typing import Dict, List, NamedTuple, Optional
+
+import numpy as np
+
+_LOGGER = logging.getLogger(__name__)
+
+MAGIC = 0x58564849  # "XVHI"
+VERSION = 2
+
+# Polled status fields kept, with their column type; ts is the poll time.
+# Columns are laid out widest first so every block stays aligned. Status
+# and error codes get int16, room for codes a firmware update may add.
+COLUMNS = (
+    ("ts", np.float64),
+    ("area", np.int32),
+    ("timer", np.int32),
+    ("status", np.int16),
+    ("error", np.int16),
+    ("battery", np.int8),
+    ("brush_life_level", np.int8),
+    ("brush_life_level2", np.int8),
+    ("filter_life_level", np.int8),
+)
+HISTORY_FIELDS = frozenset(name for name, _ in COLUMNS[1:])
+# Stored for fields the poll did not return, or whose value does not fit
+MISSING = -1
+# Range of the values each status column can hold
+LIMITS = tuple(
+    (np.iinfo(dtype).min, np.iinfo(dtype).max) for _, dtype in COLUMNS[1:]
+)
+
+
+class Tier(NamedTuple):
+    name: str
+    bucket: int  # seconds per row, 0 keeps every poll
+    capacity: int
+
+
+# A day of 15 s polls, a week of minutes and a year of quarter hours
+TIERS = (
+    Tier("raw", 0, 5760),
+    Tier("1min", 60, 7 * 24 * 60),
+    Tier("15min", 900, 365 * 24 * 4),
+)
+
+
+def _layout():
+    """Byte offset of the header and of every (tier, column) block."""
+    offsets = {}
+    offset = 8 * (2 + len(TIERS))
+    for tier in TIERS:
+        for name, dtype in COLUMNS:
+            offsets[tier.name, name] = offset
+            offset += np.dtype(dtype).itemsize * tier.capacity
+        offset += -offset % 8
+    return offsets, offset
+
+
+class _Ring:
+    """Columns of one tier, written in a circle."""
+
+    def __init__(self, tier: Tier, buffer, offsets, header, index: int) -> None:
+        self.tier = tier
+        self.columns = {
+            name: np.frombuffer(
+                buffer, dtype, tier.capacity, offsets[tier.name, name]
+            )
+            for name, dtype in COLUMNS
+        }
+        self._header = header
+        self._index = index
+        self._bucket = None  # bucket of the row not yet written
+        self._pending = None
+
+    @property
+    def written(self) -> int:
+        return int(self._header[self._index])
+
+    def __len__(self) -> int:
+        return min(self.written, self.tier.capacity)
+
+    def append(self, row) -> None:
+        written = self.written
+        slot = written % self.tier.capacity
+        for column, value in zip(self.columns.values(), row):
+            column[slot] = value
+        self._header[self._index] = written + 1
+
+    def offer(self, row) -> Optional[tuple]:
+        """Keep row as the last of its bucket; return the row of the bucket
+        it closes, which has been written."""
+        if not self.tier.bucket:
+            self.append(row)
+            return row
+        bucket = int(row[0] // self.tier.bucket)
+        closed = None
+        if self._pending is not None and bucket != self._bucket:
+            closed = self._pending
+            self.append(closed)
+        self._bucket = bucket
+        self._pending = row
+        return closed
+
+    def select(self, start: float, end: float, names) -> Dict[str, np.ndarray]:
+        """Rows with start <= ts < end, oldest first."""
+        count = len(self)
+        head = self.written % self.tier.capacity if count == self.tier.capacity else 0
+        order = np.roll(np.arange(count), -head) if head else slice(0, count)
+        ts = self.columns["ts"][order]
+        keep = (ts >= start) & (ts < end)
+        return {name: self.columns[name][order][keep] for name in names}
+
+
+def _column_value(value, limits) -> int:
+    """value as stored in its column, MISSING if absent or out of range."""
+    if value is None:
+        return MISSING
+    value = int(value)
+    low, high = limits
+    if not low <= value <= high:
+        _LOGGER.debug("Not recording %s, out of range %s..%s", value, low, high)
+        return MISSING
+    return value
+
+
+class DeviceHistory:
+    """Poll history of one vacuum, see the module docstring."""
+
+    def __init__(self, path: str) -> None:
+        self.path = path
+        offsets, size = _layout()
+        header_size = 2 + len(TIERS)
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        mode = "r+"
+        if not os.path.exists(path) or os.path.getsize(path) != size:
+            mode = "w+"
+        self._map = np.memmap(path, dtype=np.uint8, mode=mode, shape=(size,))
+        header = np.frombuffer(self._map, np.int64, header_size)
+        if mode == "r+" and (header[0] != MAGIC or header[1] != VERSION):
+            _LOGGER.warning("Discarding history %s of another format", path)
+            self._map[:] = 0
+        header[:2] = MAGIC, VERSION
+        self._rings = [
+            _Ring(tier, self._map, offsets, header, 2 + index)
+            for index, tier in enumerate(TIERS)
+        ]
+
+    @property
+    def tiers(self) -> List[str]:
+        return [tier.name for tier in TIERS]
+
+    def append(self, status, ts: Optional[float] = None) -> None:
+        """Record one polled DreameStatus."""
+        row = (time.time() if ts is None else ts,) + tuple(
+            _column_value(getattr(status, name, None), limits)
+            for (name, _), limits in zip(COLUMNS[1:], LIMITS)
+        )
+        for ring in self._rings:
+            row = ring.offer(row)
+            if row is None:
+                break
+
+    def export(
+        self,
+        tier: str = "raw",
+        start: float = 0.0,
+        end: float = float("inf"),
+        fields=None,
+    ) -> Dict[str, list]:
+        """Columns of tier between start and end (epoch seconds) as lists;
+        values the poll did not return are None."""
+        ring = next((ring for ring in self._rings if ring.tier.name == tier), None)
+        if ring is None:
+            raise ValueError("Unknown history tier %s" % tier)
+        names = ["ts"] + [
+            name for name, _ in COLUMNS[1:] if fields is None or name in fields
+        ]
+        columns = ring.select(start, end, names)
+        result = {"ts": columns.pop("ts").tolist()}
+        for name, values in columns.items():
+            result[name] = [None if v == MISSING else v for v in values.tolist()]
+        return result
+
+    def flush(self) -> None:
+        """Write dirty pages to disk; blocking."""
+        self._map.flush()
+
+    def close(self) -> None:
+        """Flush and drop the mapping; the file is unmapped once the column
+        views handed out are gone."""
+        self.flush()
+        self._rings = []
+        self._map = None
@@ -0,0 +1,198 @@
+"""Hello-packet liveness probe for Xiaomi Vacuum 1C."""
+
+import asyncio
+import logging
+import time
+from datetime import timedelta
+
+from homeassistant.core import CALLBACK_TYPE, HomeAssistant, callback
+from homeassistant.helpers.event import async_track_time_interval
+from homeassistant.util import dt as dt_util
+
+from .const import LIVENESS_INTERVAL, LIVENESS_MAX_MISSES, LIVENESS_TIMEOUT
+from .miio.miioprotocol import HELLO_BYTES
+
+_LOGGER = logging.getLogger(__name__)
+
+MIIO_PORT = 54321
+
+
+class _HelloProtocol(asyncio.DatagramProtocol):
+    """Datagram protocol handing hello replies back to the prober."""
+
+    def __init__(self, prober: "LivenessProber") -> None:
+        self._prober = prober
+        self._transport = None
+
+    def connection_made(self, transport) -> None:
+        self._transport = transport
+
+    def datagram_received(self, data, addr) -> None:
+        self._prober.reply_received(data)
+
+    def error_received(self, exc) -> None:
+        self._prober.reply_failed(exc, self._transport)
+
+    def connection_lost(self, exc) -> None:
+        self._prober.reply_failed(
+            exc or ConnectionError("socket closed"), self._transport
+        )
+
+
+class LivenessProber:
+    """Track device reachability with the 32-byte unencrypted miIO hello.
+
+    The hello needs neither the token nor a handshake, so it is answered in
+    a single round trip and is sent straight from the event loop. The
+    device is considered offline after ``max_misses`` unanswered probes."""
+
+    def __init__(
+        self,
+        hass: HomeAssistant,
+        host: str,
+        *,
+        port: int = MIIO_PORT,
+        interval: float = LIVENESS_INTERVAL,
+        timeout: float = LIVENESS_TIMEOUT,
+        max_misses: int = LIVENESS_MAX_MISSES,
+    ) -> None:
+        self.hass = hass
+        self.host = host
+        self.port = port
+        self.interval = interval
+        self.timeout = timeout
+        self.max_misses = max_misses
+
+        self.available = True
+        self.latency = None  # seconds, last answered probe
+        self.last_reply = None  # datetime of the last answered probe
+        self.device_id = None
+        self.device_ts = None
+
+        self._misses = 0
+        self._listeners: list[CALLBACK_TYPE] = []
+        self._transport = None
+        self._waiter = None
+        self._unsub_interval = None
+
+    @callback
+    def async_add_listener(self, update_callback: CALLBACK_TYPE) -> CALLBACK_TYPE:
+        """Call update_callback whenever availability changes."""
+        self._listeners.append(update_callback)
+
+        @callback
+        def remove_listener() -> None:
+            self._listeners.remove(update_callback)
+
+        return remove_listener
+
+    async def async_start(self) -> None:
+        """Probe now and then every interval."""
+        self._unsub_interval = async_track_time_interval(
+            self.hass, self._async_probe_interval, timedelta(seconds=self.interval)
+        )
+        self.hass.async_create_background_task(
+            self.async_probe(), f"xiaomi_vacuum liveness probe {self.host}"
+        )
+
+    async def async_stop(self) -> None:
+        """Stop probing and close the socket."""
+        if self._unsub_interval is not None:
+            self._unsub_interval()
+            self._unsub_interval = None
+        if self._transport is not None:
+            self._transport.close()
+            self._transport = None
+
+    @callback
+    def async_set_host(self, host: str) -> None:
+        """Probe another address from now on."""
+        self.host = host
+        if self._transport is not None:
+            self._transport.close()
+            self._transport = None
+
+    async def _async_probe_interval(self, _now) -> None:
+        await self.async_probe()
+
+    async def async_probe(self) -> bool:
+        """Send one hello and wait for the reply; return True if answered."""
+        if self._waiter is not None:
+            return self.available
+
+        loop = self.hass.loop
+        if self._transport is None:
+            try:
+                self._transport, _ = await loop.create_datagram_endpoint(
+                    lambda: _HelloProtocol(self), remote_addr=(self.host, self.port)
+                )
+            except OSError as err:
+                _LOGGER.debug("Unable to open probe socket to %s: %s", self.host, err)
+                self._record_miss()
+                return False
+
+        self._waiter = loop.create_future()
+        sent = time.monotonic()
+        try:
+            self._transport.sendto(HELLO_BYTES)
+            async with asyncio.timeout(self.timeout):
+                data = await self._waiter
+        except (TimeoutError, OSError):
+            self._record_miss()
+            return False
+        finally:
+            self._waiter = None
+
+        self._record_reply(data, time.monotonic() - sent)
+        return True
+
+    @callback
+    def reply_received(self, data: bytes) -> None:
+        """Resolve the pending probe with a hello reply."""
+        if len(data) != 32 or data[:2] != HELLO_BYTES[:2]:
+            return
+        if self._waiter is not None and not self._waiter.done():
+            self._waiter.set_result(data)
+
+    @callback
+    def reply_failed(self, exc: Exception, transport=None) -> None:
+        """Fail the pending probe, e.g. on ICMP port unreachable.
+
+        A connection error closes the socket. Errors of a socket already
+        replaced or closed are ignored, not to touch the current one."""
+        if transport is not None and transport is not self._transport:
+            transport.close()
+            return
+        if isinstance(exc, ConnectionError) and transport is not None:
+            self._transport = None
+            transport.close()
+        if self._waiter is not None and not self._waiter.done():
+            self._waiter.set_exception(OSError(exc))
+
+    def _record_reply(self, data: bytes, latency: float) -> None:
+        self.latency = latency
+        self.last_reply = dt_util.utcnow()
+        self.device_id = data[8:12]
+        self.device_ts = int.from_bytes(data[12:16], "big")
+        self._misses = 0
+        self._set_available(True)
+
+    def _record_miss(self) -> None:
+        self._misses += 1
+        if self._misses >= self.max_misses:
+            self._set_available(False)
+
+    def _set_available(self, available: bool) -> None:
+        if available == self.available:
+            return
+        self.available = available
+        if available:
+            _LOGGER.info("Vacuum at %s is answering again", self.host)
+        else:
+            _LOGGER.info(
+                "Vacuum at %s missed %s hello probes, marking offline",
+                self.host,
+                self._misses,
+            )
+        for update_callback in list(self._listeners):
+            update_callback()
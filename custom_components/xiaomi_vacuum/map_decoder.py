@@ -0,0 +1,421 @@
+"""Decoder of the Dreame ``map_view`` property (siid 23, piid 1).
+
+The property is URL-safe base64 (``-``/``_`` instead of ``+``/``/``) of a
+zlib stream holding a 27-byte little-endian header, one byte per map pixel
+and an optional JSON trailer with the cleaned path (``tr``)::
+
+    map_id:h frame_id:h frame_type:c robot x,y,angle:3h charger x,y,angle:3h
+    pixel_size:h width:h height:h left:h top:h
+
+Coordinates are millimetres; ``left``/``top`` are those of pixel (0, 0) and
+rows grow with y. The low two bits of a pixel give its type (1 floor,
+2 wall), the upper six the room (segment) it belongs to. Pixels are mapped
+through lookup tables; the path operators are picked out with a byte mask,
+its numbers parsed by NumPy in one call and resolved with cumulative sums,
+so no Python code runs per pixel or per point.
+
+The module only needs NumPy, so it also runs outside Home Assistant::
+
+    python custom_components/xiaomi_vacuum/map_decoder.py map_view.txt
+"""
+import argparse
+import base64
+import binascii
+import json
+import struct
+import sys
+import zlib
+from dataclasses import dataclass, field
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+import numpy as np
+
+HEADER = struct.Struct("<hhc3h3h5h")
+
+# Occupancy grid values
+UNKNOWN = 0
+FREE = 1
+WALL = 2
+
+# Pixel types in the low two bits
+PIXEL_FLOOR = 1
+PIXEL_WALL = 2
+
+# Path operators: absolute moves start a new polyline, the rest are deltas
+_ABSOLUTE_OPS = np.frombuffer(b"MS", np.uint8)
+_IS_OP = np.zeros(256, dtype=bool)
+_IS_OP[np.frombuffer(b"ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz", np.uint8)] = True
+_SEPARATORS = str.maketrans(
+    {c: " " for c in ",ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz"}
+)
+
+
+def _lookup_tables():
+    pixels = np.arange(256, dtype=np.uint8)
+    kind = pixels & 0x03
+    segment = pixels >> 2
+    grid = np.full(256, UNKNOWN, dtype=np.uint8)
+    grid[(kind == PIXEL_FLOOR) | ((segment > 0) & (kind != PIXEL_WALL))] = FREE
+    grid[kind == PIXEL_WALL] = WALL
+    segments = np.where(grid == FREE, segment, 0).astype(np.uint8)
+    return grid, segments
+
+
+GRID_LUT, SEGMENT_LUT = _lookup_tables()
+
+
+class MapDecodeError(ValueError):
+    """The map_view payload is not a valid map."""
+
+
+class Pose(NamedTuple):
+    x: int
+    y: int
+    angle: int
+
+
+@dataclass
+class MapData:
+    """One decoded map frame."""
+
+    map_id: int
+    frame_id: int
+    frame_type: str  # "I" full frame, "P" partial update
+    pixel_size: int  # millimetres per pixel
+    left: int
+    top: int
+    robot: Optional[Pose]
+    charger: Optional[Pose]
+    grid: np.ndarray  # (height, width) uint8, UNKNOWN/FREE/WALL
+    segments: np.ndarray  # (height, width) uint8 room id, 0 outside rooms
+    path: np.ndarray  # (n, 2) int32 points in millimetres
+    path_starts: np.ndarray  # indices into path where a polyline starts
+    extra: dict = field(default_factory=dict)
+
+    @property
+    def width(self) -> int:
+        return self.grid.shape[1]
+
+    @property
+    def height(self) -> int:
+        return self.grid.shape[0]
+
+    def to_pixels(self, points: np.ndarray) -> np.ndarray:
+        """Convert (n, 2) millimetre coordinates to fractional pixels."""
+        origin = np.array((self.left, self.top), dtype=np.float32)
+        return (np.asarray(points, dtype=np.float32) - origin) / self.pixel_size
+
+    def polylines(self) -> List[np.ndarray]:
+        """Split the path into its polylines."""
+        return np.split(self.path, self.path_starts[1:]) if len(self.path) else []
+
+    def summary(self) -> dict:
+        counts = np.bincount(self.grid.ravel(), minlength=3)
+        return {
+            "map_id": self.map_id,
+            "frame_id": self.frame_id,
+            "frame_type": self.frame_type,
+            "size": [self.width, self.height],
+            "pixel_size": self.pixel_size,
+            "origin": [self.left, self.top],
+            "free_pixels": int(counts[FREE]),
+            "wall_pixels": int(counts[WALL]),
+            "rooms": np.unique(self.segments[self.segments > 0]).tolist(),
+            "robot": None if self.robot is None else list(self.robot),
+            "charger": None if self.charger is None else list(self.charger),
+            "path_points": len(self.path),
+            "path_polylines": len(self.path_starts),
+        }
+
+
+class PathBuffer:
+    """Cleaned path grown in place: points live in a preallocated array
+    whose capacity doubles when full, so appending a few points per frame
+    does not copy the whole path."""
+
+    def __init__(self, capacity: int = 1024) -> None:
+        self._points = np.empty((capacity, 2), dtype=np.int32)
+        self._starts = []  # type: List[int]
+        self.length = 0
+        self.generation = 0  # bumped when the path starts over
+
+    @property
+    def points(self) -> np.ndarray:
+        """View of the points so far; later appends do not change it."""
+        return self._points[: self.length]
+
+    @property
+    def starts(self) -> np.ndarray:
+        return np.array(self._starts, dtype=np.intp)
+
+    def clear(self) -> None:
+        # A fresh array keeps views handed out earlier intact
+        self._points = np.empty_like(self._points)
+        self._starts = []
+        self.length = 0
+        self.generation += 1
+
+    def extend(self, points: np.ndarray, starts: np.ndarray) -> None:
+        """Append points; starts are the new polylines, relative to points."""
+        end = self.length + len(points)
+        if end > len(self._points):
+            grown = np.empty((max(end, 2 * len(self._points)), 2), dtype=np.int32)
+            grown[: self.length] = self._points[: self.length]
+            self._points = grown
+        self._points[self.length : end] = points
+        self._starts.extend(int(start) + self.length for start in starts)
+        if self.length == 0 and len(points) and not self._starts:
+            self._starts.append(0)
+        self.length = end
+
+    def merge(self, map_data: "MapData") -> int:
+        """Add the path of a frame and return the number of new points.
+
+        Partial ("P") frames carry the path since the previous frame; full
+        frames the whole path, of which only the unseen tail is appended
+        unless it no longer extends the current path. A partial frame
+        starting at the last point continues the last polyline."""
+        points, starts = map_data.path, map_data.path_starts
+        if map_data.frame_type == "P":
+            # A frame starting where the path ended continues its polyline
+            if self.length and len(points) and np.array_equal(
+                points[0], self._points[self.length - 1]
+            ):
+                points = points[1:]
+                starts = starts[starts >= 1] - 1
+        else:
+            seen = self.length
+            extends = (
+                0 < seen <= len(points)
+                and np.array_equal(points[seen - 1], self._points[seen - 1])
+            )
+            if not extends:
+                self.clear()
+            else:
+                points = points[seen:]
+                starts = starts[starts >= seen] - seen
+        before = self.length
+        self.extend(points, starts)
+        return self.length - before
+
+
+class Region(NamedTuple):
+    """A room of the map and the rectangle around it, in millimetres."""
+
+    id: int
+    name: str
+    rect: Tuple[int, int, int, int]  # x0, y0, x1, y1
+    pixels: int
+
+
+class RegionIndex:
+    """Rooms of one map version, built once and looked up in constant time.
+
+    The segment grid already labels every pixel with its room, so finding
+    the room of a point is one array read; names map to rooms through a
+    dict, and the bounding rectangles of all rooms come from a few array
+    passes over the runs of pixels of each row.
+    Names come from the ``seg_inf`` trailer where the firmware stores them
+    base64-encoded, else rooms are called "Room <id>"."""
+
+    def __init__(self, map_data: MapData) -> None:
+        self._map = map_data
+        self.regions = {}  # type: Dict[int, Region]
+        self._names = {}  # type: Dict[str, int]
+
+        # Rooms are reduced over their horizontal runs, far fewer than pixels
+        segments = map_data.segments
+        changes = segments[:, 1:] != segments[:, :-1]
+        first = np.ones(segments.shape, dtype=bool)
+        first[:, 1:] = changes
+        last = np.ones(segments.shape, dtype=bool)
+        last[:, :-1] = changes
+        rows, col0 = np.nonzero(first & (segments > 0))
+        col1 = np.nonzero(last & (segments > 0))[1]
+        labels = segments[rows, col0]
+        if not len(labels):
+            return
+
+        counts = np.bincount(labels, weights=col1 - col0 + 1)
+        ids = np.flatnonzero(counts)
+        bounds = np.empty((4, len(counts)), dtype=np.int64)
+        bounds[:2] = np.iinfo(np.int64).max
+        bounds[2:] = -1
+        np.minimum.at(bounds[0], labels, col0)
+        np.minimum.at(bounds[1], labels, rows)
+        np.maximum.at(bounds[2], labels, col1)
+        np.maximum.at(bounds[3], labels, rows)
+        bounds = bounds[:, ids].T
+
+        size = map_data.pixel_size
+        names = map_data.extra.get("seg_inf")
+        if not isinstance(names, dict):
+            names = {}
+        for room, (col0, row0, col1, row1) in zip(ids.tolist(), bounds.tolist()):
+            rect = (
+                map_data.left + col0 * size,
+                map_data.top + row0 * size,
+                map_data.left + (col1 + 1) * size,
+                map_data.top + (row1 + 1) * size,
+            )
+            name = _room_name(names.get(str(room))) or "Room %s" % room
+            self.regions[room] = Region(room, name, rect, int(counts[room]))
+            self._names.setdefault(name.casefold(), room)
+            self._names.setdefault(str(room), room)
+
+    def __len__(self) -> int:
+        return len(self.regions)
+
+    def by_name(self, name: str) -> Optional[Region]:
+        """The room called name (case-insensitive) or with that id."""
+        room = self._names.get(str(name).strip().casefold())
+        return None if room is None else self.regions[room]
+
+    def at(self, x: int, y: int) -> Optional[Region]:
+        """The room holding the point (millimetres), if any."""
+        map_data = self._map
+        col = (x - map_data.left) // map_data.pixel_size
+        row = (y - map_data.top) // map_data.pixel_size
+        if not (0 <= row < map_data.height and 0 <= col < map_data.width):
+            return None
+        return self.regions.get(int(map_data.segments[row, col]))
+
+
+def _room_name(info) -> Optional[str]:
+    if not isinstance(info, dict) or not info.get("name"):
+        return None
+    try:
+        return base64.b64decode(info["name"], validate=True).decode("utf-8")
+    except (binascii.Error, UnicodeDecodeError):
+        return str(info["name"])
+
+
+def _pose(x: int, y: int, angle: int) -> Optional[Pose]:
+    # The firmware reports 0, 0 for a pose it does not know
+    if x == 0 and y == 0:
+        return None
+    return Pose(x, y, angle)
+
+
+def parse_path(path: str):
+    """Parse a ``tr`` path string into (points, polyline start indices).
+
+    The string is a run of ``<op>x,y`` tokens; operators are picked out
+    of the bytes and the numbers parsed in one go by NumPy."""
+    if not isinstance(path, str):
+        raise MapDecodeError("Invalid map path: %r" % type(path).__name__)
+    try:
+        chars = np.frombuffer(path.encode("ascii"), np.uint8)
+    except UnicodeEncodeError as ex:
+        raise MapDecodeError("Invalid map path: %s" % ex) from ex
+    ops = chars[_IS_OP[chars]]
+    values = np.fromstring(path.translate(_SEPARATORS), dtype=np.int32, sep=" ")
+    if not len(ops) or len(values) != 2 * len(ops):
+        return np.zeros((0, 2), dtype=np.int32), np.zeros(0, dtype=np.intp)
+    values = values.reshape(-1, 2)
+
+    absolute = np.isin(ops, _ABSOLUTE_OPS)
+    # A leading delta is taken from the origin, i.e. as an absolute point
+    absolute[0] = True
+
+    # Each point is the last absolute point plus the deltas since then
+    deltas = np.where(absolute[:, None], 0, values)
+    offsets = np.cumsum(deltas, axis=0)
+    anchor = np.maximum.accumulate(np.where(absolute, np.arange(len(ops)), 0))
+    points = values[anchor] + offsets - offsets[anchor]
+    return points.astype(np.int32), np.flatnonzero(absolute)
+
+
+def decode_map(payload: str) -> MapData:
+    """Decode a map_view value."""
+    if not payload:
+        raise MapDecodeError("Empty map payload")
+    try:
+        data = base64.b64decode(
+            payload.strip().replace("-", "+").replace("_", "/"), validate=False
+        )
+        raw = zlib.decompress(data)
+    except (ValueError, zlib.error) as ex:
+        raise MapDecodeError("Invalid map payload: %s" % ex) from ex
+
+    if len(raw) < HEADER.size:
+        raise MapDecodeError("Map payload too short: %s bytes" % len(raw))
+    (
+        map_id,
+        frame_id,
+        frame_type,
+        robot_x,
+        robot_y,
+        robot_angle,
+        charger_x,
+        charger_y,
+        charger_angle,
+        pixel_size,
+        width,
+        height,
+        left,
+        top,
+    ) = HEADER.unpack_from(raw)
+
+    pixel_count = width * height
+    if width < 0 or height < 0 or len(raw) < HEADER.size + pixel_count:
+        raise MapDecodeError(
+            "Map of %sx%s does not fit in %s bytes" % (width, height, len(raw))
+        )
+    pixels = np.frombuffer(raw, np.uint8, pixel_count, HEADER.size).reshape(
+        height, width
+    )
+
+    extra = {}
+    trailer = raw[HEADER.size + pixel_count :].strip(b"\x00")
+    if trailer:
+        try:
+            extra = json.loads(trailer)
+        except ValueError as ex:
+            raise MapDecodeError("Invalid map trailer: %s" % ex) from ex
+        if not isinstance(extra, dict):
+            raise MapDecodeError("Invalid map trailer: %s" % type(extra).__name__)
+    path, path_starts = parse_path(extra.get("tr", ""))
+
+    return MapData(
+        map_id=map_id,
+        frame_id=frame_id,
+        frame_type=frame_type.decode("ascii", "replace"),
+        pixel_size=pixel_size or 50,
+        left=left,
+        top=top,
+        robot=_pose(robot_x, robot_y, robot_angle),
+        charger=_pose(charger_x, charger_y, charger_angle),
+        grid=GRID_LUT[pixels],
+        segments=SEGMENT_LUT[pixels],
+        path=path,
+        path_starts=path_starts,
+        extra=extra,
+    )
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Decode a Dreame map_view value.")
+    parser.add_argument("payload", help="file holding the map_view value, - for stdin")
+    parser.add_argument("--grid", help="save the occupancy grid as .npy")
+    args = parser.parse_args(argv)
+
+    if args.payload == "-":
+        payload = sys.stdin.read()
+    else:
+        with open(args.payload, encoding="ascii") as f:
+            payload = f.read()
+
+    try:
+        map_data = decode_map(payload)
+    except MapDecodeError as ex:
+        print(ex, file=sys.stderr)
+        return 1
+    if args.grid:
+        np.save(args.grid, map_data.grid)
+    print(json.dumps(map_data.summary(), indent=2))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,160 @@
+"""Map tracking for Xiaomi Vacuum 1C.
+
+Fetches ``map_view`` outside the regular poll, and only when the map can
+have changed: once at start, every ``fetch_interval`` seconds while the
+vacuum cleans and once more when the clean ends. The robot is asked to
+refresh its map (``map_req``) at most every ``request_interval`` seconds.
+The cleaned path is accumulated in a :class:`PathBuffer`, so a frame only
+adds its new points, and the rooms are indexed once per base map."""
+
+import hashlib
+import logging
+import time
+
+from homeassistant.core import CALLBACK_TYPE, HomeAssistant, callback
+
+from .const import MAP_FETCH_INTERVAL, MAP_REQUEST_INTERVAL
+from .map_decoder import (
+    MapData,
+    MapDecodeError,
+    PathBuffer,
+    RegionIndex,
+    decode_map,
+)
+
+_LOGGER = logging.getLogger(__name__)
+
+MAP_FIELDS = frozenset({"map_view"})
+STATUS_CLEANING = 1
+
+
+class MapTracker:
+    """Latest base map, robot pose and accumulated path of one vacuum."""
+
+    def __init__(
+        self,
+        hass: HomeAssistant,
+        client,
+        coordinator,
+        *,
+        fetch_interval: float = MAP_FETCH_INTERVAL,
+        request_interval: float = MAP_REQUEST_INTERVAL,
+    ) -> None:
+        self.hass = hass
+        self.client = client
+        self.coordinator = coordinator
+        self.fetch_interval = fetch_interval
+        self.request_interval = request_interval
+
+        self.base = None  # type: MapData | None
+        self.base_hash = None  # digest of the base map pixels
+        self.regions = None  # type: RegionIndex | None
+        self.path = PathBuffer()
+        self.robot = None
+
+        self._payload = None
+        self._fetching = False
+        self._cleaning = False
+        self._final_pending = False
+        self._last_fetch = None  # monotonic
+        self._last_request = None  # monotonic, executor thread only
+
+    @property
+    def content_key(self):
+        """Changes whenever the rendered map would."""
+        return (self.base_hash, self.path.generation, self.path.length, self.robot)
+
+    @callback
+    def async_start(self) -> CALLBACK_TYPE:
+        """Follow the coordinator; return the function stopping it."""
+        unsub = self.coordinator.async_add_listener(self._handle_coordinator_update)
+        self._handle_coordinator_update()
+        return unsub
+
+    @callback
+    def _handle_coordinator_update(self) -> None:
+        state = self.coordinator.data
+        if state is None:
+            return
+        cleaning = state.status == STATUS_CLEANING
+        if self._cleaning and not cleaning:
+            self._final_pending = True  # fetch the finished map once more
+        self._cleaning = cleaning
+
+        if self._last_fetch is None:
+            wanted = True
+        elif cleaning:
+            wanted = time.monotonic() - self._last_fetch >= self.fetch_interval
+        else:
+            wanted = self._final_pending
+        if self._fetching or not wanted:
+            return
+
+        self._final_pending = False
+        self._fetching = True
+        self._last_fetch = time.monotonic()
+        self.hass.async_create_background_task(
+            self._async_fetch(cleaning), f"xiaomi_vacuum map fetch {self.client.ip}"
+        )
+
+    async def _async_fetch(self, cleaning: bool) -> None:
+        try:
+            fetched = await self.hass.async_add_executor_job(self._fetch, cleaning)
+        except MapDecodeError as err:
+            _LOGGER.debug("Unable to decode the map of %s: %s", self.client.ip, err)
+            return
+        except Exception as err:  # noqa: BLE001
+            _LOGGER.debug("Unable to fetch the map of %s: %s", self.client.ip, err)
+            return
+        finally:
+            self._fetching = False
+
+        if fetched is not None:
+            self._apply(*fetched)
+
+    def _fetch(self, cleaning: bool):
+        """Request, fetch and decode map_view; None if it did not change.
+
+        Returns the map with the digest and room index of its base map when
+        that changed, so neither is computed in the event loop."""
+        now = time.monotonic()
+        if cleaning and (
+            self._last_request is None
+            or now - self._last_request >= self.request_interval
+        ):
+            self._last_request = now
+            self.client.map_req()
+
+        payload = self.client.status(MAP_FIELDS).map_view
+        if not payload or payload == self._payload:
+            return None
+        self._payload = payload
+        map_data = decode_map(payload)
+
+        # Partial frames update the path and the robot, not the base map
+        if map_data.frame_type == "P":
+            return map_data, None, None
+        digest = hashlib.blake2b(map_data.grid.tobytes(), digest_size=16)
+        digest.update(map_data.segments.tobytes())
+        digest.update(repr(map_data.charger).encode())
+        digest.update(repr(map_data.extra.get("seg_inf")).encode())
+        if digest.digest() == self.base_hash:
+            return map_data, None, None
+        return map_data, digest.digest(), RegionIndex(map_data)
+
+    def _apply(self, map_data: MapData, base_hash, regions) -> None:
+        if base_hash is not None:
+            self.base = map_data
+            self.base_hash = base_hash
+            self.regions = regions
+        if self.base is None:
+            return
+        added = self.path.merge(map_data)
+        if map_data.robot is not None:
+            self.robot = map_data.robot
+        _LOGGER.debug(
+            "Map of %s: frame %s, %s new path points",
+            self.client.ip,
+            map_data.frame_id,
+            added,
+        )
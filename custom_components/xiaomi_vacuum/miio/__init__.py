@@ -1,6 +1,6 @@
 
 from .device import Device
 from .dreamevacuum import DreameVacuum
-from .exceptions import DeviceError, DeviceException
+from .exceptions import CircuitOpenError, DeviceError, DeviceException
 
 from .protocol import Message, Utils
@@ -0,0 +1,127 @@
+"""Circuit breaker for the miIO transport.
+
+Keeps requests to an unreachable device from tying up a thread for the full
+handshake and retry cycle on every call."""
+import logging
+import threading
+import time
+from enum import Enum
+
+_LOGGER = logging.getLogger(__name__)
+
+
+class CircuitState(Enum):
+    Closed = "closed"
+    Open = "open"
+    HalfOpen = "half_open"
+
+
+class CircuitBreaker:
+    """Per-device circuit breaker with exponential backoff.
+
+    After ``failure_threshold`` consecutive failures the circuit opens and
+    requests are refused until the backoff expires. The circuit then goes
+    half-open and lets a single probe request through: success closes it,
+    failure re-opens it with the backoff doubled up to ``max_backoff``."""
+
+    def __init__(
+        self,
+        failure_threshold: int = 2,
+        base_backoff: float = 15.0,
+        max_backoff: float = 300.0,
+    ) -> None:
+        self.failure_threshold = failure_threshold
+        self.base_backoff = base_backoff
+        self.max_backoff = max_backoff
+
+        self._lock = threading.Lock()
+        self._state = CircuitState.Closed
+        self._failures = 0
+        self._backoff = base_backoff
+        self._open_until = 0.0
+        self._probe_in_flight = False
+
+    @property
+    def state(self) -> CircuitState:
+        with self._lock:
+            return self._current_state()
+
+    @property
+    def failures(self) -> int:
+        """Number of consecutive failures."""
+        return self._failures
+
+    @property
+    def retry_in(self) -> float:
+        """Seconds until the next probe is let through, 0 if not open."""
+        return max(0.0, self._open_until - time.monotonic())
+
+    def _current_state(self) -> CircuitState:
+        if (
+            self._state is CircuitState.Open
+            and time.monotonic() >= self._open_until
+        ):
+            self._state = CircuitState.HalfOpen
+            self._probe_in_flight = False
+        return self._state
+
+    def allow(self) -> bool:
+        """Return True if a request may be sent now."""
+        with self._lock:
+            state = self._current_state()
+            if state is CircuitState.Closed:
+                return True
+            if state is CircuitState.HalfOpen and not self._probe_in_flight:
+                self._probe_in_flight = True
+                return True
+            return False
+
+    def record_success(self) -> None:
+        with self._lock:
+            if self._state is not CircuitState.Closed:
+                _LOGGER.info("Device answering again, closing circuit")
+            self._state = CircuitState.Closed
+            self._failures = 0
+            self._backoff = self.base_backoff
+            self._probe_in_flight = False
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self._failures += 1
+            state = self._current_state()
+            if state is CircuitState.HalfOpen:
+                self._backoff = min(self._backoff * 2, self.max_backoff)
+                self._open(self._backoff)
+            elif (
+                state is CircuitState.Closed
+                and self._failures >= self.failure_threshold
+            ):
+                self._backoff = self.base_backoff
+                self._open(self._backoff)
+
+    def release(self) -> None:
+        """Give back a half-open probe slot without recording an outcome."""
+        with self._lock:
+            self._probe_in_flight = False
+
+    def reset(self) -> None:
+        """Close the circuit, e.g. when the device is known to be back."""
+        self.record_success()
+
+    def _open(self, backoff: float) -> None:
+        _LOGGER.info(
+            "Device not responding after %s failures, opening circuit for %ss",
+            self._failures,
+            backoff,
+        )
+        self._state = CircuitState.Open
+        self._open_until = time.monotonic() + backoff
+        self._probe_in_flight = False
+
+    def as_dict(self) -> dict:
+        """Return the breaker state for diagnostics."""
+        return {
+            "state": self.state.value,
+            "failures": self._failures,
+            "retry_in": round(self.retry_in, 1),
+        }
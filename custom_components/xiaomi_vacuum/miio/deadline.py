@@ -0,0 +1,36 @@
+"""Time budget shared by all layers of a (multi-request) operation."""
+import time
+
+from .exceptions import DeadlineExceeded
+
+
+class Deadline:
+    """Point in time by which an operation has to be done.
+
+    A single instance is passed down from the caller to the transport, so
+    every chunk, retry and handshake draws from the same budget instead of
+    applying its own timeout. Properties that could not be fetched in time
+    are collected in :attr:`skipped`."""
+
+    def __init__(self, budget: float) -> None:
+        self.budget = budget
+        self._expires = time.monotonic() + budget
+        self.skipped = []
+
+    @property
+    def remaining(self) -> float:
+        """Seconds left, 0 when expired."""
+        return max(0.0, self._expires - time.monotonic())
+
+    @property
+    def expired(self) -> bool:
+        return time.monotonic() >= self._expires
+
+    def timeout(self, default: float) -> float:
+        """Return ``default`` capped to the remaining budget.
+
+        :raises DeadlineExceeded: if the budget is used up"""
+        remaining = self._expires - time.monotonic()
+        if remaining <= 0:
+            raise DeadlineExceeded("Time budget of %ss exceeded" % self.budget)
+        return min(default, remaining)
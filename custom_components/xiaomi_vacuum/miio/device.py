@@ -1,12 +1,16 @@
+import binascii
 import logging
 from enum import Enum
-from typing import Any, Optional  # noqa: F401
+from typing import Any, Callable, Optional  # noqa: F401
 
 import click
 
 from .click_common import DeviceGroupMeta, LiteralParamType, command, format_output
-from .exceptions import DeviceException
-from .miioprotocol import MiIOProtocol
+from .exceptions import DeadlineExceeded, DeviceError
+from .metrics import DeviceMetrics, TransportCounters
+from .miioprotocol import DiscoveredDevice, MiIOProtocol
+from .recording import TrafficRecorder
+from .trace import PacketTrace
 
 _LOGGER = logging.getLogger(__name__)
 
@@ -123,18 +127,98 @@ class Device(metaclass=DeviceGroupMeta):
         start_id: int = 0,
         debug: int = 0,
         lazy_discover: bool = True,
+        port: int = 54321,
+        protocol: MiIOProtocol = None,
     ) -> None:
-        self.ip = ip
         self.token = token
-        self._protocol = MiIOProtocol(ip, token, start_id, debug, lazy_discover)
+        if protocol is None:
+            protocol = MiIOProtocol(ip, token, start_id, debug, lazy_discover, port)
+        self._protocol = protocol
         self.device_type = DeviceType.MiIO
 
-    def send(self, command: str, parameters: Any = None, retry_count=3) -> Any:
-        return self._protocol.send(command, parameters, retry_count)
+    def send(
+        self, command: str, parameters: Any = None, retry_count=3, *, deadline=None
+    ) -> Any:
+        return self._protocol.send(command, parameters, retry_count, deadline)
+
+    def send_pipelined(self, requests, retry_count=3) -> Any:
+        return self._protocol.send_pipelined(requests, retry_count)
+
+    def send_nowait(self, command: str, parameters: Any = None) -> int:
+        return self._protocol.send_nowait(command, parameters)
+
+    def close_nowait(self) -> None:
+        self._protocol.close_nowait()
 
     def send_handshake(self):
         return self._protocol.send_handshake()
 
+    def prime_handshake(self, device: DiscoveredDevice) -> None:
+        """Reuse the hello reply of a broadcast discovery as handshake."""
+        self._protocol.prime_handshake(device)
+
+    @property
+    def device_id(self) -> Optional[str]:
+        """Device id from the last handshake as hex string, None before it."""
+        if self._protocol._device_id is None:
+            return None
+        return binascii.hexlify(self._protocol._device_id).decode()
+
+    @property
+    def ip(self) -> str:
+        """Address of the device, following it when rediscovered elsewhere."""
+        return self._protocol.ip
+
+    def rediscover(self) -> bool:
+        """Broadcast for the device id; True if it moved to a new address."""
+        return self._protocol.rediscover()
+
+    @property
+    def on_address_change(self) -> Optional[Callable[[str], None]]:
+        """Called from the request thread with the device's new address."""
+        return self._protocol.on_address_change
+
+    @on_address_change.setter
+    def on_address_change(self, callback: Optional[Callable[[str], None]]) -> None:
+        self._protocol.on_address_change = callback
+
+    @property
+    def circuit_breaker(self):
+        """Circuit breaker guarding the connection to the device."""
+        return self._protocol.breaker
+
+    @property
+    def counters(self) -> TransportCounters:
+        """Request counters, round trip and poll histograms."""
+        return self._protocol.counters
+
+    @property
+    def trace(self) -> PacketTrace:
+        """Ring buffer of the last packets exchanged with the device."""
+        return self._protocol.trace
+
+    @property
+    def metrics(self) -> Optional[DeviceMetrics]:
+        """Stage timings of the requests, None unless enabled."""
+        return self._protocol.metrics
+
+    def start_recording(self, path: str, model: str = None) -> TrafficRecorder:
+        """Append every answered request and its reply to a JSON lines file."""
+        self.stop_recording()
+        self._protocol.recorder = TrafficRecorder(path, model)
+        return self._protocol.recorder
+
+    def stop_recording(self) -> None:
+        if self._protocol.recorder is not None:
+            self._protocol.recorder.close()
+            self._protocol.recorder = None
+
+    def enable_metrics(self) -> DeviceMetrics:
+        """Start timing every stage of the requests to the device."""
+        if self._protocol.metrics is None:
+            self._protocol.metrics = DeviceMetrics()
+        return self._protocol.metrics
+
     @command(
         click.argument("command", type=str, required=True),
         click.argument("parameters", type=LiteralParamType(), required=False),
@@ -191,7 +275,14 @@ class Device(metaclass=DeviceGroupMeta):
 
         return self._protocol.send("miIO.config_router", params)[0]
 
-    def get_properties(self, properties, *, max_properties=None):
+    def get_properties(self, properties, *, max_properties=None, deadline=None):
+        """Request the given properties, max_properties at a time.
+
+        When the optional deadline runs out, the remaining properties are not
+        requested: their values are None and they are added to
+        ``deadline.skipped``. A batch the device answers with an error reads
+        as None too; transport failures (no response, open circuit) are
+        raised, not to pass a status of None values for a successful poll."""
         if self.device_type == DeviceType.MiOT:
             get_property_method = "get_properties"
         else:
@@ -203,9 +294,22 @@ class Device(metaclass=DeviceGroupMeta):
         while _props:
             try:
                 properties_to_request = _props[:max_properties]
-                values.extend(self.send(get_property_method, properties_to_request))
-            except DeviceException:
+                values.extend(
+                    self.send(
+                        get_property_method, properties_to_request, deadline=deadline
+                    )
+                )
+            except DeadlineExceeded:
+                if len(_props) == len(properties):
+                    raise
+                _LOGGER.debug("Out of time, skipping %s properties", len(_props))
+                self.counters.add("skipped_properties", len(_props))
+                deadline.skipped.extend(_props)
+                values.extend([None] * len(_props))
+                break
+            except DeviceError:
                 _LOGGER.debug("Skipping unsupported MIoT properties: %s", properties_to_request)
+                self.counters.add("unsupported_properties", len(properties_to_request))
                 values.extend([None] * len(properties_to_request))
 
             if max_properties is None:
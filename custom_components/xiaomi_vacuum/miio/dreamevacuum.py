@@ -1,9 +1,14 @@
+import json
 import logging
-from dataclasses import dataclass, field
+import operator
+from dataclasses import dataclass, field, fields
 from enum import Enum
+from itertools import compress
+from typing import Tuple
 
 import click
 from .click_common import command
+from .exceptions import DeviceException
 from .miot_device import MiotDevice
 
 _LOGGER = logging.getLogger(__name__)
@@ -69,8 +74,14 @@ class WaterLevel(Enum):
     Medium = 2
     High = 3
 
-@dataclass
+@dataclass(slots=True)
 class DreameStatus:
+    """One status snapshot.
+
+    Slotted, as one is kept per poll: no per-instance ``__dict__``, and
+    :meth:`as_tuple` reads all fields in one C call, which is what
+    :meth:`diff` compares."""
+
     _max_properties = 10
     # siid 2: (Battery): 2 props, 1 actions
     # piid: 1 (Battery Level): (uint8, unit: percentage) (acc: ['read', 'notify'], value-list: [], value-range: [0, 100, 1])
@@ -239,6 +250,33 @@ class DreameStatus:
         metadata={"siid": 25, "piid": 1, "access": ["read", "notify"]},
         default=None
     )
+    # not a device property: fields not fetched before the deadline ran out
+    stale_fields: frozenset = field(default=frozenset())
+
+    @classmethod
+    def from_tuple(cls, values: Tuple) -> "DreameStatus":
+        """Build a snapshot from the values of all fields, in FIELDS order."""
+        return cls(*values)
+
+    def as_tuple(self) -> Tuple:
+        """The values of all fields, in FIELDS order."""
+        return _GET_ALL(self)
+
+    def diff(self, other: "DreameStatus") -> Tuple[str, ...]:
+        """Names of the fields whose value differs in other."""
+        mine, theirs = _GET_ALL(self), _GET_ALL(other)
+        if mine == theirs:
+            return ()
+        return tuple(compress(FIELDS, map(operator.ne, mine, theirs)))
+
+
+# Field names in declaration order; as_tuple()[i] is the value of FIELDS[i]
+FIELDS = tuple(f.name for f in fields(DreameStatus))
+_GET_ALL = operator.attrgetter(*FIELDS)
+
+
+# Input of action 18/1 (start-clean), shared by start() and apply_profile()
+START_PAYLOAD = [{"piid": 1, "value": 2}]
 
 
 class DreameVacuum(MiotDevice):
@@ -247,20 +285,24 @@ class DreameVacuum(MiotDevice):
     _MAPPING = DreameStatus
 
     @command()
-    def status(self) -> DreameStatus:
-        return self.get_properties_for_dataclass(DreameStatus)
+    def status(self, fields=None, deadline=None) -> DreameStatus:
+        """Return the device status, limited to the given fields if any."""
+        return self.get_properties_for_dataclass(DreameStatus, fields, deadline)
 
     def call_action(self, siid, aiid, params=None):
+        return self.send("action", self.action_payload(siid, aiid, params))
+
+    @staticmethod
+    def action_payload(siid, aiid, params=None) -> dict:
         # {"did":"<mydeviceID>","siid":18,"aiid":1,"in":[{"piid":1,"value":2}]
         if params is None:
             params = []
-        payload = {
+        return {
             "did": f"call-{siid}-{aiid}",
             "siid": siid,
             "aiid": aiid,
             "in": params,
         }
-        return self.send("action", payload)
 
     @command(click.argument("speed", type=int))
     def set_fan_speed(self, speed):
@@ -321,8 +363,7 @@ class DreameVacuum(MiotDevice):
     def start(self) -> None:
         """Start cleaning."""
         # TODO: find out other values
-        payload = [{"piid": 1, "value": 2}]
-        return self.call_action(18, 1, payload)
+        return self.call_action(18, 1, START_PAYLOAD)
 
     # aiid 2 stop-clean: in: [] -> out: []
     @command()
@@ -336,6 +377,17 @@ class DreameVacuum(MiotDevice):
         payload = [{"piid": 1, "value": 19},{"piid": 21, "value": coords}]
         return self.call_action(18, 1, payload)
 
+    @staticmethod
+    def zone_payload(zones, repeats=1, fan_speed=0, water_level=1) -> str:
+        """Return the zone_cleanup coords for (x0, y0, x1, y1) rectangles.
+
+        Each zone is ``[x0, y0, x1, y1, repeats, fan speed, water level]``,
+        coordinates in millimetres; one request carries them all."""
+        rows = [
+            [*map(int, zone), repeats, fan_speed, water_level] for zone in zones
+        ]
+        return json.dumps(rows, separators=(",", ":"))
+
     # siid 21: (remote): 2 props, 3 actions
     # aiid 1 start-remote: in: [1, 2] -> out: []
     @command()
@@ -343,6 +395,21 @@ class DreameVacuum(MiotDevice):
         """aiid 1 start-remote: in: [1, 2] -> out: []"""
         return self.call_action(21, 1)
 
+    @command(
+        click.argument("rotation", type=int),
+        click.argument("velocity", type=int),
+    )
+    def remote_move(self, rotation, velocity) -> int:
+        """Move by remote control, without waiting for the reply.
+
+        Rotation is -128..128, velocity -300..100; both are sent as the
+        deg and speed strings of start-remote. Return the request id."""
+        params = [
+            {"piid": 1, "value": str(rotation)},
+            {"piid": 2, "value": str(velocity)},
+        ]
+        return self.send_nowait("action", self.action_payload(21, 1, params))
+
     # aiid 2 stop-remote: in: [] -> out: []
     @command()
     def stop_remote(self) -> None:
@@ -391,3 +458,35 @@ class DreameVacuum(MiotDevice):
     def set_water_level(self, water):
         """Set water level"""
         return self.set_property(water_level=water)
+
+    @command(
+        click.option("--fan-speed", type=int),
+        click.option("--water-level", type=int),
+        click.option("--audio-volume", type=int),
+        click.option("--start", is_flag=True),
+    )
+    def apply_profile(
+        self, fan_speed=None, water_level=None, audio_volume=None, start=False
+    ):
+        """Set fan speed, water level and volume at once, optionally start cleaning.
+
+        The properties are written with a single ``set_properties`` request and
+        the start action is pipelined right behind it."""
+        profile = {
+            "fan_speed": fan_speed,
+            "water_level": water_level,
+            "audio_volume": audio_volume,
+        }
+        profile = {key: value for key, value in profile.items() if value is not None}
+
+        requests = []
+        if profile:
+            properties = self.properties_from_dataclass(self._MAPPING(**profile))
+            requests.append(("set_properties", properties))
+        if start:
+            requests.append(("action", self.action_payload(18, 1, START_PAYLOAD)))
+
+        if not requests:
+            raise DeviceException("No values to set!")
+
+        return self.send_pipelined(requests)
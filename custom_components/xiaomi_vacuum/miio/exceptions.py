@@ -16,3 +16,15 @@ class RecoverableError(DeviceError):
     """Exception communicating an recoverable error delivered by the target device."""
 
     pass
+
+
+class CircuitOpenError(DeviceException):
+    """Exception raised while requests to an unreachable device are refused."""
+
+    pass
+
+
+class DeadlineExceeded(DeviceException):
+    """Exception raised when the time budget of an operation runs out."""
+
+    pass
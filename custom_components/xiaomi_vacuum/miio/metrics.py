@@ -0,0 +1,239 @@
+"""Counters and per-stage timing of miIO requests.
+
+:class:`TransportCounters` is always kept by the transport: a handful of
+integer additions per request plus round trip and poll histograms.
+
+Stage timing is opt-in per device: :class:`DeviceMetrics` is attached to the
+transport, which makes it the current recorder while a request runs so the
+encryption layer can time its stages without knowing the device. When no
+recorder is set every timing point is a context variable lookup and a
+shared no-op context manager."""
+import bisect
+import contextvars
+import copy
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager, nullcontext
+from typing import Dict, Optional, Sequence, Tuple
+
+# Upper bounds in seconds, from AES on a fast CPU to a poll timing out
+LATENCY_BUCKETS = (
+    0.0001,
+    0.00025,
+    0.0005,
+    0.001,
+    0.0025,
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1.0,
+    2.5,
+    5.0,
+    10.0,
+)
+
+# Stages of a request, in the order they happen
+STAGES = (
+    "json_encode",
+    "encrypt",
+    "build",
+    "sendto",
+    "wait",
+    "parse",
+    "decrypt",
+    "json_decode",
+    "request",
+    "dataclass",
+    "poll",
+    "fanout",
+)
+
+# Always-on counters: name -> help text
+COUNTERS = {
+    "requests": "Requests sent, retries and resends included",
+    "nowait_requests": "Requests sent without waiting for their reply",
+    "retries": "Requests retried after a timeout or a recoverable error",
+    "handshakes": "Hello handshakes sent",
+    "rediscoveries": "Broadcasts looking for the device at a new address",
+    "timeouts": "Requests and handshakes left unanswered",
+    "checksum_errors": "Replies failing the checksum (wrong token or corruption)",
+    "quirk_hits": "Replies that only decoded after a json workaround",
+    "sent_bytes": "Bytes sent, handshakes included",
+    "received_bytes": "Bytes received, handshakes included",
+    "unsupported_properties": "Properties skipped as unsupported by the device",
+    "skipped_properties": "Properties skipped because the poll ran out of time",
+    "polls": "Status polls",
+    "poll_failures": "Status polls that failed",
+}
+
+_NOOP = nullcontext()
+_current = contextvars.ContextVar("miio_metrics", default=None)
+_counters = contextvars.ContextVar("miio_counters", default=None)
+
+
+class Histogram:
+    """Fixed-bucket histogram; observing is a bisect and two additions."""
+
+    def __init__(self, bounds: Sequence[float] = LATENCY_BUCKETS) -> None:
+        self.bounds = tuple(bounds)
+        self.counts = [0] * (len(self.bounds) + 1)
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect.bisect_left(self.bounds, value)] += 1
+        self.count += 1
+        self.sum += value
+        if value > self.max:
+            self.max = value
+
+    def quantile(self, q: float) -> Optional[float]:
+        """Estimate a quantile by interpolating inside its bucket."""
+        if not self.count:
+            return None
+        rank = q * self.count
+        seen = 0
+        for index, count in enumerate(self.counts):
+            if seen + count >= rank and count:
+                if index == len(self.bounds):
+                    return self.max
+                lower = self.bounds[index - 1] if index else 0.0
+                upper = min(self.bounds[index], self.max)
+                return lower + (upper - lower) * (rank - seen) / count
+            seen += count
+        return self.max
+
+    @property
+    def mean(self) -> Optional[float]:
+        return self.sum / self.count if self.count else None
+
+    def summary(self) -> dict:
+        """Return count, mean, p50/p95/p99 and max in milliseconds."""
+
+        def ms(value):
+            return None if value is None else round(value * 1000, 3)
+
+        return {
+            "count": self.count,
+            "mean_ms": ms(self.mean),
+            "p50_ms": ms(self.quantile(0.5)),
+            "p95_ms": ms(self.quantile(0.95)),
+            "p99_ms": ms(self.quantile(0.99)),
+            "max_ms": ms(self.max if self.count else None),
+        }
+
+
+class TransportCounters:
+    """Always-on request counters, round trip and poll histograms of a device."""
+
+    def __init__(self) -> None:
+        self.values = dict.fromkeys(COUNTERS, 0)
+        self.rtt = Histogram()
+        self.poll = Histogram()
+        self._lock = threading.Lock()
+
+    def add(self, name: str, value: int = 1) -> None:
+        with self._lock:
+            self.values[name] += value
+
+    def observe_rtt(self, seconds: float) -> None:
+        with self._lock:
+            self.rtt.observe(seconds)
+
+    def observe_poll(self, seconds: float) -> None:
+        with self._lock:
+            self.poll.observe(seconds)
+
+    def snapshot(self) -> Tuple[Dict[str, int], Dict[str, Histogram]]:
+        """Return consistent copies of the counters and histograms."""
+        with self._lock:
+            return dict(self.values), {
+                "rtt_seconds": copy.deepcopy(self.rtt),
+                "poll_duration_seconds": copy.deepcopy(self.poll),
+            }
+
+
+class DeviceMetrics:
+    """Stage histograms and retry rate of one device."""
+
+    def __init__(self, bounds: Sequence[float] = LATENCY_BUCKETS) -> None:
+        self.stages = {stage: Histogram(bounds) for stage in STAGES}
+        self.retries = 0
+        self._retry_times = deque()
+        self._lock = threading.Lock()
+
+    def observe(self, stage: str, seconds: float) -> None:
+        with self._lock:
+            self.stages[stage].observe(seconds)
+
+    @contextmanager
+    def time(self, stage: str):
+        """Time the body of the with block as the given stage."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(stage, time.perf_counter() - start)
+
+    def record_retry(self) -> None:
+        now = time.monotonic()
+        with self._lock:
+            self.retries += 1
+            self._retry_times.append(now)
+
+    @property
+    def retries_per_minute(self) -> int:
+        """Retries during the last 60 seconds."""
+        horizon = time.monotonic() - 60
+        with self._lock:
+            while self._retry_times and self._retry_times[0] < horizon:
+                self._retry_times.popleft()
+            return len(self._retry_times)
+
+    def summary(self) -> dict:
+        return {
+            "stages": {
+                stage: histogram.summary()
+                for stage, histogram in self.stages.items()
+                if histogram.count
+            },
+            "retries": self.retries,
+            "retries_per_minute": self.retries_per_minute,
+        }
+
+
+def current() -> Optional[DeviceMetrics]:
+    """Return the recorder of the request running in this context, if any."""
+    return _current.get()
+
+
+def current_counters() -> Optional[TransportCounters]:
+    """Return the counters of the request running in this context, if any."""
+    return _counters.get()
+
+
+def timed(recorder: Optional[DeviceMetrics], stage: str):
+    """Context manager timing a stage, a no-op without recorder."""
+    if recorder is None:
+        return _NOOP
+    return recorder.time(stage)
+
+
+@contextmanager
+def recording(
+    counters: TransportCounters, recorder: Optional[DeviceMetrics] = None
+):
+    """Make counters and recorder the current ones for the with block."""
+    counters_token = _counters.set(counters)
+    token = _current.set(recorder)
+    try:
+        yield recorder
+    finally:
+        _current.reset(token)
+        _counters.reset(counters_token)
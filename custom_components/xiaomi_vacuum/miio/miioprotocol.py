@@ -8,15 +8,50 @@ import codecs
 import datetime
 import logging
 import socket
-from typing import Any, List
+import threading
+import time
+from typing import Any, Callable, Dict, List, NamedTuple, Optional, Tuple
 
 import construct
 
-from .exceptions import DeviceError, DeviceException, RecoverableError
+from . import metrics
+from .circuitbreaker import CircuitBreaker, CircuitState
+from .exceptions import (
+    CircuitOpenError,
+    DeadlineExceeded,
+    DeviceError,
+    DeviceException,
+    RecoverableError,
+)
 from .protocol import Message
+from .trace import HELLO, IN, OUT, TIMEOUT, PacketTrace
 
 _LOGGER = logging.getLogger(__name__)
 
+# magic, length 32
+HELLO_BYTES = bytes.fromhex(
+    "21310020ffffffffffffffffffffffffffffffffffffffffffffffffffffffff"
+)
+
+# Consecutive failures before looking for the device at another address,
+# minimum seconds between two such broadcasts and seconds to wait for replies
+REDISCOVER_AFTER = 3
+REDISCOVER_INTERVAL = 60
+REDISCOVER_TIMEOUT = 2
+
+# Largest reply read at once: the largest UDP datagram, as a map_view reply
+# of a big home with a long path runs well past 4 KiB
+RECV_BUFFER = 65535
+
+
+class DiscoveredDevice(NamedTuple):
+    """A device which answered a hello, with the handshake state it sent."""
+
+    ip: str
+    port: int
+    device_id: bytes
+    ts: datetime.datetime
+
 
 class MiIOProtocol:
     def __init__(
@@ -26,16 +61,18 @@ class MiIOProtocol:
         start_id: int = 0,
         debug: int = 0,
         lazy_discover: bool = True,
+        port: int = 54321,
     ) -> None:
         """
         Create a :class:`Device` instance.
         :param ip: IP address or a hostname for the device
         :param token: Token used for encryption
         :param start_id: Running message id sent to the device
-        :param debug: Wanted debug level
+        :param debug: Wanted debug level, above 0 payloads are traced too
+        :param port: UDP port of the device (only differs for simulated ones)
         """
         self.ip = ip
-        self.port = 54321
+        self.port = port
         if token is None:
             token = 32 * "0"
         if token is not None:
@@ -47,24 +84,45 @@ class MiIOProtocol:
         self._discovered = False
         self._device_ts = None  # type: datetime.datetime
         self.__id = start_id
+        # Requests go out from executor threads and the remote control sender
+        self._id_lock = threading.Lock()
         self._device_id = None
-
-    def send_handshake(self) -> Message:
+        self.breaker = CircuitBreaker()
+        self.counters = metrics.TransportCounters()
+        self.metrics = None  # type: Optional[metrics.DeviceMetrics]
+        self.trace = PacketTrace(payloads=debug > 0)
+        self.recorder = None  # recording.TrafficRecorder while recording
+        self.rediscover_after = REDISCOVER_AFTER
+        self.rediscover_interval = REDISCOVER_INTERVAL
+        # Called with the new address when the device is found elsewhere
+        self.on_address_change = None  # type: Optional[Callable[[str], None]]
+        self._last_rediscovery = None  # type: Optional[float]
+        self._rediscovery_lock = threading.Lock()
+        self._nowait_socket = None  # type: Optional[socket.socket]
+
+    def send_handshake(self, deadline=None) -> Message:
         """Send a handshake to the device,
         which can be used to the device type and serial.
         The handshake must also be done regularly to enable communication
         with the device.
 
+        :param Deadline deadline: optional time budget bounding the handshake
         :rtype: Message
 
         :raises DeviceException: if the device could not be discovered."""
-        m = MiIOProtocol.discover(self.ip)
+        timeout = 5 if deadline is None else deadline.timeout(5)
+        self.counters.add("handshakes")
+        self.counters.add("sent_bytes", len(HELLO_BYTES))
+        sent_at = time.perf_counter()
+        m = MiIOProtocol.discover(self.ip, timeout, self.port)
         if m is not None:
+            self.counters.add("received_bytes", len(HELLO_BYTES))
+            self.trace.record(
+                HELLO, size=len(HELLO_BYTES), latency=time.perf_counter() - sent_at
+            )
             self._device_id = m.header.value.device_id
             self._device_ts = m.header.value.ts
             self._discovered = True
-            if self.debug > 1:
-                _LOGGER.debug(m)
             _LOGGER.debug(
                 "Discovered %s with ts: %s, token: %s",
                 binascii.hexlify(self._device_id).decode(),
@@ -72,66 +130,95 @@ class MiIOProtocol:
                 codecs.encode(m.checksum, "hex"),
             )
         else:
+            self.counters.add("timeouts")
+            self.trace.record(TIMEOUT, method=HELLO, latency=timeout)
+            if deadline is not None and deadline.expired:
+                raise DeadlineExceeded("Handshake with %s ran out of time" % self.ip)
             _LOGGER.error("Unable to discover a device at address %s", self.ip)
             raise DeviceException("Unable to discover the device %s" % self.ip)
 
         return m
 
+    def prime_handshake(self, device: DiscoveredDevice) -> None:
+        """Adopt the handshake state of a hello answered to a discovery,
+        sparing the device its own handshake before the first request."""
+        self._device_id = device.device_id
+        self._device_ts = device.ts
+        self._discovered = True
+
     @staticmethod
-    def discover(addr: str = None) -> Any:
+    def discover(
+        addr: str = None,
+        timeout: float = 5,
+        port: int = 54321,
+        done: Callable[[Dict[str, DiscoveredDevice]], bool] = None,
+    ) -> Any:
         """Scan for devices in the network.
         This method is used to discover supported devices by sending a
         handshake message to the broadcast address on port 54321.
         If the target IP address is given, the handshake will be send as
         an unicast packet.
 
-        :param str addr: Target IP address"""
-        timeout = 5
+        A broadcast collects the replies for timeout seconds, or until done
+        returns True for the devices found so far, and returns them.
+
+        :param str addr: Target IP address
+        :param float timeout: Seconds to wait for replies
+        :param int port: Target port
+        :param done: Called with the devices found by IP after each reply"""
         is_broadcast = addr is None
-        seen_addrs = []  # type: List[str]
+        found = {}  # type: Dict[str, DiscoveredDevice]
         if is_broadcast:
             addr = "<broadcast>"
-            is_broadcast = True
             _LOGGER.info("Sending discovery to %s with timeout of %ss..", addr, timeout)
-        # magic, length 32
-        helobytes = bytes.fromhex(
-            "21310020ffffffffffffffffffffffffffffffffffffffffffffffffffffffff"
-        )
-
         s = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
         s.setsockopt(socket.SOL_SOCKET, socket.SO_BROADCAST, 1)
         s.settimeout(timeout)
-        s.sendto(helobytes, (addr, 54321))
-        while True:
-            try:
-                data, addr = s.recvfrom(1024)
+        ends = time.monotonic() + timeout
+        try:
+            s.sendto(HELLO_BYTES, (addr, port))
+            while True:
+                data, source = s.recvfrom(RECV_BUFFER)
                 m = Message.parse(data)  # type: Message
                 _LOGGER.debug("Got a response: %s", m)
                 if not is_broadcast:
                     return m
 
-                if addr[0] not in seen_addrs:
+                if source[0] not in found:
                     _LOGGER.info(
                         "  IP %s (ID: %s) - token: %s",
-                        addr[0],
+                        source[0],
                         binascii.hexlify(m.header.value.device_id).decode(),
                         codecs.encode(m.checksum, "hex"),
                     )
-                    seen_addrs.append(addr[0])
-            except socket.timeout:
-                if is_broadcast:
-                    _LOGGER.info("Discovery done")
-                return  # ignore timeouts on discover
-            except Exception as ex:
-                _LOGGER.warning("error while reading discover results: %s", ex)
-                break
-
-    def send(self, command: str, parameters: Any = None, retry_count=3) -> Any:
-        """Build and send the given command."""
-
-        if not self.lazy_discover or not self._discovered:
-            self.send_handshake()
-
+                    found[source[0]] = DiscoveredDevice(
+                        source[0],
+                        source[1],
+                        m.header.value.device_id,
+                        m.header.value.ts,
+                    )
+                    if done is not None and done(found):
+                        break
+                remaining = ends - time.monotonic()
+                if remaining <= 0:
+                    break
+                s.settimeout(remaining)
+        except socket.timeout:
+            pass  # ignore timeouts on discover
+        except Exception as ex:
+            _LOGGER.warning("error while reading discover results: %s", ex)
+        finally:
+            s.close()
+
+        if not is_broadcast:
+            return None
+        _LOGGER.info("Discovery done, %s devices answered", len(found))
+        return list(found.values())
+
+    def _create_request(
+        self, command: str, parameters: Any = None
+    ) -> Tuple[dict, bytes]:
+        """Build the encrypted message for the given command."""
         cmd = {"id": self._id, "method": command}
 
         if parameters is not None:
@@ -150,64 +237,190 @@ class MiIOProtocol:
         }
 
         msg = {"data": {"value": cmd}, "header": {"value": header}, "checksum": 0}
-        m = Message.build(msg, token=self.token)
-        _LOGGER.debug("%s:%s >>: %s", self.ip, self.port, cmd)
-        if self.debug > 1:
-            _LOGGER.debug(
-                "send (timeout %s): %s",
-                self._timeout,
-                Message.parse(m, token=self.token),
+        with metrics.timed(self.metrics, "build"):
+            return cmd, Message.build(msg, token=self.token)
+
+    def _trace_reply(self, reply: dict, method, size: int, latency) -> None:
+        error = reply.get("error")
+        code = error.get("code") if isinstance(error, dict) else None
+        self.trace.record(IN, reply.get("id"), method, size, latency, code, reply)
+
+    @staticmethod
+    def _handle_reply(reply: dict) -> Any:
+        """Return the result of a decoded reply, raising on device errors."""
+        if "error" in reply:
+            error = reply["error"]
+            if "code" in error and error["code"] == -30001:
+                raise RecoverableError(error)
+            raise DeviceError(error)
+
+        try:
+            return reply["result"]
+        except KeyError:
+            return reply
+
+    def _guarded(self, func, *args) -> Any:
+        """Run a request through the circuit breaker.
+
+        Any reply from the device, error replies included, counts as a
+        success; running out of retries or failing the handshake counts as a
+        failure. With metrics enabled, the request is timed stage by stage.
+        A failure which finds the device at a new address is retried there."""
+        if not self.breaker.allow():
+            raise CircuitOpenError(
+                "Device %s is unreachable, next attempt in %.0fs"
+                % (self.ip, self.breaker.retry_in)
+            )
+
+        try:
+            with metrics.recording(self.counters, self.metrics):
+                if self.metrics is None:
+                    result = func(*args)
+                else:
+                    with self.metrics.time("request"):
+                        result = func(*args)
+        except DeadlineExceeded:
+            self.breaker.release()
+            raise
+        except DeviceError:
+            self.breaker.record_success()
+            raise
+        except Exception:
+            self.breaker.record_failure()
+            if self.breaker.failures >= self.rediscover_after and self.rediscover():
+                return self._guarded(func, *args)
+            raise
+
+        self.breaker.record_success()
+        return result
+
+    def rediscover(self) -> bool:
+        """Look for the device by id, e.g. after its DHCP lease changed, and
+        move to its new address.
+
+        Done by the transport after rediscover_after consecutive failures.
+        One broadcast at most every rediscover_interval seconds, and only
+        once the device id is known from a handshake. Return True if the
+        device answered from another address."""
+        device_id = self._device_id
+        if device_id is None:
+            return False
+        if not self._rediscovery_lock.acquire(blocking=False):
+            return False
+        try:
+            now = time.monotonic()
+            if (
+                self._last_rediscovery is not None
+                and now - self._last_rediscovery < self.rediscover_interval
+            ):
+                return False
+            self._last_rediscovery = now
+            self.counters.add("rediscoveries")
+
+            found = MiIOProtocol.discover(
+                None,
+                REDISCOVER_TIMEOUT,
+                self.port,
+                lambda found: any(d.device_id == device_id for d in found.values()),
             )
+            device = next((d for d in found if d.device_id == device_id), None)
+            if device is None or device.ip == self.ip:
+                return False
+
+            _LOGGER.warning(
+                "Device %s moved from %s to %s",
+                binascii.hexlify(device_id).decode(),
+                self.ip,
+                device.ip,
+            )
+            self.ip = device.ip
+            self.prime_handshake(device)
+            self.breaker.reset()
+        finally:
+            self._rediscovery_lock.release()
+
+        if self.on_address_change is not None:
+            self.on_address_change(device.ip)
+        return True
+
+    def _count_retry(self) -> None:
+        self.counters.add("retries")
+        if self.metrics is not None:
+            self.metrics.record_retry()
+
+    def _count_sent(self, m: bytes) -> None:
+        self.counters.add("requests")
+        self.counters.add("sent_bytes", len(m))
+
+    def send(
+        self, command: str, parameters: Any = None, retry_count=3, deadline=None
+    ) -> Any:
+        """Build and send the given command.
+
+        :param Deadline deadline: optional time budget shared by the
+                                  handshake, the request and its retries"""
+        return self._guarded(self._send, command, parameters, retry_count, deadline)
+
+    def _send(
+        self, command: str, parameters: Any = None, retry_count=3, deadline=None
+    ) -> Any:
+        if not self.lazy_discover or not self._discovered:
+            self.send_handshake(deadline)
+
+        timeout = self._timeout if deadline is None else deadline.timeout(self._timeout)
+
+        cmd, m = self._create_request(command, parameters)
+        self.trace.record(OUT, cmd["id"], command, len(m), payload=cmd)
 
         s = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
-        s.settimeout(self._timeout)
+        s.settimeout(timeout)
 
         try:
-            s.sendto(m, (self.ip, self.port))
+            self._count_sent(m)
+            sent_at = time.perf_counter()
+            with metrics.timed(self.metrics, "sendto"):
+                s.sendto(m, (self.ip, self.port))
         except OSError as ex:
             _LOGGER.error("failed to send msg: %s", ex)
             raise DeviceException from ex
 
         try:
-            data, addr = s.recvfrom(1024)
-            m = Message.parse(data, token=self.token)
+            with metrics.timed(self.metrics, "wait"):
+                data, addr = s.recvfrom(RECV_BUFFER)
+            latency = time.perf_counter() - sent_at
+            self.counters.observe_rtt(latency)
+            self.counters.add("received_bytes", len(data))
+            with metrics.timed(self.metrics, "parse"):
+                m = Message.parse(data, token=self.token)
             self._device_ts = m.header.value.ts
-            if self.debug > 1:
-                _LOGGER.debug("recv from %s: %s", addr[0], m)
-
-            self.__id = m.data.value["id"]
-            _LOGGER.debug(
-                "%s:%s (ts: %s, id: %s) << %s",
-                self.ip,
-                self.port,
-                m.header.value.ts,
-                m.data.value["id"],
-                m.data.value,
-            )
-            if "error" in m.data.value:
-                error = m.data.value["error"]
-                if "code" in error and error["code"] == -30001:
-                    raise RecoverableError(error)
-                raise DeviceError(error)
 
-            try:
-                return m.data.value["result"]
-            except KeyError:
-                return m.data.value
+            with self._id_lock:
+                # Other threads may have taken higher ids meanwhile
+                self.__id = max(self.__id, m.data.value["id"])
+            self._trace_reply(m.data.value, command, len(data), latency)
+            if self.recorder is not None:
+                self.recorder.record(command, cmd["params"], m.data.value, latency)
+            return self._handle_reply(m.data.value)
         except construct.core.ChecksumError as ex:
+            self.counters.add("checksum_errors")
             raise DeviceException(
                 "Got checksum error which indicates use "
                 "of an invalid token. "
                 "Please check your token!"
             ) from ex
         except OSError as ex:
+            if isinstance(ex, socket.timeout):
+                self.counters.add("timeouts")
+                self.trace.record(TIMEOUT, cmd["id"], command, latency=timeout)
             if retry_count > 0:
                 _LOGGER.debug(
                     "Retrying with incremented id, retries left: %s", retry_count
                 )
-                self.__id += 100
+                self._count_retry()
+                with self._id_lock:
+                    self.__id += 100
                 self._discovered = False
-                return self.send(command, parameters, retry_count - 1)
+                return self._send(command, parameters, retry_count - 1, deadline)
 
             _LOGGER.error("Got error when receiving: %s", ex)
             raise DeviceException("No response from the device") from ex
@@ -217,18 +430,180 @@ class MiIOProtocol:
                 _LOGGER.debug(
                     "Retrying to send failed command, retries left: %s", retry_count
                 )
-                return self.send(command, parameters, retry_count - 1)
+                self._count_retry()
+                return self._send(command, parameters, retry_count - 1, deadline)
 
             _LOGGER.error("Got error when receiving: %s", ex)
             raise DeviceException("Unable to recover failed command") from ex
 
+    def send_pipelined(
+        self, requests: List[Tuple[str, Any]], retry_count=3
+    ) -> List[Any]:
+        """Send several commands back to back and collect their replies.
+
+        All requests are written before waiting for the first reply, and the
+        replies are matched to their requests by id. Requests left unanswered
+        when the socket times out are resent one by one using :meth:`send`.
+
+        :param requests: list of ``(command, parameters)`` tuples
+        :return: the results, in the order of the requests"""
+        return self._guarded(self._send_pipelined, requests, retry_count)
+
+    def _send_pipelined(
+        self, requests: List[Tuple[str, Any]], retry_count=3
+    ) -> List[Any]:
+        if not self.lazy_discover or not self._discovered:
+            self.send_handshake()
+
+        results = [None] * len(requests)
+        sent_at = [0.0] * len(requests)
+        pending = {}  # type: Dict[int, int]
+        resend = []  # type: List[int]
+
+        s = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        s.settimeout(self._timeout)
+
+        try:
+            for index, (command, parameters) in enumerate(requests):
+                cmd, m = self._create_request(command, parameters)
+                self.trace.record(OUT, cmd["id"], command, len(m), payload=cmd)
+                self._count_sent(m)
+                sent_at[index] = time.perf_counter()
+                s.sendto(m, (self.ip, self.port))
+                pending[cmd["id"]] = index
+        except OSError as ex:
+            s.close()
+            _LOGGER.error("failed to send msg: %s", ex)
+            raise DeviceException from ex
+
+        try:
+            while pending:
+                try:
+                    with metrics.timed(self.metrics, "wait"):
+                        data, addr = s.recvfrom(RECV_BUFFER)
+                except OSError as ex:
+                    if isinstance(ex, socket.timeout):
+                        self.counters.add("timeouts")
+                    break
+
+                received_at = time.perf_counter()
+                self.counters.add("received_bytes", len(data))
+                try:
+                    with metrics.timed(self.metrics, "parse"):
+                        m = Message.parse(data, token=self.token)
+                except construct.core.ChecksumError:
+                    raise
+                except Exception as ex:
+                    raise DeviceException("Unable to parse the reply: %s" % ex) from ex
+                self._device_ts = m.header.value.ts
+                reply = m.data.value
+
+                index = pending.pop(reply.get("id"), None)
+                if index is None:
+                    self._trace_reply(reply, None, len(data), None)
+                    continue
+                latency = received_at - sent_at[index]
+                self.counters.observe_rtt(latency)
+                command, parameters = requests[index]
+                self._trace_reply(reply, command, len(data), latency)
+                if self.recorder is not None:
+                    self.recorder.record(
+                        command, parameters if parameters is not None else [], reply, latency
+                    )
+                try:
+                    results[index] = self._handle_reply(reply)
+                except RecoverableError:
+                    resend.append(index)
+        except construct.core.ChecksumError as ex:
+            self.counters.add("checksum_errors")
+            raise DeviceException(
+                "Got checksum error which indicates use "
+                "of an invalid token. "
+                "Please check your token!"
+            ) from ex
+        finally:
+            s.close()
+
+        for index in sorted(resend + list(pending.values())):
+            command, parameters = requests[index]
+            _LOGGER.debug("No pipelined reply for %s, resending", command)
+            self._count_retry()
+            results[index] = self._send(command, parameters, retry_count)
+
+        return results
+
+    def send_nowait(self, command: str, parameters: Any = None) -> int:
+        """Send a command without waiting for its reply; return its id.
+
+        Meant for streams of commands where only the latest one matters,
+        such as remote control: a lost reply is neither waited for nor
+        retried, so a slow device never holds back the next command.
+        Commands go out from one kept socket; the replies gathered on it
+        are read without blocking before each send, which keeps the
+        device timestamp current. Call :meth:`close_nowait` when done.
+
+        Nothing is sent unless the circuit is closed: the requests waiting
+        for a reply decide when the device is back, and a stream of commands
+        must not hammer an unreachable one.
+
+        :raises CircuitOpenError: if the circuit is not closed"""
+        if self.breaker.state is not CircuitState.Closed:
+            raise CircuitOpenError(
+                "Device %s is unreachable, next attempt in %.0fs"
+                % (self.ip, self.breaker.retry_in)
+            )
+        if not self._discovered:
+            self.send_handshake()
+        if self._nowait_socket is None:
+            self._nowait_socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+            self._nowait_socket.setblocking(False)
+        self._drain_nowait()
+
+        cmd, m = self._create_request(command, parameters)
+        self.trace.record(OUT, cmd["id"], command, len(m), payload=cmd)
+        self._count_sent(m)
+        self.counters.add("nowait_requests")
+        try:
+            self._nowait_socket.sendto(m, (self.ip, self.port))
+        except OSError as ex:
+            _LOGGER.debug("failed to send msg: %s", ex)
+            raise DeviceException from ex
+        return cmd["id"]
+
+    def _drain_nowait(self) -> None:
+        while True:
+            try:
+                data, addr = self._nowait_socket.recvfrom(RECV_BUFFER)
+            except OSError:
+                # Nothing left, or an ICMP error for an earlier send
+                return
+            self.counters.add("received_bytes", len(data))
+            try:
+                m = Message.parse(data, token=self.token)
+            except construct.core.ChecksumError:
+                self.counters.add("checksum_errors")
+                continue
+            except Exception as ex:  # noqa: BLE001
+                # Nobody waits for these replies, a bad one is only skipped
+                _LOGGER.debug("Unable to parse reply from %s: %s", addr, ex)
+                continue
+            self._device_ts = m.header.value.ts
+            self._trace_reply(m.data.value, None, len(data), None)
+
+    def close_nowait(self) -> None:
+        """Close the socket used by :meth:`send_nowait`."""
+        if self._nowait_socket is not None:
+            self._nowait_socket.close()
+            self._nowait_socket = None
+
     @property
     def _id(self) -> int:
         """Increment and return the sequence id."""
-        self.__id += 1
-        if self.__id >= 9999:
-            self.__id = 1
-        return self.__id
+        with self._id_lock:
+            self.__id += 1
+            if self.__id >= 9999:
+                self.__id = 1
+            return self.__id
 
     @property
     def raw_id(self):
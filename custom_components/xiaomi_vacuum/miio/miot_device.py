@@ -1,6 +1,8 @@
+import dataclasses
 import logging
 from dataclasses import dataclass, field
 
+from . import metrics
 from .click_common import command
 from .device import Device, DeviceType
 from .exceptions import DeviceException
@@ -31,21 +33,86 @@ class MiotDevice(Device):
         start_id: int = 0,
         debug: int = 0,
         lazy_discover: bool = True,
+        port: int = 54321,
+        protocol=None,
     ) -> None:
-        super().__init__(ip, token, start_id, debug, lazy_discover)
+        super().__init__(ip, token, start_id, debug, lazy_discover, port, protocol)
         self.device_type = DeviceType.MiOT
+        self._property_plans = {}
+        self._tuple_layouts = {}  # dataclass -> (field positions, defaults)
 
     @command()
     def miot_info(self) -> MiotInfo:
         """Return common miot information."""
         return self.get_properties_for_dataclass(MiotInfo)
 
-    def get_properties_for_dataclass(self, cls):
-        """Run a query to fill property container."""
+    def get_properties_for_dataclass(self, cls, fields=None, deadline=None):
+        """Run a query to fill property container.
+
+        :param fields: names of the fields to query, all of them if not given.
+                       Fields left out keep their dataclass default.
+        :param deadline: optional time budget for the whole query. Fields not
+                         fetched in time are listed in ``stale_fields`` if the
+                         dataclass has such a field."""
+        if fields is not None:
+            fields = frozenset(fields)
+
+        property_mapping = self._property_plans.get((cls, fields))
+        if property_mapping is None:
+            property_mapping = self._property_mapping_for_dataclass(cls, fields)
+            self._property_plans[(cls, fields)] = property_mapping
+
+        props = self.get_properties_for_mapping(
+            property_mapping, max_properties=cls._max_properties, deadline=deadline
+        )
+        stale = None
+        if deadline is not None and deadline.skipped:
+            if "stale_fields" in cls.__dataclass_fields__:
+                stale = frozenset(prop["did"] for prop in deadline.skipped)
+
+        with metrics.timed(self.metrics, "dataclass"):
+            if hasattr(cls, "from_tuple"):
+                return self._dataclass_from_tuple(cls, props, stale)
+            response = {
+                prop["did"]: prop["value"] if prop["code"] == 0 else None
+                for prop in props
+                if prop is not None
+            }
+            if stale is not None:
+                response["stale_fields"] = stale
+            return cls(**response)
+
+    def _dataclass_from_tuple(self, cls, props, stale):
+        """Build cls with its from_tuple, placing each value by field position;
+        every field of cls needs a default."""
+        layout = self._tuple_layouts.get(cls)
+        if layout is None:
+            names = [f.name for f in dataclasses.fields(cls)]
+            layout = self._tuple_layouts[cls] = (
+                {name: index for index, name in enumerate(names)},
+                tuple(cls.__dataclass_fields__[name].default for name in names),
+            )
+        positions, defaults = layout
+
+        values = list(defaults)
+        for prop in props:
+            if prop is not None:
+                values[positions[prop["did"]]] = (
+                    prop["value"] if prop["code"] == 0 else None
+                )
+        if stale is not None:
+            values[positions["stale_fields"]] = stale
+        return cls.from_tuple(values)
+
+    @staticmethod
+    def _property_mapping_for_dataclass(cls, wanted=None) -> dict:
+        """Return the siid/piid mapping of the (wanted) dataclass fields."""
         fields = cls.__dataclass_fields__
         property_mapping = {}
 
         for field_name in fields:
+            if wanted is not None and field_name not in wanted:
+                continue
             field_meta = fields[field_name].metadata
 
             if "piid" not in field_meta:
@@ -60,14 +127,7 @@ class MiotDevice(Device):
 
             property_mapping[field_name] = {"siid": siid, "piid": piid}
 
-        response = {
-            prop["did"]: prop["value"] if prop["code"] == 0 else None
-            for prop in self.get_properties_for_mapping(
-                property_mapping, max_properties=cls._max_properties
-            )
-        }
-
-        return cls(**response)
+        return property_mapping
 
     def set_property(self, **kwargs):
         """Helper to set properties using the device specific mapping."""
@@ -78,6 +138,15 @@ class MiotDevice(Device):
 
     def set_properties_from_dataclass(self, obj):
         """Set properties as defined in the given dataclass object."""
+        properties_to_set = self.properties_from_dataclass(obj)
+
+        # TODO: handle splitting based on _max_properties
+
+        _LOGGER.debug("Going to set %s" % properties_to_set)
+        return self.send("set_properties", properties_to_set)
+
+    def properties_from_dataclass(self, obj) -> list:
+        """Build the ``set_properties`` payload for the given dataclass object."""
         # TODO: this needs cleanup.
         fields = obj.__dataclass_fields__
         properties_to_set = []
@@ -112,20 +181,19 @@ class MiotDevice(Device):
         if not properties_to_set:
             raise DeviceException("No values to set!")
 
-        # TODO: handle splitting based on _max_properties
-
-        _LOGGER.debug("Going to set %s" % properties_to_set)
-        return self.send("set_properties", properties_to_set)
+        return properties_to_set
 
     def get_properties_for_mapping(
-        self, property_mapping, *, max_properties=15
+        self, property_mapping, *, max_properties=15, deadline=None
     ) -> list:
         """Retrieve raw properties based on mapping."""
 
         # We send property key in "did" because it's sent back via response and we can identify the property.
         properties = [{"did": k, **v} for k, v in property_mapping.items()]
 
-        return self.get_properties(properties, max_properties=max_properties)
+        return self.get_properties(
+            properties, max_properties=max_properties, deadline=deadline
+        )
 
     def set_property_from_mapping(self, property_mapping, property_key: str, value):
         """Sets property value."""
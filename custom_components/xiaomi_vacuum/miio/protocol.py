@@ -30,6 +30,8 @@ from cryptography.hazmat.backends import default_backend
 from cryptography.hazmat.primitives import padding
 from cryptography.hazmat.primitives.ciphers import Cipher, algorithms, modes
 
+from . import metrics
+
 _LOGGER = logging.getLogger(__name__)
 
 
@@ -126,13 +128,17 @@ class TimeAdapter(Adapter):
 
 class EncryptionAdapter(Adapter):
     def _encode(self, obj, context, path):
-        return Utils.encrypt(
-            json.dumps(obj).encode("utf-8") + b"\x00", context["_"]["token"]
-        )
+        recorder = metrics.current()
+        with metrics.timed(recorder, "json_encode"):
+            plaintext = json.dumps(obj).encode("utf-8") + b"\x00"
+        with metrics.timed(recorder, "encrypt"):
+            return Utils.encrypt(plaintext, context["_"]["token"])
 
     def _decode(self, obj, context, path):
+        recorder = metrics.current()
         try:
-            decrypted = Utils.decrypt(obj, context["_"]["token"])
+            with metrics.timed(recorder, "decrypt"):
+                decrypted = Utils.decrypt(obj, context["_"]["token"])
             decrypted = decrypted.rstrip(b"\x00")
         except Exception:
             _LOGGER.debug("Unable to decrypt, returning raw bytes: %s", obj)
@@ -144,13 +150,21 @@ class EncryptionAdapter(Adapter):
             lambda d: d[: d.rfind(b"\x00")] if b"\x00" in d else d,
         ]
 
-        for i, quirk in enumerate(decrypted_quirks):
-            decoded = quirk(decrypted).decode("utf-8")
-            try:
-                return json.loads(decoded)
-            except Exception as ex:
-                if i == len(decrypted_quirks) - 1:
-                    _LOGGER.error("unable to parse json '%s': %s", decoded, ex)
+        with metrics.timed(recorder, "json_decode"):
+            for i, quirk in enumerate(decrypted_quirks):
+                decoded = quirk(decrypted).decode("utf-8")
+                try:
+                    result = json.loads(decoded)
+                except Exception as ex:
+                    if i == len(decrypted_quirks) - 1:
+                        _LOGGER.error("unable to parse json '%s': %s", decoded, ex)
+                    continue
+
+                if i:
+                    counters = metrics.current_counters()
+                    if counters is not None:
+                        counters.add("quirk_hits")
+                return result
 
         return None
 
@@ -0,0 +1,176 @@
+"""Record device traffic and replay it without a device.
+
+:class:`TrafficRecorder` appends every answered request to a JSON lines file:
+the decrypted request and reply plus their timing. :class:`ReplayProtocol`
+is a drop-in transport serving those replies, with the original round trip
+times scaled by ``scale`` (0 answers at once), so ``DreameVacuum`` and
+everything above it can be exercised against real traffic::
+
+    vacuum = DreameVacuum(protocol=ReplayProtocol("capture.jsonl", scale=0))
+    vacuum.status()
+
+Requests are matched on method and parameters, falling back to any reply to
+the same method; when a request was recorded several times its replies are
+served in turn, starting over at the end. Unanswered requests are not
+recorded, and tokens, Wi-Fi and network details are redacted."""
+import collections
+import datetime
+import json
+import logging
+import threading
+import time
+from typing import Any, Deque, Dict, Optional, Tuple
+
+from .exceptions import DeadlineExceeded, DeviceException
+from .miioprotocol import MiIOProtocol
+from .trace import IN, OUT, redact
+
+_LOGGER = logging.getLogger(__name__)
+
+FORMAT = "miio-recording"
+VERSION = 1
+
+
+def _key(method: str, params: Any) -> Tuple[str, str]:
+    return method, json.dumps(params, sort_keys=True, separators=(",", ":"))
+
+
+class TrafficRecorder:
+    """Append-only JSON lines writer of request/reply pairs."""
+
+    def __init__(self, path: str, model: Optional[str] = None) -> None:
+        self.path = path
+        self._lock = threading.Lock()
+        self._start = time.monotonic()
+        self._file = open(path, "a", encoding="utf-8")
+        self._write(
+            {
+                "format": FORMAT,
+                "version": VERSION,
+                "started": datetime.datetime.now(datetime.timezone.utc).isoformat(),
+                "model": model,
+            }
+        )
+
+    def _write(self, record: dict) -> None:
+        line = json.dumps(record, separators=(",", ":"))
+        with self._lock:
+            if self._file is None:
+                return
+            self._file.write(line + "\n")
+            self._file.flush()
+
+    def record(self, method: str, params: Any, reply: dict, rtt: float) -> None:
+        """Append one answered request; t is the offset from the start."""
+        self._write(
+            {
+                "t": round(time.monotonic() - self._start - rtt, 6),
+                "rtt": round(rtt, 6),
+                "method": method,
+                "params": params,
+                "reply": redact(reply),
+            }
+        )
+
+    def close(self) -> None:
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+
+
+class ReplayProtocol(MiIOProtocol):
+    """Transport answering from a recording instead of the network."""
+
+    def __init__(self, path: str, scale: float = 1.0, **kwargs) -> None:
+        kwargs.setdefault("ip", "replay")
+        super().__init__(**kwargs)
+        self.path = path
+        self.scale = scale
+        self.header = {}  # type: dict
+        self._replies = {}  # type: Dict[Tuple[str, str], Deque[Tuple[float, dict]]]
+        self._by_method = {}  # type: Dict[str, Deque[Tuple[float, dict]]]
+        self._lock = threading.Lock()
+        self._load(path)
+
+    def _load(self, path: str) -> None:
+        with open(path, encoding="utf-8") as f:
+            for line in f:
+                if not line.strip():
+                    continue
+                record = json.loads(line)
+                if record.get("format") == FORMAT:
+                    self.header = record
+                    continue
+                exchange = (record["rtt"], record["reply"])
+                key = _key(record["method"], record["params"])
+                self._replies.setdefault(key, collections.deque()).append(exchange)
+                self._by_method.setdefault(
+                    record["method"], collections.deque()
+                ).append(exchange)
+        _LOGGER.debug("Loaded %s recorded requests from %s", len(self._replies), path)
+
+    def send_handshake(self, deadline=None):
+        self.counters.add("handshakes")
+        self._device_id = b"\x00\x00\x00\x00"
+        self._device_ts = datetime.datetime.now(datetime.timezone.utc)
+        self._discovered = True
+        return None
+
+    def _next(self, command: str, parameters: Any) -> Tuple[float, dict]:
+        with self._lock:
+            replies = self._replies.get(_key(command, parameters))
+            if replies is None:
+                replies = self._by_method.get(command)
+            if not replies:
+                raise DeviceException(
+                    "No recorded reply for %s %s" % (command, parameters)
+                )
+            exchange = replies[0]
+            replies.rotate(-1)
+            return exchange
+
+    def _send(
+        self, command: str, parameters: Any = None, retry_count=3, deadline=None
+    ) -> Any:
+        if parameters is None:
+            parameters = []
+        request_id = self._id
+        rtt, reply = self._next(command, parameters)
+        delay = rtt * self.scale
+
+        self.counters.add("requests")
+        self.trace.record(OUT, request_id, command)
+        if deadline is not None and delay >= deadline.remaining:
+            time.sleep(deadline.remaining)
+            raise DeadlineExceeded("Replayed %s ran out of time" % command)
+        if delay:
+            time.sleep(delay)
+
+        reply = dict(reply, id=request_id)
+        self.counters.observe_rtt(delay)
+        self.trace.record(IN, request_id, command, latency=delay, payload=reply)
+        return self._handle_reply(reply)
+
+    def _send_pipelined(self, requests, retry_count=3):
+        """Serve all replies after the slowest one, as pipelining overlaps them."""
+        exchanges = []
+        for command, parameters in requests:
+            request_id = self._id
+            self.counters.add("requests")
+            self.trace.record(OUT, request_id, command)
+            if parameters is None:
+                parameters = []
+            exchanges.append((request_id, command, *self._next(command, parameters)))
+
+        delay = max((rtt for _, _, rtt, _ in exchanges), default=0) * self.scale
+        if delay:
+            time.sleep(delay)
+
+        results = []
+        for request_id, command, rtt, reply in exchanges:
+            reply = dict(reply, id=request_id)
+            self.counters.observe_rtt(rtt * self.scale)
+            self.trace.record(IN, request_id, command, latency=delay, payload=reply)
+            results.append(self._handle_reply(reply))
+        return results
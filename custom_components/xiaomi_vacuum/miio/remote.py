@@ -0,0 +1,128 @@
+"""Remote control of a vacuum at a fixed rate.
+
+Joystick updates are coalesced: :meth:`RemoteDriveSession.move` only stores
+the latest motion, and a sender thread writes the current one every tick
+with :meth:`~.miioprotocol.MiIOProtocol.send_nowait`. A slow or lost reply
+therefore never delays the next command, and motion superseded between two
+ticks is never sent at all::
+
+    session = RemoteDriveSession(vacuum)
+    session.start()
+    session.move(rotation=0, velocity=100)
+    ...
+    session.stop()
+"""
+import logging
+import threading
+import time
+from typing import Optional, Tuple
+
+from .exceptions import DeviceException
+
+_LOGGER = logging.getLogger(__name__)
+
+# Commands per second while moving
+REMOTE_RATE = 10
+# Seconds without an update after which the vacuum is stopped
+REMOTE_IDLE_TIMEOUT = 1.5
+
+STOPPED = (0, 0)
+
+
+class RemoteDriveSession:
+    """One remote control session of a :class:`~.dreamevacuum.DreameVacuum`.
+
+    While moving, the current motion is sent every tick: the vacuum stops
+    by itself when commands stop coming, so a dropped packet only costs one
+    tick. Without an update for ``idle_timeout`` seconds the session stops
+    the vacuum, in case whoever was driving went away."""
+
+    def __init__(
+        self,
+        vacuum,
+        rate: float = REMOTE_RATE,
+        idle_timeout: float = REMOTE_IDLE_TIMEOUT,
+    ) -> None:
+        self.vacuum = vacuum
+        self.interval = 1 / rate
+        self.idle_timeout = idle_timeout
+        self.sent = 0
+        self.coalesced = 0  # updates replaced before they were sent
+
+        self._lock = threading.Lock()
+        self._latest = None  # type: Optional[Tuple[int, int]]
+        self._updated = 0.0  # monotonic
+        self._current = STOPPED
+        self._stopping = threading.Event()
+        self._thread = None  # type: Optional[threading.Thread]
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self) -> None:
+        """Handshake now, so the first command goes out at once, and start
+        sending."""
+        if self.running:
+            return
+        self.vacuum.send_handshake()
+        self._stopping.clear()
+        self._current = STOPPED
+        self._thread = threading.Thread(
+            target=self._run, name="remote-drive-%s" % self.vacuum.ip, daemon=True
+        )
+        self._thread.start()
+
+    def move(self, rotation: int, velocity: int) -> None:
+        """Set the motion; never blocks, the latest motion wins."""
+        with self._lock:
+            if self._latest is not None:
+                self.coalesced += 1
+            self._latest = (int(rotation), int(velocity))
+            self._updated = time.monotonic()
+
+    def stop(self) -> None:
+        """Stop the vacuum and end the session."""
+        self._stopping.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        try:
+            if self._current != STOPPED:
+                self.vacuum.remote_move(*STOPPED)
+        finally:
+            self._current = STOPPED
+            self.vacuum.close_nowait()
+        self.vacuum.stop_remote()
+
+    def _next_motion(self) -> Optional[Tuple[int, int]]:
+        """The motion to send this tick, None when there is nothing to send."""
+        with self._lock:
+            latest, self._latest = self._latest, None
+            idle = time.monotonic() - self._updated
+        if latest is not None:
+            self._current = latest
+            return latest
+        if self._current == STOPPED:
+            return None
+        if idle >= self.idle_timeout:
+            _LOGGER.debug("No remote control update for %.1fs, stopping", idle)
+            self._current = STOPPED
+        return self._current
+
+    def _run(self) -> None:
+        deadline = time.monotonic()
+        while not self._stopping.wait(max(0.0, deadline - time.monotonic())):
+            # Ticks missed while sending are skipped, not sent in a burst
+            deadline = max(deadline + self.interval, time.monotonic())
+            motion = self._next_motion()
+            if motion is None:
+                continue
+            try:
+                self.vacuum.remote_move(*motion)
+                self.sent += 1
+            except DeviceException as ex:
+                _LOGGER.debug("Unable to send remote control command: %s", ex)
+            except Exception:  # noqa: BLE001
+                # Keep the session alive, a dead sender would ignore every move
+                _LOGGER.exception("Unexpected error sending remote control command")
@@ -0,0 +1,96 @@
+"""Per-device ring buffer of compact packet trace records.
+
+Replaces logging every request and reply at debug level: appending a tuple
+to a bounded deque costs far less than formatting the payload, and the last
+few hundred exchanges can be dumped when something goes wrong."""
+import time
+from collections import deque
+from typing import Any, List, NamedTuple, Optional
+
+TRACE_SIZE = 256
+
+# Directions
+OUT = "out"
+IN = "in"
+TIMEOUT = "timeout"
+HELLO = "hello"
+
+# Payload keys never kept in the trace
+REDACTED_KEYS = frozenset(
+    {"token", "passwd", "password", "ssid", "bssid", "mac", "localIp", "gw", "uid"}
+)
+
+
+class TraceRecord(NamedTuple):
+    ts: float
+    direction: str
+    id: Optional[int]
+    method: Optional[str]
+    size: int
+    latency: Optional[float]
+    code: Optional[int]
+    payload: Any
+
+    def as_dict(self) -> dict:
+        record = self._asdict()
+        latency = record.pop("latency")
+        record["latency_ms"] = None if latency is None else round(latency * 1000, 2)
+        return record
+
+
+def redact(payload: Any) -> Any:
+    """Return payload with the values of sensitive keys replaced."""
+    if isinstance(payload, dict):
+        return {
+            key: "**REDACTED**" if key in REDACTED_KEYS else redact(value)
+            for key, value in payload.items()
+        }
+    if isinstance(payload, list):
+        return [redact(value) for value in payload]
+    return payload
+
+
+class PacketTrace:
+    """Fixed-size trace of the packets exchanged with one device.
+
+    Payloads are only kept, redacted, when ``payloads`` is set; redaction
+    happens when the trace is dumped, not on the request path."""
+
+    def __init__(self, size: int = TRACE_SIZE, payloads: bool = False) -> None:
+        self.payloads = payloads
+        self._records = deque(maxlen=size)
+
+    def record(
+        self,
+        direction: str,
+        request_id: Optional[int] = None,
+        method: Optional[str] = None,
+        size: int = 0,
+        latency: Optional[float] = None,
+        code: Optional[int] = None,
+        payload: Any = None,
+    ) -> None:
+        if not self.payloads:
+            payload = None
+        # deque.append and list(deque) are atomic, so no lock is needed
+        self._records.append(
+            TraceRecord(
+                time.time(), direction, request_id, method, size, latency, code, payload
+            )
+        )
+
+    def clear(self) -> None:
+        self._records.clear()
+
+    def __len__(self) -> int:
+        return len(self._records)
+
+    def dump(self) -> List[dict]:
+        """Return the records, oldest first, as redacted dicts."""
+        dumped = []
+        for record in list(self._records):
+            entry = record.as_dict()
+            if record.payload is not None:
+                entry["payload"] = redact(record.payload)
+            dumped.append(entry)
+        return dumped
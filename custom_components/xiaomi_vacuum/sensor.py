@@ -7,10 +7,13 @@ from homeassistant.components.sensor import (
     SensorDeviceClass,
     SensorStateClass,
 )
+from homeassistant.const import EntityCategory, UnitOfTime
 from homeassistant.helpers.update_coordinator import CoordinatorEntity
 from homeassistant.helpers.entity import DeviceInfo
 
 from .const import DOMAIN, DATA_COORDINATOR, DATA_CLIENT
+from .entity import DreameCoordinatorEntity
+from .miio.metrics import STAGES
 
 _LOGGER = logging.getLogger(__name__)
 
@@ -75,6 +78,12 @@ async def async_setup_entry(hass, entry, async_add_entities):
         VacuumStatusSensor(name, uid, coordinator),  # <── NUOVO SENSORE
     ]
 
+    if client.metrics is not None:
+        entities += [
+            VacuumPollLatencySensor(name, uid, coordinator, client),
+            VacuumRetryRateSensor(name, uid, coordinator, client),
+        ]
+
     async_add_entities(entities)
 
 
@@ -82,11 +91,14 @@ async def async_setup_entry(hass, entry, async_add_entities):
 # BASE CLASS
 # ---------------------------------------------------------------------------
 
-class DreameBaseSensor(CoordinatorEntity, SensorEntity):
+class DreameBaseSensor(DreameCoordinatorEntity, SensorEntity):
     """Base class for all Dreame sensors."""
 
+    # DreameStatus fields read by the sensor, polled only while it is enabled
+    _status_fields = None
+
     def __init__(self, name, uid, coordinator):
-        super().__init__(coordinator)
+        super().__init__(coordinator, context=self._status_fields)
 
         self._vacuum_name = name
         self._vacuum_uid = uid
@@ -104,6 +116,8 @@ class DreameBaseSensor(CoordinatorEntity, SensorEntity):
 class VacuumStatusSensor(DreameBaseSensor):
     """Unified status sensor with friendly text and booleans."""
 
+    _status_fields = frozenset({"status"})
+
     def __init__(self, name, uid, coordinator):
         super().__init__(name, uid, coordinator)
 
@@ -146,6 +160,7 @@ class VacuumStatusSensor(DreameBaseSensor):
         }.get(status, "Sconosciuto")
 
         return {
+            **self.freshness_attributes,
             "friendly_status": friendly_status,
             "is_cleaning": status == "cleaning",
             "is_paused": status == "paused",
@@ -163,6 +178,8 @@ class VacuumStatusSensor(DreameBaseSensor):
 class DreameBatterySensor(DreameBaseSensor):
     """Battery sensor."""
 
+    _status_fields = frozenset({"battery"})
+
     def __init__(self, name, uid, coordinator):
         super().__init__(name, uid, coordinator)
 
@@ -185,6 +202,8 @@ class DreameBatterySensor(DreameBaseSensor):
 class DreameErrorSensor(DreameBaseSensor):
     """Error code sensor."""
 
+    _status_fields = frozenset({"error"})
+
     def __init__(self, name, uid, coordinator):
         super().__init__(name, uid, coordinator)
 
@@ -213,6 +232,8 @@ class DreameErrorSensor(DreameBaseSensor):
 class DreameCleaningAreaSensor(DreameBaseSensor):
     """Cleaning area sensor."""
 
+    _status_fields = frozenset({"area"})
+
     def __init__(self, name, uid, coordinator):
         super().__init__(name, uid, coordinator)
 
@@ -235,6 +256,8 @@ class DreameCleaningAreaSensor(DreameBaseSensor):
 class DreameCleaningTimeSensor(DreameBaseSensor):
     """Cleaning time sensor."""
 
+    _status_fields = frozenset({"timer"})
+
     def __init__(self, name, uid, coordinator):
         super().__init__(name, uid, coordinator)
 
@@ -257,6 +280,8 @@ class DreameCleaningTimeSensor(DreameBaseSensor):
 class DreameMainBrushLifeSensor(DreameBaseSensor):
     """Main brush life sensor."""
 
+    _status_fields = frozenset({"brush_life_level"})
+
     def __init__(self, name, uid, coordinator):
         super().__init__(name, uid, coordinator)
 
@@ -279,6 +304,8 @@ class DreameMainBrushLifeSensor(DreameBaseSensor):
 class DreameSideBrushLifeSensor(DreameBaseSensor):
     """Side brush life sensor."""
 
+    _status_fields = frozenset({"brush_life_level2"})
+
     def __init__(self, name, uid, coordinator):
         super().__init__(name, uid, coordinator)
 
@@ -301,6 +328,8 @@ class DreameSideBrushLifeSensor(DreameBaseSensor):
 class DreameFilterLifeSensor(DreameBaseSensor):
     """Filter life sensor."""
 
+    _status_fields = frozenset({"filter_life_level"})
+
     def __init__(self, name, uid, coordinator):
         super().__init__(name, uid, coordinator)
 
@@ -323,6 +352,8 @@ class DreameFilterLifeSensor(DreameBaseSensor):
 class DreameMainBrushTimeLeftSensor(DreameBaseSensor):
     """Main brush time left sensor."""
 
+    _status_fields = frozenset({"brush_left_time"})
+
     def __init__(self, name, uid, coordinator):
         super().__init__(name, uid, coordinator)
 
@@ -345,6 +376,8 @@ class DreameMainBrushTimeLeftSensor(DreameBaseSensor):
 class DreameSideBrushTimeLeftSensor(DreameBaseSensor):
     """Side brush time left sensor."""
 
+    _status_fields = frozenset({"brush_left_time2"})
+
     def __init__(self, name, uid, coordinator):
         super().__init__(name, uid, coordinator)
 
@@ -367,6 +400,8 @@ class DreameSideBrushTimeLeftSensor(DreameBaseSensor):
 class DreameFilterTimeLeftSensor(DreameBaseSensor):
     """Filter time left sensor."""
 
+    _status_fields = frozenset({"filter_left_time"})
+
     def __init__(self, name, uid, coordinator):
         super().__init__(name, uid, coordinator)
 
@@ -389,6 +424,8 @@ class DreameFilterTimeLeftSensor(DreameBaseSensor):
 class DreameTotalCleaningCountSensor(DreameBaseSensor):
     """Total cleaning count sensor."""
 
+    _status_fields = frozenset({"total_clean_count"})
+
     def __init__(self, name, uid, coordinator):
         super().__init__(name, uid, coordinator)
 
@@ -410,6 +447,8 @@ class DreameTotalCleaningCountSensor(DreameBaseSensor):
 class DreameTotalCleaningAreaSensor(DreameBaseSensor):
     """Total cleaning area sensor."""
 
+    _status_fields = frozenset({"total_area"})
+
     def __init__(self, name, uid, coordinator):
         super().__init__(name, uid, coordinator)
 
@@ -487,4 +526,67 @@ class VacuumLastSeenSensor(CoordinatorEntity, SensorEntity):
         return {
             "timestamp": self._last_seen.isoformat(),
             "seconds_since": int(diff)
-        }
\ No newline at end of file
+        }
+
+
+# ---------------------------------------------------------------------------
+# TRANSPORT METRICS SENSORS (only with enable_metrics)
+# ---------------------------------------------------------------------------
+
+class VacuumMetricsSensor(CoordinatorEntity, SensorEntity):
+    """Base class for sensors reading the client's request metrics."""
+
+    _attr_entity_category = EntityCategory.DIAGNOSTIC
+    _attr_state_class = SensorStateClass.MEASUREMENT
+
+    def __init__(self, name, uid, coordinator, client):
+        super().__init__(coordinator)
+        self._metrics = client.metrics
+
+        self._attr_device_info = DeviceInfo(
+            identifiers={(DOMAIN, uid)}
+        )
+
+
+class VacuumPollLatencySensor(VacuumMetricsSensor):
+    """95th percentile of the poll duration."""
+
+    _attr_icon = "mdi:timer-outline"
+    _attr_device_class = SensorDeviceClass.DURATION
+    _attr_native_unit_of_measurement = UnitOfTime.MILLISECONDS
+    _attr_suggested_display_precision = 0
+    _unrecorded_attributes = frozenset(f"{stage}_p95_ms" for stage in STAGES)
+
+    def __init__(self, name, uid, coordinator, client):
+        super().__init__(name, uid, coordinator, client)
+        self._attr_name = f"{name} Poll Latency p95"
+        self._attr_unique_id = f"{uid}_poll_latency_p95"
+
+    @property
+    def native_value(self):
+        p95 = self._metrics.stages["poll"].quantile(0.95)
+        return None if p95 is None else round(p95 * 1000, 1)
+
+    @property
+    def extra_state_attributes(self):
+        """Return the per-stage p95, to tell Wi-Fi from CPU from retries."""
+        return {
+            f"{stage}_p95_ms": summary["p95_ms"]
+            for stage, summary in self._metrics.summary()["stages"].items()
+        }
+
+
+class VacuumRetryRateSensor(VacuumMetricsSensor):
+    """Request retries during the last minute."""
+
+    _attr_icon = "mdi:repeat"
+    _attr_native_unit_of_measurement = "retries/min"
+
+    def __init__(self, name, uid, coordinator, client):
+        super().__init__(name, uid, coordinator, client)
+        self._attr_name = f"{name} Retries"
+        self._attr_unique_id = f"{uid}_retries_per_minute"
+
+    @property
+    def native_value(self):
+        return self._metrics.retries_per_minute
@@ -0,0 +1,186 @@
+"""Last known status of a vacuum, kept on disk across restarts.
+
+The status is stored in a small binary file: a header with the format
+version, a checksum of the field names (a snapshot of other fields is not
+loaded) and the time it was polled, then one tagged value per field.
+Writes are delayed and coalesced, so a poll every few seconds costs one
+write per ``delay`` at most, and none while nothing changes.
+"""
+import dataclasses
+import logging
+import operator
+import os
+import struct
+import time
+import zlib
+from typing import Optional, Tuple
+
+from homeassistant.core import CALLBACK_TYPE, HomeAssistant, callback
+from homeassistant.helpers.event import async_call_later
+
+from .const import SNAPSHOT_SAVE_DELAY
+from .miio.dreamevacuum import FIELDS, DreameStatus
+
+_LOGGER = logging.getLogger(__name__)
+
+MAGIC = b"XVS"
+VERSION = 1
+HEADER = struct.Struct("<3sBId")  # magic, version, fields checksum, polled at
+
+# Device fields; stale_fields is not a property and is not stored
+STORED_FIELDS = tuple(name for name in FIELDS if name != "stale_fields")
+SCHEMA = zlib.crc32(",".join(STORED_FIELDS).encode())
+_STORED_VALUES = operator.attrgetter(*STORED_FIELDS)
+
+# Value tags
+_NONE = 0
+_BOOL = 1
+_INT32 = 2
+_INT64 = 3
+_FLOAT = 4
+_STR = 5
+
+_TAG = struct.Struct("<B")
+_I32 = struct.Struct("<i")
+_I64 = struct.Struct("<q")
+_F64 = struct.Struct("<d")
+_LEN = struct.Struct("<H")
+
+
+def encode_status(status: DreameStatus, polled_at: float) -> bytes:
+    """Serialize the device fields of a status."""
+    parts = [HEADER.pack(MAGIC, VERSION, SCHEMA, polled_at)]
+    for value in _STORED_VALUES(status):
+        if value is None:
+            parts.append(_TAG.pack(_NONE))
+        elif isinstance(value, bool):
+            parts.append(_TAG.pack(_BOOL) + _TAG.pack(value))
+        elif isinstance(value, int):
+            if -(2**31) <= value < 2**31:
+                parts.append(_TAG.pack(_INT32) + _I32.pack(value))
+            else:
+                parts.append(_TAG.pack(_INT64) + _I64.pack(value))
+        elif isinstance(value, float):
+            parts.append(_TAG.pack(_FLOAT) + _F64.pack(value))
+        else:
+            data = str(value).encode("utf-8")[:0xFFFF]
+            parts.append(_TAG.pack(_STR) + _LEN.pack(len(data)) + data)
+    return b"".join(parts)
+
+
+def decode_status(data: bytes) -> Tuple[DreameStatus, float]:
+    """Return the status and the time it was polled; ValueError if data is
+    not a snapshot of the current fields."""
+    try:
+        magic, version, schema, polled_at = HEADER.unpack_from(data)
+        if magic != MAGIC or version != VERSION or schema != SCHEMA:
+            raise ValueError("Snapshot of another format")
+        offset = HEADER.size
+        values = []
+        for _ in STORED_FIELDS:
+            (tag,) = _TAG.unpack_from(data, offset)
+            offset += 1
+            if tag == _NONE:
+                values.append(None)
+            elif tag == _BOOL:
+                values.append(bool(_TAG.unpack_from(data, offset)[0]))
+                offset += _TAG.size
+            elif tag == _INT32:
+                values.append(_I32.unpack_from(data, offset)[0])
+                offset += _I32.size
+            elif tag == _INT64:
+                values.append(_I64.unpack_from(data, offset)[0])
+                offset += _I64.size
+            elif tag == _FLOAT:
+                values.append(_F64.unpack_from(data, offset)[0])
+                offset += _F64.size
+            elif tag == _STR:
+                (length,) = _LEN.unpack_from(data, offset)
+                offset += _LEN.size
+                if offset + length > len(data):
+                    raise ValueError("Truncated snapshot")
+                values.append(data[offset : offset + length].decode("utf-8"))
+                offset += length
+            else:
+                raise ValueError("Unknown value tag %s" % tag)
+        if offset != len(data):
+            raise ValueError("Snapshot followed by %s bytes" % (len(data) - offset))
+    except struct.error as ex:
+        raise ValueError("Truncated snapshot") from ex
+    return DreameStatus(**dict(zip(STORED_FIELDS, values))), polled_at
+
+
+class SnapshotStore:
+    """Delayed, coalescing writer and loader of one vacuum's snapshot."""
+
+    def __init__(
+        self, hass: HomeAssistant, path: str, delay: float = SNAPSHOT_SAVE_DELAY
+    ) -> None:
+        self.hass = hass
+        self.path = path
+        self.delay = delay
+        self._saved = None  # type: Optional[DreameStatus]
+        self._pending = None  # type: Optional[Tuple[DreameStatus, float]]
+        self._unsub_save = None  # type: Optional[CALLBACK_TYPE]
+
+    async def async_load(self) -> Optional[Tuple[DreameStatus, float]]:
+        """Return the stored status and the time it was polled, if any.
+
+        All fields of the status are listed in its ``stale_fields``."""
+        try:
+            data = await self.hass.async_add_executor_job(self._read)
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError) as err:
+            _LOGGER.debug("Ignoring status snapshot %s: %s", self.path, err)
+            return None
+        status, polled_at = data
+        self._saved = status
+        stale = frozenset(STORED_FIELDS)
+        return dataclasses.replace(status, stale_fields=stale), polled_at
+
+    @callback
+    def async_schedule_save(self, status: DreameStatus) -> None:
+        """Store status within delay seconds, unless it did not change."""
+        if status is None:
+            return
+        if self._saved is not None and not self._saved.diff(status):
+            self._pending = None
+            return
+        self._pending = (status, time.time())
+        if self._unsub_save is None:
+            self._unsub_save = async_call_later(
+                self.hass, self.delay, self._async_save_callback
+            )
+
+    async def _async_save_callback(self, _now) -> None:
+        self._unsub_save = None
+        await self.async_flush()
+
+    async def async_flush(self) -> None:
+        """Write the pending status now."""
+        if self._unsub_save is not None:
+            self._unsub_save()
+            self._unsub_save = None
+        if self._pending is None:
+            return
+        status, polled_at = self._pending
+        self._pending = None
+        try:
+            await self.hass.async_add_executor_job(
+                self._write, encode_status(status, polled_at)
+            )
+        except OSError as err:
+            _LOGGER.warning("Unable to store the status snapshot: %s", err)
+            return
+        self._saved = status
+
+    def _read(self) -> Tuple[DreameStatus, float]:
+        with open(self.path, "rb") as f:
+            return decode_status(f.read())
+
+    def _write(self, data: bytes) -> None:
+        temp = self.path + ".tmp"
+        with open(temp, "wb") as f:
+            f.write(data)
+        os.replace(temp, self.path)
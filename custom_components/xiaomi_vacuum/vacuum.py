@@ -2,15 +2,36 @@
 
 import logging
 
+import voluptuous as vol
+
 from homeassistant.components.vacuum import (
     StateVacuumEntity,
     VacuumEntityFeature,
     VacuumActivity,
 )
-from homeassistant.helpers.update_coordinator import CoordinatorEntity
+from homeassistant.core import SupportsResponse
+from homeassistant.exceptions import ServiceValidationError
+from homeassistant.helpers import config_validation as cv, entity_platform
 from homeassistant.helpers.entity import DeviceInfo
-
-from .const import DOMAIN, DATA_COORDINATOR, DATA_CLIENT
+from homeassistant.util import dt as dt_util
+
+from .const import (
+    DOMAIN,
+    DATA_COORDINATOR,
+    DATA_CLIENT,
+    DATA_HISTORY,
+    DATA_MAP_TRACKER,
+    SERVICE_APPLY_PROFILE,
+    SERVICE_CLEAN_ZONES,
+    SERVICE_DUMP_TRACE,
+    SERVICE_EXPORT_HISTORY,
+    SERVICE_REMOTE_CONTROL_MOVE,
+    SERVICE_REMOTE_CONTROL_START,
+    SERVICE_REMOTE_CONTROL_STOP,
+)
+from .entity import DreameCoordinatorEntity
+from .history import HISTORY_FIELDS, TIERS
+from .miio.remote import RemoteDriveSession
 
 _LOGGER = logging.getLogger(__name__)
 
@@ -61,6 +82,24 @@ ERROR_CODE_TO_ERROR = {
 }
 
 
+# DreameStatus fields read by the vacuum entity and its attributes
+VACUUM_STATUS_FIELDS = frozenset(
+    {
+        "status",
+        "error",
+        "fan_speed",
+        "water_level",
+        "area",
+        "timer",
+        "total_clean_count",
+        "total_area",
+        "brush_life_level",
+        "brush_life_level2",
+        "filter_life_level",
+    }
+)
+
+
 SUPPORT_XIAOMI = (
     VacuumEntityFeature.STATE
     | VacuumEntityFeature.LOCATE
@@ -83,18 +122,107 @@ async def async_setup_entry(hass, entry, async_add_entities):
     name = entry.data.get("name")
     info = data.get("device_info_raw")
 
-    vacuum_entity = DreameVacuumEntity(name, coordinator, client, info)
+    vacuum_entity = DreameVacuumEntity(
+        name,
+        coordinator,
+        client,
+        info,
+        data.get(DATA_MAP_TRACKER),
+        data.get(DATA_HISTORY),
+    )
     async_add_entities([vacuum_entity])
 
-
-class DreameVacuumEntity(StateVacuumEntity, CoordinatorEntity):
+    platform = entity_platform.async_get_current_platform()
+    platform.async_register_entity_service(
+        SERVICE_APPLY_PROFILE,
+        {
+            vol.Optional("fan_speed"): vol.In(list(SPEED_CODE_TO_NAME.values())),
+            vol.Optional("water_level"): vol.In(list(WATER_CODE_TO_NAME.values())),
+            vol.Optional("audio_volume"): vol.All(
+                vol.Coerce(int), vol.Range(min=0, max=100)
+            ),
+            vol.Optional("start", default=False): cv.boolean,
+        },
+        "async_apply_profile",
+    )
+    platform.async_register_entity_service(
+        SERVICE_DUMP_TRACE,
+        {vol.Optional("clear", default=False): cv.boolean},
+        "async_dump_trace",
+        supports_response=SupportsResponse.ONLY,
+    )
+    platform.async_register_entity_service(
+        SERVICE_CLEAN_ZONES,
+        {
+            # Room names or ids, and [x, y] points (mm) inside a room
+            vol.Required("zones"): vol.All(
+                cv.ensure_list,
+                [
+                    vol.Any(
+                        vol.All([vol.Coerce(int)], vol.Length(min=2, max=2)),
+                        cv.string,
+                    )
+                ],
+                vol.Length(min=1),
+            ),
+            vol.Optional("repeats", default=1): vol.All(
+                vol.Coerce(int), vol.Range(min=1, max=3)
+            ),
+            vol.Optional("fan_speed"): vol.In(list(SPEED_CODE_TO_NAME.values())),
+            vol.Optional("water_level"): vol.In(list(WATER_CODE_TO_NAME.values())),
+        },
+        "async_clean_zones",
+    )
+    platform.async_register_entity_service(
+        SERVICE_EXPORT_HISTORY,
+        {
+            vol.Optional("tier", default=TIERS[0].name): vol.In(
+                [tier.name for tier in TIERS]
+            ),
+            vol.Optional("start"): cv.datetime,
+            vol.Optional("end"): cv.datetime,
+            vol.Optional("fields"): vol.All(
+                cv.ensure_list, [vol.In(sorted(HISTORY_FIELDS))]
+            ),
+        },
+        "async_export_history",
+        supports_response=SupportsResponse.ONLY,
+    )
+    platform.async_register_entity_service(
+        SERVICE_REMOTE_CONTROL_START, {}, "async_remote_control_start"
+    )
+    platform.async_register_entity_service(
+        SERVICE_REMOTE_CONTROL_MOVE,
+        {
+            vol.Optional("rotation", default=0): vol.All(
+                vol.Coerce(int), vol.Range(min=-128, max=128)
+            ),
+            vol.Optional("velocity", default=0): vol.All(
+                vol.Coerce(int), vol.Range(min=-300, max=100)
+            ),
+        },
+        "async_remote_control_move",
+    )
+    platform.async_register_entity_service(
+        SERVICE_REMOTE_CONTROL_STOP, {}, "async_remote_control_stop"
+    )
+
+
+class DreameVacuumEntity(StateVacuumEntity, DreameCoordinatorEntity):
     """Representation of the Dreame 1C vacuum."""
 
-    def __init__(self, name, coordinator, client, info):
+    def __init__(
+        self, name, coordinator, client, info, map_tracker=None, history=None
+    ):
         StateVacuumEntity.__init__(self)
-        CoordinatorEntity.__init__(self, coordinator)
+        DreameCoordinatorEntity.__init__(
+            self, coordinator, context=VACUUM_STATUS_FIELDS
+        )
 
         self._client = client
+        self._map_tracker = map_tracker
+        self._history = history
+        self._remote = RemoteDriveSession(client)
 
         # Unique ID stabile e corretto
         uid = f"xiaomi_vacuum_{name.lower().replace(' ', '_')}"
@@ -164,7 +292,7 @@ class DreameVacuumEntity(StateVacuumEntity, CoordinatorEntity):
     def extra_state_attributes(self):
         state = self.coordinator.data
         if not state:
-            return {}
+            return self.freshness_attributes
 
         status = self.activity.name.lower()
         friendly_status = {
@@ -177,6 +305,7 @@ class DreameVacuumEntity(StateVacuumEntity, CoordinatorEntity):
         }.get(status, "Sconosciuto")
 
         return {
+            **self.freshness_attributes,
             "status": status,
             "friendly_status": friendly_status,
             "is_cleaning": status == "cleaning",
@@ -244,4 +373,105 @@ class DreameVacuumEntity(StateVacuumEntity, CoordinatorEntity):
                 "Unable to set water level",
                 self._client.set_water_level,
                 reverse[level]
-            )
\ No newline at end of file
+            )
+
+    async def async_apply_profile(
+        self, fan_speed=None, water_level=None, audio_volume=None, start=False
+    ):
+        """Write a cleaning profile in one request and optionally start cleaning."""
+        speeds = {v: k for k, v in SPEED_CODE_TO_NAME.items()}
+        levels = {v: k for k, v in WATER_CODE_TO_NAME.items()}
+
+        if not start and all(
+            value is None for value in (fan_speed, water_level, audio_volume)
+        ):
+            return
+
+        await self._exec(
+            "Unable to apply profile",
+            self._client.apply_profile,
+            speeds.get(fan_speed),
+            levels.get(water_level),
+            audio_volume,
+            start,
+        )
+
+    async def async_clean_zones(
+        self, zones, repeats=1, fan_speed=None, water_level=None
+    ):
+        """Clean the rooms named or pointed at, all in one zone request."""
+        regions = self._map_tracker.regions if self._map_tracker else None
+        if not regions:
+            raise ServiceValidationError("The vacuum has not sent a map with rooms yet")
+
+        rects = []
+        for zone in zones:
+            if isinstance(zone, str):
+                region = regions.by_name(zone)
+            else:
+                region = regions.at(*zone)
+            if region is None:
+                raise ServiceValidationError(f"No room matches {zone}")
+            if region.rect not in rects:
+                rects.append(region.rect)
+
+        state = self.coordinator.data
+        speeds = {v: k for k, v in SPEED_CODE_TO_NAME.items()}
+        levels = {v: k for k, v in WATER_CODE_TO_NAME.items()}
+        coords = self._client.zone_payload(
+            rects,
+            repeats,
+            speeds.get(fan_speed, getattr(state, "fan_speed", None) or 0),
+            levels.get(water_level, getattr(state, "water_level", None) or 1),
+        )
+        await self._exec("Unable to clean zones", self._client.zone_cleanup, coords)
+
+    async def async_remote_control_start(self):
+        """Start a remote control session."""
+        await self._exec("Unable to start remote control", self._remote.start)
+
+    async def async_remote_control_move(self, rotation=0, velocity=0):
+        """Set the motion of the running remote control session.
+
+        Only stores the motion, the session thread sends it on its next
+        tick; calls made in between replace each other."""
+        if not self._remote.running:
+            raise ServiceValidationError("Remote control has not been started")
+        self._remote.move(rotation, velocity)
+
+    async def async_remote_control_stop(self):
+        """Stop the vacuum and end the remote control session."""
+        await self._exec("Unable to stop remote control", self._remote.stop)
+
+    async def async_will_remove_from_hass(self) -> None:
+        """End a remote control session left running."""
+        await super().async_will_remove_from_hass()
+        if self._remote.running:
+            await self._exec("Unable to stop remote control", self._remote.stop)
+
+    async def async_export_history(
+        self, tier="raw", start=None, end=None, fields=None
+    ):
+        """Return the poll history of one tier as columns, oldest row first.
+
+        start and end without a time zone are local times. ts is in epoch
+        seconds; values the poll did not return are null."""
+        if self._history is None:
+            raise ServiceValidationError("No poll history is kept for this vacuum")
+        # Reading and downsampling the mapped file blocks: run in executor
+        columns = await self.hass.async_add_executor_job(
+            self._history.export,
+            tier,
+            dt_util.as_local(start).timestamp() if start is not None else 0.0,
+            dt_util.as_local(end).timestamp() if end is not None else float("inf"),
+            fields,
+        )
+        return {"tier": tier, "rows": len(columns["ts"]), "columns": columns}
+
+    async def async_dump_trace(self, clear=False):
+        """Return the packet trace of the vacuum, oldest record first."""
+        trace = self._client.trace
+        records = trace.dump()
+        if clear:
+            trace.clear()
+        return {"records": records}
\ No newline at end of file
@@ -0,0 +1,110 @@
+"""Poll history: rows, tiers and the file they live in."""
+import numpy as np
+import pytest
+
+from custom_components.xiaomi_vacuum.history import TIERS, DeviceHistory
+from custom_components.xiaomi_vacuum.miio.dreamevacuum import DreameStatus
+
+RAW_CAPACITY = TIERS[0].capacity
+
+
+@pytest.fixture
+def history(tmp_path):
+    history = DeviceHistory(str(tmp_path / "history" / "vacuum.bin"))
+    yield history
+    history.close()
+
+
+def _status(**values) -> DreameStatus:
+    return DreameStatus(**{"battery": 80, "status": 6, "error": 0, **values})
+
+
+def test_rows_come_back_as_polled(history):
+    history.append(_status(area=12, timer=300), 100.0)
+    history.append(_status(battery=None), 115.0)
+
+    columns = history.export()
+    assert columns["ts"] == [100.0, 115.0]
+    assert columns["battery"] == [80, None]
+    assert columns["area"] == [12, None]
+    assert columns["status"] == [6, 6]
+
+
+def test_export_selects_range_and_fields(history):
+    for ts in range(0, 100, 10):
+        history.append(_status(battery=ts), float(ts))
+
+    columns = history.export("raw", 20.0, 50.0, ["battery"])
+    assert columns == {"ts": [20.0, 30.0, 40.0], "battery": [20, 30, 40]}
+    with pytest.raises(ValueError):
+        history.export("1h")
+
+
+@pytest.mark.parametrize(
+    "field, value, stored",
+    [
+        ("status", 127, 127),
+        ("status", 128, 128),
+        ("error", 1000, 1000),
+        ("error", 40000, None),
+        ("battery", 127, 127),
+        ("battery", 300, None),
+        ("brush_life_level", -129, None),
+        ("area", 2**31, None),
+    ],
+)
+def test_values_out_of_column_range_are_missing(history, field, value, stored):
+    history.append(_status(**{field: value}), 1.0)
+
+    assert history.export()[field] == [stored]
+    assert history.export()["ts"] == [1.0]
+
+
+def test_tiers_keep_the_last_row_of_each_bucket(history):
+    for ts in range(0, 1000, 10):
+        history.append(_status(timer=ts), float(ts))
+
+    assert len(history.export("raw")["ts"]) == 100
+    # Minutes 0..14 closed by the first row of the next minute
+    minutes = history.export("1min")["ts"]
+    assert minutes[:3] == [50.0, 110.0, 170.0]
+    assert minutes[-1] == 950.0
+    # The first quarter hour closes once minute 15 does
+    assert history.export("15min")["ts"] == [890.0]
+
+
+def test_full_ring_drops_the_oldest_rows(history):
+    for ts in range(RAW_CAPACITY + 10):
+        history.append(_status(), float(ts))
+
+    ts = history.export()["ts"]
+    assert len(ts) == RAW_CAPACITY
+    assert ts[0] == 10.0
+    assert ts == sorted(ts)
+
+
+def test_history_survives_a_restart(tmp_path):
+    path = str(tmp_path / "vacuum.bin")
+    history = DeviceHistory(path)
+    history.append(_status(battery=42), 5.0)
+    history.close()
+
+    history = DeviceHistory(path)
+    assert history.export()["battery"] == [42]
+    history.close()
+
+
+def test_history_of_another_format_is_discarded(tmp_path):
+    path = str(tmp_path / "vacuum.bin")
+    history = DeviceHistory(path)
+    history.append(_status(), 5.0)
+    history.close()
+
+    data = np.memmap(path, dtype=np.int64, mode="r+", shape=(2,))
+    data[1] = 1  # format version
+    data.flush()
+    del data
+
+    history = DeviceHistory(path)
+    assert history.export()["ts"] == []
+    history.close()
@@ -0,0 +1,192 @@
+"""Decoding of map_view values."""
+import base64
+import json
+import struct
+import zlib
+
+import numpy as np
+import pytest
+
+from custom_components.xiaomi_vacuum.map_decoder import (
+    FREE,
+    HEADER,
+    UNKNOWN,
+    WALL,
+    MapDecodeError,
+    Pose,
+    RegionIndex,
+    decode_map,
+    parse_path,
+)
+from tools.simulator import encode_map
+
+
+def _room(room: int, kind: int = 0) -> int:
+    return room << 2 | kind
+
+
+def _encode_raw(raw: bytes) -> str:
+    return base64.b64encode(zlib.compress(raw)).decode()
+
+
+def test_pixels_map_to_grid_and_rooms():
+    pixels = np.array(
+        [
+            [0, 1, 2],
+            [_room(3, 1), _room(3), _room(3, 2)],
+        ]
+    )
+
+    map_data = decode_map(encode_map(pixels))
+    assert (map_data.width, map_data.height) == (3, 2)
+    assert map_data.grid.tolist() == [[UNKNOWN, FREE, WALL], [FREE, FREE, WALL]]
+    assert map_data.segments.tolist() == [[0, 0, 0], [3, 3, 0]]
+
+
+def test_header_fields():
+    payload = encode_map(
+        np.ones((2, 2)),
+        map_id=7,
+        frame_id=9,
+        frame_type=b"P",
+        robot=(1200, -300, 90),
+        pixel_size=0,
+        left=-1000,
+        top=500,
+    )
+
+    map_data = decode_map(payload)
+    assert (map_data.map_id, map_data.frame_id, map_data.frame_type) == (7, 9, "P")
+    assert map_data.robot == Pose(1200, -300, 90)
+    # The firmware reports 0, 0 for a pose it does not know
+    assert map_data.charger is None
+    # A missing pixel size is the firmware's 50 mm
+    assert map_data.pixel_size == 50
+    assert (map_data.left, map_data.top) == (-1000, 500)
+
+
+def test_trailer_path_and_extra():
+    payload = encode_map(
+        np.ones((2, 2)),
+        extra={"tr": "M100,200L10,0L0,10S500,500L5,5", "sa": [[1, 0]]},
+    )
+
+    map_data = decode_map(payload)
+    assert map_data.path.tolist() == [
+        [100, 200],
+        [110, 200],
+        [110, 210],
+        [500, 500],
+        [505, 505],
+    ]
+    assert map_data.path_starts.tolist() == [0, 3]
+    assert [len(line) for line in map_data.polylines()] == [3, 2]
+    assert map_data.extra["sa"] == [[1, 0]]
+
+
+def test_path_starting_with_a_delta():
+    points, starts = parse_path("L10,10L5,5")
+    assert points.tolist() == [[10, 10], [15, 15]]
+    assert starts.tolist() == [0]
+
+
+@pytest.mark.parametrize("path", ["", "M1,2L3", "1,2"])
+def test_malformed_path_is_empty(path):
+    points, starts = parse_path(path)
+    assert points.shape == (0, 2)
+    assert len(starts) == 0
+
+
+def test_trailing_padding_is_ignored():
+    raw = HEADER.pack(1, 1, b"I", 0, 0, 0, 0, 0, 0, 50, 1, 1, 0, 0) + b"\x01"
+    map_data = decode_map(_encode_raw(raw + b"\x00" * 8))
+    assert map_data.extra == {}
+    assert map_data.grid.tolist() == [[FREE]]
+
+
+def _header(width: int, height: int) -> bytes:
+    return HEADER.pack(1, 1, b"I", 0, 0, 0, 0, 0, 0, 50, width, height, 0, 0)
+
+
+@pytest.mark.parametrize(
+    "payload",
+    [
+        "",
+        "not base64 at all!",
+        base64.b64encode(b"not zlib").decode(),
+        _encode_raw(b"\x00" * (HEADER.size - 1)),
+        _encode_raw(_header(4, 4) + b"\x01" * 15),
+        _encode_raw(_header(-1, 4)),
+        _encode_raw(_header(1, 1) + b"\x01{not json"),
+        _encode_raw(_header(1, 1) + b"\x01" + json.dumps([1, 2]).encode()),
+        _encode_raw(_header(1, 1) + b"\x01" + json.dumps({"tr": 5}).encode()),
+        _encode_raw(_header(1, 1) + b"\x01" + json.dumps({"tr": "M1,2é"}).encode()),
+    ],
+)
+def test_invalid_payload_raises(payload):
+    with pytest.raises(MapDecodeError):
+        decode_map(payload)
+
+
+def test_decode_error_is_a_value_error():
+    with pytest.raises(ValueError):
+        decode_map(_encode_raw(struct.pack("<h", 1)))
+
+
+def _rooms(seg_inf=None):
+    # Room 1 on the left, room 2 on the right, a wall column between them
+    pixels = np.array(
+        [
+            [_room(1, 1), _room(1, 1), 2, _room(2, 1), _room(2, 1)],
+            [_room(1, 1), _room(1, 1), 2, _room(2, 1), 0],
+            [_room(1, 1), 1, 2, 0, 0],
+        ]
+    )
+    extra = {"seg_inf": seg_inf} if seg_inf is not None else None
+    return decode_map(
+        encode_map(pixels, pixel_size=100, left=-200, top=1000, extra=extra)
+    )
+
+
+def test_region_index_bounds_and_lookup():
+    index = RegionIndex(_rooms())
+
+    assert len(index) == 2
+    left_room, right_room = index.regions[1], index.regions[2]
+    assert left_room.rect == (-200, 1000, 0, 1300)
+    assert left_room.pixels == 5
+    assert right_room.rect == (100, 1000, 300, 1200)
+    assert right_room.pixels == 3
+
+    assert index.at(-150, 1250) is left_room
+    assert index.at(250, 1050) is right_room
+    # Floor outside rooms, a wall and off the map
+    assert index.at(-50, 1250) is None
+    assert index.at(50, 1050) is None
+    assert index.at(-201, 1000) is None
+    assert index.at(0, 1300) is None
+
+
+def test_region_names():
+    name = base64.b64encode("Cucina".encode()).decode()
+    index = RegionIndex(_rooms({"1": {"name": name}, "2": {"name": "not base64!"}}))
+
+    assert index.by_name("cucina ").id == 1
+    assert index.by_name("1").name == "Cucina"
+    assert index.by_name("not base64!").id == 2
+    assert index.by_name("Room 3") is None
+
+
+@pytest.mark.parametrize("seg_inf", [{}, [1, 2], "rooms", {"1": "Kitchen"}])
+def test_rooms_without_names(seg_inf):
+    index = RegionIndex(_rooms(seg_inf))
+
+    assert index.by_name("room 1").id == 1
+    assert index.by_name(2).name == "Room 2"
+
+
+def test_map_without_rooms():
+    index = RegionIndex(decode_map(encode_map(np.ones((2, 2)))))
+
+    assert len(index) == 0
+    assert index.at(0, 0) is None
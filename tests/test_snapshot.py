@@ -0,0 +1,118 @@
+"""Status snapshots: encoding, decoding and damaged files."""
+import asyncio
+import dataclasses
+
+import pytest
+from homeassistant.core import HomeAssistant
+
+from custom_components.xiaomi_vacuum.snapshot import (
+    HEADER,
+    STORED_FIELDS,
+    SnapshotStore,
+    decode_status,
+    encode_status,
+)
+from custom_components.xiaomi_vacuum.miio.dreamevacuum import DreameStatus
+
+
+def _status(**values) -> DreameStatus:
+    return DreameStatus(
+        **{
+            "battery": 80,
+            "status": 6,
+            "error": 0,
+            "area": 2**40,
+            "timezone": "Europe/Rome",
+            **values,
+        }
+    )
+
+
+def test_round_trip():
+    status = _status()
+
+    decoded, polled_at = decode_status(encode_status(status, 1234.5))
+    assert decoded == status
+    assert polled_at == 1234.5
+
+
+def test_stale_fields_are_not_stored():
+    status = _status(stale_fields=frozenset({"battery"}))
+
+    decoded, _ = decode_status(encode_status(status, 0.0))
+    assert decoded.stale_fields == frozenset()
+    assert decoded.battery == 80
+
+
+def test_other_values_are_stored_as_text():
+    status = _status(timezone=3.5, error=True)
+
+    decoded, _ = decode_status(encode_status(status, 0.0))
+    assert decoded.timezone == 3.5
+    assert decoded.error is True
+
+
+def test_truncated_snapshot_is_rejected():
+    data = encode_status(_status(), 0.0)
+
+    for length in range(len(data)):
+        with pytest.raises(ValueError):
+            decode_status(data[:length])
+
+
+@pytest.mark.parametrize(
+    "offset, value",
+    [
+        (0, ord("Y")),  # magic
+        (3, 99),  # version
+        (4, 0),  # fields checksum
+        (HEADER.size, 0xEE),  # value tag
+    ],
+)
+def test_corrupt_snapshot_is_rejected(offset, value):
+    data = bytearray(encode_status(_status(), 0.0))
+    data[offset] = value if data[offset] != value else value + 1
+
+    with pytest.raises(ValueError):
+        decode_status(bytes(data))
+
+
+def test_trailing_data_is_rejected():
+    data = encode_status(_status(), 0.0)
+
+    with pytest.raises(ValueError):
+        decode_status(data + b"\x00")
+
+
+def test_invalid_text_is_rejected():
+    data = encode_status(_status(timezone="\xff" * 4), 0.0)
+    data = data.replace("\xff".encode(), b"\xff\xff", 1)
+
+    with pytest.raises(ValueError):
+        decode_status(data)
+
+
+def test_store_loads_all_fields_as_stale(tmp_path):
+    async def run():
+        hass = HomeAssistant(str(tmp_path))
+        try:
+            store = SnapshotStore(hass, str(tmp_path / "status.bin"), delay=0)
+            assert await store.async_load() is None
+
+            store.async_schedule_save(_status())
+            await store.async_flush()
+            status, polled_at = await SnapshotStore(
+                hass, store.path
+            ).async_load()
+
+            (tmp_path / "status.bin").write_bytes(b"XVS\x01garbage")
+            damaged = await store.async_load()
+        finally:
+            await hass.async_stop(force=True)
+        return status, polled_at, damaged
+
+    status, polled_at, damaged = asyncio.run(run())
+    assert status.stale_fields == frozenset(STORED_FIELDS)
+    assert dataclasses.replace(status, stale_fields=frozenset()) == _status()
+    assert polled_at > 0
+    assert damaged is None
@@ -0,0 +1,182 @@
+"""Transport behaviour against the simulator and the impairment proxy.
+
+Run from the repository root with ``python -m pytest tests``."""
+import socket
+import time
+
+import pytest
+
+from custom_components.xiaomi_vacuum.miio.circuitbreaker import (
+    CircuitBreaker,
+    CircuitState,
+)
+from custom_components.xiaomi_vacuum.miio.deadline import Deadline
+from custom_components.xiaomi_vacuum.miio.dreamevacuum import DreameVacuum
+from custom_components.xiaomi_vacuum.miio.exceptions import (
+    CircuitOpenError,
+    DeadlineExceeded,
+    DeviceException,
+)
+from custom_components.xiaomi_vacuum.miio.miioprotocol import (
+    DiscoveredDevice,
+    MiIOProtocol,
+)
+from tools.netem import Impairment, NetemProxy
+from tools.simulator import DEFAULT_TOKEN, SimulatorFleet
+
+# Nothing listens there: a handshake waits out its full timeout
+UNREACHABLE = "127.0.0.2"
+
+
+def _free_port() -> int:
+    with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def _vacuum(address, **kwargs) -> DreameVacuum:
+    host, port = address
+    vacuum = DreameVacuum(host, DEFAULT_TOKEN, port=port, **kwargs)
+    vacuum._protocol._timeout = 0.3
+    return vacuum
+
+
+@pytest.fixture
+def fleet():
+    with SimulatorFleet(1, base_port=_free_port()).running() as fleet:
+        yield fleet
+
+
+@pytest.fixture
+def slow_fleet():
+    with SimulatorFleet(1, base_port=_free_port(), latency=0.2).running() as fleet:
+        yield fleet
+
+
+def test_breaker_opens_and_probe_closes_it(fleet):
+    host, port = fleet.addresses[0]
+    vacuum = _vacuum((UNREACHABLE, port))
+    protocol = vacuum._protocol
+    protocol.breaker = CircuitBreaker(failure_threshold=1, base_backoff=0.2)
+    protocol.rediscover_after = 100
+
+    with pytest.raises(DeviceException):
+        vacuum.info()
+    assert protocol.breaker.state is CircuitState.Open
+
+    requests = fleet.devices[0].requests
+    with pytest.raises(CircuitOpenError):
+        vacuum.info()
+
+    # A failed half-open probe opens the circuit again for twice as long
+    time.sleep(0.25)
+    assert protocol.breaker.state is CircuitState.HalfOpen
+    with pytest.raises(DeviceException):
+        vacuum.info()
+    assert protocol.breaker.state is CircuitState.Open
+    assert protocol.breaker.retry_in > 0.2
+    assert fleet.devices[0].requests == requests
+
+    # The device is back: the next probe gets through and closes the circuit
+    protocol.ip = host
+    time.sleep(0.45)
+    assert vacuum.info().model == "dreame.vacuum.mc1808"
+    assert protocol.breaker.state is CircuitState.Closed
+    assert fleet.devices[0].requests > requests
+
+
+def test_deadline_skips_the_properties_left(slow_fleet):
+    vacuum = _vacuum(slow_fleet.addresses[0])
+    vacuum.send_handshake()
+
+    # Room for the first batches only, the rest is served as stale
+    status = vacuum.status(deadline=Deadline(0.5))
+    assert status.battery == 80
+    assert status.stale_fields
+    assert vacuum._protocol.counters.values["skipped_properties"] > 0
+    assert vacuum._protocol.breaker.state is CircuitState.Closed
+
+
+def test_deadline_used_up_before_the_first_reply(slow_fleet):
+    vacuum = _vacuum(slow_fleet.addresses[0])
+    vacuum.send_handshake()
+
+    with pytest.raises(DeadlineExceeded):
+        vacuum.status(deadline=Deadline(0.05))
+    # Running out of time is not the device failing
+    assert vacuum._protocol.breaker.failures == 0
+
+
+def test_pipelined_send_resends_lost_requests(fleet):
+    device = fleet.devices[0]
+    # A lost hello fails the resend needing it: this seed only drops requests
+    # and their replies
+    proxy = NetemProxy(fleet.addresses[0], Impairment(loss=0.2, seed=18))
+    with proxy.running():
+        vacuum = _vacuum(proxy.address)
+        protocol = vacuum._protocol
+        # Handshake over the clean path, the requests take the lossy one
+        protocol.ip, protocol.port = fleet.addresses[0]
+        vacuum.send_handshake()
+        protocol.ip, protocol.port = proxy.address
+
+        requests = [
+            ("get_properties", [{"did": str(n), "siid": 2, "piid": 1}])
+            for n in range(20)
+        ]
+        results = protocol.send_pipelined(requests)
+
+        assert proxy.stats["uplink"].dropped + proxy.stats["downlink"].dropped > 0
+    assert protocol.counters.values["retries"] > 0
+    assert [r[0]["did"] for r in results] == [str(n) for n in range(20)]
+    assert all(r[0]["value"] == device.state.values["battery"] for r in results)
+
+
+def test_rediscovery_follows_the_device_to_its_new_address(fleet, monkeypatch):
+    host, port = fleet.addresses[0]
+    vacuum = _vacuum((host, port))
+    protocol = vacuum._protocol
+    protocol.breaker = CircuitBreaker(failure_threshold=10)
+    protocol.rediscover_after = 1
+    protocol.rediscover_interval = 0
+    vacuum.send_handshake()
+
+    # The broadcast of a rediscovery goes to the simulator on loopback
+    discover = MiIOProtocol.discover
+
+    def discover_on_loopback(addr=None, timeout=5, port=54321, done=None):
+        if addr is not None:
+            return discover(addr, timeout, port, done)
+        m = discover(host, timeout, port)
+        if m is None:
+            return []
+        header = m.header.value
+        return [DiscoveredDevice(host, port, header.device_id, header.ts)]
+
+    monkeypatch.setattr(MiIOProtocol, "discover", staticmethod(discover_on_loopback))
+    moved_to = []
+    protocol.on_address_change = moved_to.append
+
+    # The DHCP lease changed: the device is no longer at the known address
+    protocol.ip = UNREACHABLE
+    assert vacuum.info().model == "dreame.vacuum.mc1808"
+    assert protocol.ip == host
+    assert moved_to == [host]
+    assert protocol.counters.values["rediscoveries"] == 1
+
+
+def test_nowait_commands_wait_for_a_closed_circuit(fleet):
+    vacuum = _vacuum(fleet.addresses[0])
+    protocol = vacuum._protocol
+    vacuum.send_handshake()
+    protocol.breaker = CircuitBreaker(failure_threshold=1, base_backoff=60)
+    protocol.breaker.record_failure()
+
+    requests = fleet.devices[0].requests
+    with pytest.raises(CircuitOpenError):
+        protocol.send_nowait("get_properties", [])
+    assert fleet.devices[0].requests == requests
+
+    protocol.breaker.reset()
+    protocol.send_nowait("get_properties", [])
+    protocol.close_nowait()
@@ -0,0 +1,5 @@
+"""Development tools for the Xiaomi Vacuum 1C integration.
+
+These are not loaded by Home Assistant. They expect a development
+environment with Home Assistant and the integration requirements installed
+and are run from the repository root, e.g. ``python -m tools.simulator``."""
@@ -0,0 +1,29 @@
+"""Run asyncio services on a background thread.
+
+Lets the simulator and the impairment proxy be used from synchronous code
+such as pytest fixtures and benchmark scripts."""
+import asyncio
+import threading
+
+
+class BackgroundLoop:
+    """Event loop running on a daemon thread."""
+
+    def __init__(self) -> None:
+        self.loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(
+            target=self.loop.run_forever, name="tools-background-loop", daemon=True
+        )
+
+    def start(self) -> "BackgroundLoop":
+        self._thread.start()
+        return self
+
+    def run(self, coro, timeout=None):
+        """Run a coroutine on the loop and wait for its result."""
+        return asyncio.run_coroutine_threadsafe(coro, self.loop).result(timeout)
+
+    def stop(self) -> None:
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self._thread.join()
+        self.loop.close()
@@ -0,0 +1,485 @@
+"""Analyze captured miIO traffic.
+
+Reads a pcap or pcapng capture of UDP port 54321 traffic, decrypts every
+message with the given device tokens and reports, per device, round trip
+time distributions, retry/duplicate/unanswered rates, drift of the device
+clock against the capture clock and payload sizes per method::
+
+    python -m tools.analyze_capture capture.pcapng --token 192.168.1.50=<token>
+    tcpdump -i wlan0 -w - udp port 54321 | python -m tools.analyze_capture -
+
+Tokens given without an address are tried on every device until one
+verifies. The capture is processed as a generator pipeline (packets ->
+messages -> exchanges) keeping only the requests still waiting for their
+reply, so memory stays bounded whatever the capture size.
+"""
+import argparse
+import collections
+import json
+import struct
+import sys
+import time
+from typing import BinaryIO, Dict, Iterator, List, NamedTuple, Optional, Tuple
+
+from construct import GreedyBytes
+
+from custom_components.xiaomi_vacuum.miio.metrics import Histogram
+from custom_components.xiaomi_vacuum.miio.protocol import EncryptionAdapter, Utils
+
+
+MIIO_PORT = 54321
+HEADER = struct.Struct(">HHI4sI16s")
+MAGIC = 0x2131
+
+# pcap link types
+LINKTYPE_ETHERNET = 1
+LINKTYPE_RAW = 101
+LINKTYPE_LINUX_SLL = 113
+LINKTYPE_IPV4 = 228
+
+
+class Packet(NamedTuple):
+    ts: float
+    src: Tuple[str, int]
+    dst: Tuple[str, int]
+    data: bytes
+
+
+class Message(NamedTuple):
+    ts: float
+    device: str
+    request: bool
+    hello: bool
+    device_ts: int
+    size: int
+    payload: Optional[dict]
+
+
+class Exchange(NamedTuple):
+    device: str
+    method: Optional[str]
+    request: Optional[Message]
+    reply: Optional[Message]
+
+
+# --- capture readers -------------------------------------------------------
+
+
+def _pcap_records(f: BinaryIO, magic: bytes) -> Iterator[Tuple[float, int, bytes]]:
+    endian = "<" if magic in (b"\xd4\xc3\xb2\xa1", b"\x4d\x3c\xb2\xa1") else ">"
+    nanos = magic in (b"\x4d\x3c\xb2\xa1", b"\xa1\xb2\x3c\x4d")
+    header = f.read(20)
+    linktype = struct.unpack(endian + "HHiIII", header)[-1] & 0xFFFF
+    record = struct.Struct(endian + "IIII")
+    divisor = 1e9 if nanos else 1e6
+    while True:
+        head = f.read(record.size)
+        if len(head) < record.size:
+            return
+        sec, frac, caplen, _ = record.unpack(head)
+        yield sec + frac / divisor, linktype, f.read(caplen)
+
+
+def _pcapng_records(f: BinaryIO, first: bytes) -> Iterator[Tuple[float, int, bytes]]:
+    endian = "<"
+    interfaces = []  # (linktype, ticks per second)
+    block = first
+    while True:
+        head = block + f.read(8 - len(block))
+        if len(head) < 8:
+            return
+        block = b""
+        if head[:4] == b"\x0a\x0d\x0d\x0a":
+            body_head = f.read(4)
+            endian = "<" if body_head == b"\x4d\x3c\x2b\x1a" else ">"
+            length = struct.unpack(endian + "I", head[4:])[0]
+            f.read(length - 12)
+            interfaces = []
+            continue
+
+        block_type, length = struct.unpack(endian + "II", head)
+        body = f.read(length - 8)
+        if block_type == 1:  # interface description
+            linktype = struct.unpack(endian + "H", body[:2])[0]
+            interfaces.append((linktype, _if_tsresol(body[8:-4], endian)))
+        elif block_type == 6:  # enhanced packet
+            iface, high, low, caplen = struct.unpack(endian + "IIII", body[:16])
+            linktype, resolution = interfaces[iface]
+            yield ((high << 32) | low) / resolution, linktype, body[20 : 20 + caplen]
+        elif block_type == 3:  # simple packet
+            linktype, _ = interfaces[0]
+            yield 0.0, linktype, body[4:-4]
+
+
+def _if_tsresol(options: bytes, endian: str) -> float:
+    while len(options) >= 4:
+        code, length = struct.unpack(endian + "HH", options[:4])
+        if code == 0:
+            break
+        if code == 9:
+            value = options[4]
+            if value & 0x80:
+                return float(2 ** (value & 0x7F))
+            return float(10 ** value)
+        options = options[4 + length + (-length % 4) :]
+    return 1e6
+
+
+def read_packets(f: BinaryIO) -> Iterator[Packet]:
+    """Yield the UDP datagrams to or from the miIO port of a capture."""
+    magic = f.read(4)
+    if magic == b"\x0a\x0d\x0d\x0a":
+        records = _pcapng_records(f, magic)
+    elif magic in (
+        b"\xd4\xc3\xb2\xa1",
+        b"\xa1\xb2\xc3\xd4",
+        b"\x4d\x3c\xb2\xa1",
+        b"\xa1\xb2\x3c\x4d",
+    ):
+        records = _pcap_records(f, magic)
+    else:
+        raise ValueError("Not a pcap or pcapng capture")
+
+    for ts, linktype, frame in records:
+        if linktype == LINKTYPE_ETHERNET:
+            ethertype = struct.unpack(">H", frame[12:14])[0]
+            offset = 14
+            if ethertype == 0x8100:  # VLAN tag
+                ethertype = struct.unpack(">H", frame[16:18])[0]
+                offset = 18
+            if ethertype != 0x0800:
+                continue
+            ip = frame[offset:]
+        elif linktype == LINKTYPE_LINUX_SLL:
+            if struct.unpack(">H", frame[14:16])[0] != 0x0800:
+                continue
+            ip = frame[16:]
+        elif linktype in (LINKTYPE_RAW, LINKTYPE_IPV4):
+            ip = frame
+        else:
+            continue
+
+        if len(ip) < 20 or ip[0] >> 4 != 4 or ip[9] != 17:
+            continue
+        if struct.unpack(">H", ip[6:8])[0] & 0x3FFF:
+            continue  # fragment
+        udp = ip[(ip[0] & 0x0F) * 4 :]
+        sport, dport, length = struct.unpack(">HHH", udp[:6])
+        if MIIO_PORT not in (sport, dport):
+            continue
+        src = (".".join(map(str, ip[12:16])), sport)
+        dst = (".".join(map(str, ip[16:20])), dport)
+        yield Packet(ts, src, dst, udp[8:length])
+
+
+# --- decoding --------------------------------------------------------------
+
+
+class Decoder:
+    """Verify and decrypt packets, learning which token belongs to which host."""
+
+    def __init__(self, tokens: Dict[str, bytes], spare: List[bytes] = ()) -> None:
+        self.tokens = dict(tokens)
+        self._spare = list(spare)  # tokens without a host, tried on every device
+        self._adapter = EncryptionAdapter(GreedyBytes)
+        self.undecodable = 0
+
+    def _token_for(self, device: str, header: bytes, body: bytes) -> Optional[bytes]:
+        candidates = [self.tokens[device]] if device in self.tokens else self._spare
+        for token in candidates:
+            if Utils.md5(header[:16] + token + body) == header[16:32]:
+                self.tokens[device] = token
+                return token
+        return None
+
+    def messages(self, packets: Iterator[Packet]) -> Iterator[Message]:
+        for packet in packets:
+            data = packet.data
+            if len(data) < 32:
+                continue
+            magic, length, _, _, stamp, _ = HEADER.unpack_from(data)
+            if magic != MAGIC:
+                continue
+            request = packet.dst[1] == MIIO_PORT
+            device = packet.dst[0] if request else packet.src[0]
+
+            if length == 32:
+                yield Message(packet.ts, device, request, True, stamp, 32, None)
+                continue
+
+            body = data[32:length]
+            token = self._token_for(device, data[:32], body)
+            if token is None:
+                self.undecodable += 1
+                continue
+            payload = self._adapter._decode(body, {"_": {"token": token}}, None)
+            if not isinstance(payload, dict):
+                self.undecodable += 1
+                continue
+            yield Message(packet.ts, device, request, False, stamp, length, payload)
+
+
+# --- pairing ---------------------------------------------------------------
+
+
+def pair(
+    messages: Iterator[Message], window: float, stats: "Report"
+) -> Iterator[Exchange]:
+    """Match replies to requests by device and id.
+
+    Requests without a reply within window seconds are yielded unanswered;
+    only the requests inside the window are kept in memory."""
+    pending = collections.OrderedDict()  # (device, id) -> Message
+    answered = collections.OrderedDict()  # (device, id) -> ts, for duplicates
+    last = {}  # device -> (key, method, params) of its latest request
+
+    def expire(now: float) -> Iterator[Exchange]:
+        while pending:
+            key, request = next(iter(pending.items()))
+            if now - request.ts < window:
+                break
+            del pending[key]
+            yield Exchange(request.device, request.payload.get("method"), request, None)
+        while answered and now - next(iter(answered.values())) >= window:
+            answered.popitem(last=False)
+
+    for message in messages:
+        stats.message(message)
+        yield from expire(message.ts)
+        if message.hello:
+            continue
+
+        key = (message.device, message.payload.get("id"))
+        if message.request:
+            device = stats.device(message.device)
+            if key in pending:
+                device.duplicate_requests += 1
+            # resending the still unanswered previous request is a retry
+            signature = (
+                message.payload.get("method"),
+                json.dumps(message.payload.get("params"), sort_keys=True),
+            )
+            previous = last.get(message.device)
+            if previous is not None and previous[0] in pending:
+                if previous[1:] == signature and previous[0] != key:
+                    device.retries += 1
+            last[message.device] = (key, *signature)
+            pending[key] = message
+            continue
+
+        request = pending.pop(key, None)
+        if request is None:
+            device = stats.device(message.device)
+            if key in answered:
+                device.duplicate_replies += 1
+            else:
+                device.orphan_replies += 1
+            continue
+        answered[key] = message.ts
+        yield Exchange(
+            message.device, request.payload.get("method"), request, message
+        )
+
+    yield from expire(float("inf"))
+
+
+# --- statistics ------------------------------------------------------------
+
+
+class _Sizes:
+    __slots__ = ("count", "answered", "request_bytes", "reply_bytes", "max_reply")
+
+    def __init__(self) -> None:
+        self.count = 0
+        self.answered = 0
+        self.request_bytes = 0
+        self.reply_bytes = 0
+        self.max_reply = 0
+
+
+class DeviceStats:
+    def __init__(self) -> None:
+        self.requests = 0
+        self.answered = 0
+        self.unanswered = 0
+        self.retries = 0
+        self.duplicate_requests = 0
+        self.duplicate_replies = 0
+        self.orphan_replies = 0
+        self.errors = collections.Counter()
+        self.rtt = Histogram()
+        self.methods = collections.defaultdict(_Sizes)
+        # least squares of device ts against capture time
+        self._n = 0
+        self._sx = self._sy = self._sxx = self._sxy = 0.0
+        self._t0 = None
+
+    def clock(self, ts: float, device_ts: int) -> None:
+        if self._t0 is None:
+            self._t0 = (ts, device_ts)
+        x = ts - self._t0[0]
+        y = device_ts - self._t0[1] - x
+        self._n += 1
+        self._sx += x
+        self._sy += y
+        self._sxx += x * x
+        self._sxy += x * y
+
+    @property
+    def drift_ppm(self) -> Optional[float]:
+        denominator = self._n * self._sxx - self._sx * self._sx
+        if self._n < 2 or not denominator:
+            return None
+        return (self._n * self._sxy - self._sx * self._sy) / denominator * 1e6
+
+    def request(self, exchange: Exchange) -> None:
+        request = exchange.request
+        self.requests += 1
+        sizes = self.methods[exchange.method]
+        sizes.count += 1
+        sizes.request_bytes += request.size
+
+        reply = exchange.reply
+        if reply is None:
+            self.unanswered += 1
+            return
+        self.answered += 1
+        self.rtt.observe(reply.ts - request.ts)
+        sizes.answered += 1
+        sizes.reply_bytes += reply.size
+        sizes.max_reply = max(sizes.max_reply, reply.size)
+        error = reply.payload.get("error")
+        if isinstance(error, dict):
+            self.errors[str(error.get("code"))] += 1
+
+    def summary(self) -> dict:
+        def rate(count):
+            return round(count / self.requests, 4) if self.requests else None
+
+        drift = self.drift_ppm
+        return {
+            "requests": self.requests,
+            "answered": self.answered,
+            "unanswered_rate": rate(self.unanswered),
+            "retry_rate": rate(self.retries),
+            "duplicate_requests": self.duplicate_requests,
+            "duplicate_replies": self.duplicate_replies,
+            "orphan_replies": self.orphan_replies,
+            "errors": dict(self.errors),
+            "rtt": self.rtt.summary(),
+            "clock_drift_ppm": None if drift is None else round(drift, 1),
+            "methods": {
+                str(method): {
+                    "count": sizes.count,
+                    "mean_request_bytes": round(sizes.request_bytes / sizes.count, 1),
+                    "mean_reply_bytes": (
+                        round(sizes.reply_bytes / sizes.answered, 1)
+                        if sizes.answered
+                        else None
+                    ),
+                    "max_reply_bytes": sizes.max_reply,
+                }
+                for method, sizes in self.methods.items()
+            },
+        }
+
+
+class Report:
+    def __init__(self) -> None:
+        self.devices = {}  # type: Dict[str, DeviceStats]
+        self.messages = 0
+        self.hellos = 0
+
+    def device(self, device: str) -> DeviceStats:
+        stats = self.devices.get(device)
+        if stats is None:
+            stats = self.devices[device] = DeviceStats()
+        return stats
+
+    def message(self, message: Message) -> None:
+        self.messages += 1
+        if message.hello:
+            self.hellos += 1
+        if not message.request:
+            self.device(message.device).clock(message.ts, message.device_ts)
+
+    def exchange(self, exchange: Exchange) -> None:
+        self.device(exchange.device).request(exchange)
+
+
+def analyze(
+    f: BinaryIO, tokens: Dict[str, bytes], window: float, spare: List[bytes] = ()
+) -> dict:
+    decoder = Decoder(tokens, spare)
+    report = Report()
+    start = time.perf_counter()
+    packets = 0
+
+    def counted(source):
+        nonlocal packets
+        for packet in source:
+            packets += 1
+            yield packet
+
+    for exchange in pair(decoder.messages(counted(read_packets(f))), window, report):
+        report.exchange(exchange)
+
+    elapsed = time.perf_counter() - start
+    return {
+        "packets": packets,
+        "messages": report.messages,
+        "hellos": report.hellos,
+        "undecodable": decoder.undecodable,
+        "packets_per_s": round(packets / elapsed, 1) if elapsed else None,
+        "devices": {
+            device: stats.summary() for device, stats in sorted(report.devices.items())
+        },
+    }
+
+
+def _parse_tokens(values: List[str]) -> Tuple[Dict[str, bytes], List[bytes]]:
+    """Split [host=]token values into tokens by host and those without one."""
+    tokens = {}
+    spare = []
+    for value in values:
+        host, _, token = value.rpartition("=")
+        if host:
+            tokens[host] = bytes.fromhex(token)
+        else:
+            spare.append(bytes.fromhex(token))
+    return tokens, spare
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("capture", help="pcap/pcapng file, - for stdin")
+    parser.add_argument(
+        "--token",
+        action="append",
+        default=[],
+        help="[host=]token, may be repeated",
+    )
+    parser.add_argument(
+        "--window", type=float, default=10, help="seconds to wait for a reply"
+    )
+    parser.add_argument("--output", help="write the report here instead of stdout")
+    args = parser.parse_args(argv)
+
+    tokens, spare = _parse_tokens(args.token)
+    if args.capture == "-":
+        report = analyze(sys.stdin.buffer, tokens, args.window, spare)
+    else:
+        with open(args.capture, "rb") as f:
+            report = analyze(f, tokens, args.window, spare)
+
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(text + "\n")
+    else:
+        print(text)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,448 @@
+"""Micro-benchmarks of the protocol and property hot paths.
+
+Every case is timed on its own; results are written as JSON with ops/s,
+per-op p50/p99 and the peak bytes allocated by one op::
+
+    python -m tools.bench --output results.json
+    python -m tools.bench --save baseline.json
+    python -m tools.bench --compare baseline.json --threshold 10
+    python -m tools.bench --replay capture.jsonl -k replay
+
+``--compare`` exits non-zero when a case got slower than the threshold (in
+percent of the baseline p50). Cases import what they time when they are
+set up, so cases whose dependencies are missing, e.g. the entity getters
+without Home Assistant, are reported as skipped and the others still run.
+Results of the reference machine are kept in ``tools/bench_baseline.json``,
+all from one run. Timings only compare on the machine they were taken on:
+elsewhere, save a baseline of your own before changing the code and compare
+against that one.
+"""
+import argparse
+import dataclasses
+import datetime
+import gc
+import importlib.util
+import json
+import os
+import platform
+import statistics
+import sys
+import time
+import tracemalloc
+from types import ModuleType, SimpleNamespace
+from typing import Callable, Dict, List, Optional
+
+PACKAGE = "custom_components.xiaomi_vacuum"
+# tools.simulator.DEFAULT_TOKEN, not imported to list cases without numpy
+TOKEN = bytes.fromhex("ff" * 16)
+DEVICE_ID = bytes.fromhex("10000001")
+# Stored with every baseline
+BASELINE_NOTE = (
+    "Timings of one run on the machine below; only comparable to runs there."
+)
+
+CASES = {}  # type: Dict[str, Callable[[], Callable[[], object]]]
+
+
+def case(name: str):
+    """Register a benchmark; the function sets it up and returns the op."""
+
+    def register(setup):
+        CASES[name] = setup
+        return setup
+
+    return register
+
+
+def _import_without_homeassistant() -> None:
+    """Let the protocol and map cases import the integration's modules
+    without Home Assistant.
+
+    Importing any of them runs the package __init__, which needs Home
+    Assistant; when it is missing the package is registered without running
+    it, and only the cases importing Home Assistant themselves are skipped."""
+    if PACKAGE in sys.modules or importlib.util.find_spec("homeassistant"):
+        return
+    package = ModuleType(PACKAGE)
+    package.__path__ = [
+        os.path.join(os.path.dirname(os.path.dirname(__file__)), *PACKAGE.split("."))
+    ]
+    sys.modules[PACKAGE] = package
+
+
+def _message_builder() -> Callable[[dict], bytes]:
+    """Return a function encrypting a payload into a message."""
+    from custom_components.xiaomi_vacuum.miio.protocol import Message
+
+    def build(payload: dict) -> bytes:
+        header = {
+            "length": 0,
+            "unknown": 0,
+            "device_id": DEVICE_ID,
+            "ts": datetime.datetime.fromtimestamp(1000, datetime.timezone.utc),
+        }
+        msg = {"data": {"value": payload}, "header": {"value": header}, "checksum": 0}
+        return Message.build(msg, token=TOKEN)
+
+    return build
+
+
+def _simulator():
+    from .simulator import SimulatedVacuum
+
+    return SimulatedVacuum(int.from_bytes(DEVICE_ID, "big"))
+
+
+def _status_reply() -> dict:
+    from .simulator import PROPERTIES
+
+    sim = _simulator()
+    params = [
+        {"did": name, "siid": siid, "piid": piid}
+        for (siid, piid), (name, _) in PROPERTIES.items()
+    ]
+    return sim.handle({"id": 1, "method": "get_properties", "params": params})
+
+
+@case("message.parse.hello")
+def _parse_hello():
+    from custom_components.xiaomi_vacuum.miio.protocol import Message
+
+    data = _simulator()._hello()
+    return lambda: Message.parse(data)
+
+
+@case("message.build.request")
+def _build_request():
+    request = {
+        "id": 1,
+        "method": "get_properties",
+        "params": [{"did": "battery", "siid": 2, "piid": 1}] * 15,
+    }
+    build = _message_builder()
+    return lambda: build(request)
+
+
+@case("message.parse.reply")
+def _parse_reply():
+    from custom_components.xiaomi_vacuum.miio.protocol import Message
+
+    data = _message_builder()(_status_reply())
+    return lambda: Message.parse(data, token=TOKEN)
+
+
+@case("utils.encrypt")
+def _encrypt():
+    from custom_components.xiaomi_vacuum.miio.protocol import Utils
+
+    plaintext = json.dumps(_status_reply()).encode() + b"\x00"
+    return lambda: Utils.encrypt(plaintext, TOKEN)
+
+
+@case("utils.decrypt")
+def _decrypt():
+    from custom_components.xiaomi_vacuum.miio.protocol import Utils
+
+    ciphertext = Utils.encrypt(json.dumps(_status_reply()).encode(), TOKEN)
+    return lambda: Utils.decrypt(ciphertext, TOKEN)
+
+
+def _adapter_case(plaintext: bytes):
+    from construct import GreedyBytes
+
+    from custom_components.xiaomi_vacuum.miio.protocol import EncryptionAdapter, Utils
+
+    adapter = EncryptionAdapter(GreedyBytes)
+    ciphertext = Utils.encrypt(plaintext, TOKEN)
+    context = {"_": {"token": TOKEN}}
+    return lambda: adapter._decode(ciphertext, context, "")
+
+
+@case("adapter.decode.clean")
+def _adapter_clean():
+    return _adapter_case(json.dumps(_status_reply()).encode() + b"\x00")
+
+
+@case("adapter.decode.otu_stat")
+def _adapter_otu_stat():
+    return _adapter_case(b'{"id":1,"result":["ok"],,"otu_stat":[1,2,3]}\x00')
+
+
+@case("adapter.decode.trailing_null")
+def _adapter_trailing_null():
+    return _adapter_case(b'{"id":1,"result":["ok"]}\x00garbage')
+
+
+def _stubbed_vacuum():
+    from custom_components.xiaomi_vacuum.miio.dreamevacuum import DreameVacuum
+
+    sim = _simulator()
+    vacuum = DreameVacuum("127.0.0.1", TOKEN.hex())
+
+    def send(command, parameters=None, retry_count=3, *, deadline=None):
+        return sim.handle({"id": 1, "method": command, "params": parameters})["result"]
+
+    vacuum.send = send
+    return vacuum
+
+
+@case("properties.dataclass.full")
+def _properties_full():
+    from custom_components.xiaomi_vacuum.miio.dreamevacuum import DreameStatus
+
+    vacuum = _stubbed_vacuum()
+    return lambda: vacuum.get_properties_for_dataclass(DreameStatus)
+
+
+@case("properties.dataclass.core")
+def _properties_core():
+    from custom_components.xiaomi_vacuum.miio.dreamevacuum import DreameStatus
+
+    vacuum = _stubbed_vacuum()
+    fields = frozenset({"status", "error", "battery"})
+    return lambda: vacuum.get_properties_for_dataclass(DreameStatus, fields)
+
+
+@case("status.diff")
+def _status_diff():
+    from custom_components.xiaomi_vacuum.miio.dreamevacuum import DreameStatus
+
+    status = _stubbed_vacuum().get_properties_for_dataclass(DreameStatus)
+    changed = dataclasses.replace(status, battery=(status.battery or 0) + 1)
+    return lambda: status.diff(changed)
+
+
+@case("status.from_tuple")
+def _status_from_tuple():
+    from custom_components.xiaomi_vacuum.miio.dreamevacuum import DreameStatus
+
+    values = _stubbed_vacuum().get_properties_for_dataclass(DreameStatus).as_tuple()
+    return lambda: DreameStatus.from_tuple(values)
+
+
+@case("map.decode.default")
+def _map_default():
+    from custom_components.xiaomi_vacuum.map_decoder import decode_map
+
+    from .simulator import default_map
+
+    payload = default_map()
+    return lambda: decode_map(payload)
+
+
+@case("map.decode.large")
+def _map_large():
+    from custom_components.xiaomi_vacuum.map_decoder import decode_map
+
+    from .simulator import generate_map
+
+    # 30 x 30 m at 25 mm per pixel with a long cleaning run
+    payload = generate_map(1200, 1200, rooms=12, path_points=20000, pixel_size=25)
+    return lambda: decode_map(payload)
+
+
+@case("map.path.parse")
+def _map_path():
+    from custom_components.xiaomi_vacuum.map_decoder import parse_path
+
+    from .simulator import sweep_path
+
+    path = sweep_path(0, 0, 5000, 5000, 1, 20000)
+    return lambda: parse_path(path)
+
+
+def _coordinator():
+    from custom_components.xiaomi_vacuum.miio.dreamevacuum import DreameStatus
+
+    status = _stubbed_vacuum().get_properties_for_dataclass(DreameStatus)
+    return SimpleNamespace(
+        data=status, last_update_success=True, last_poll_time=time.time()
+    )
+
+
+def _getters(entity, names: List[str]):
+    cls = type(entity)
+    getters = [getattr(cls, name).fget for name in names]
+
+    def op():
+        for getter in getters:
+            getter(entity)
+
+    return op
+
+
+@case("entity.vacuum")
+def _entity_vacuum():
+    from custom_components.xiaomi_vacuum.vacuum import DreameVacuumEntity
+
+    client = SimpleNamespace(ip="127.0.0.1")
+    entity = DreameVacuumEntity("Bench", _coordinator(), client, None)
+    return _getters(
+        entity, ["activity", "fan_speed", "water_level", "extra_state_attributes"]
+    )
+
+
+@case("entity.sensors")
+def _entity_sensors():
+    from custom_components.xiaomi_vacuum import sensor
+
+    coordinator = _coordinator()
+    sensors = [
+        cls("Bench", "bench", coordinator)
+        for cls in vars(sensor).values()
+        if isinstance(cls, type)
+        and issubclass(cls, sensor.DreameBaseSensor)
+        and cls is not sensor.DreameBaseSensor
+    ]
+    ops = [_getters(entity, ["native_value"]) for entity in sensors]
+
+    def op():
+        for getter in ops:
+            getter()
+
+    return op
+
+
+def add_replay_cases(path: str, scale: float) -> None:
+    """Benchmark status() against traffic recorded with tools.record."""
+
+    def vacuum():
+        from custom_components.xiaomi_vacuum.miio.dreamevacuum import DreameVacuum
+        from custom_components.xiaomi_vacuum.miio.recording import ReplayProtocol
+
+        return DreameVacuum(protocol=ReplayProtocol(path, scale))
+
+    @case("replay.status.full")
+    def _replay_full():
+        replayed = vacuum()
+        return lambda: replayed.status()
+
+    @case("replay.status.core")
+    def _replay_core():
+        replayed = vacuum()
+        fields = frozenset({"status", "error", "battery"})
+        return lambda: replayed.status(fields)
+
+
+def measure(op: Callable[[], object], duration: float, min_ops: int = 50) -> dict:
+    """Time op for about duration seconds and profile one call's allocations."""
+    for _ in range(min(min_ops, 10)):
+        op()
+
+    samples = []
+    clock = time.perf_counter_ns
+    gc.disable()
+    try:
+        start = clock()
+        stop = start + int(duration * 1e9)
+        while True:
+            t0 = clock()
+            op()
+            t1 = clock()
+            samples.append(t1 - t0)
+            if t1 >= stop and len(samples) >= min_ops:
+                break
+        elapsed = clock() - start
+    finally:
+        gc.enable()
+
+    tracemalloc.start()
+    try:
+        op()  # first traced call pays for tracemalloc's own bookkeeping
+        tracemalloc.reset_peak()
+        before, _ = tracemalloc.get_traced_memory()
+        op()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    samples.sort()
+    return {
+        "ops": len(samples),
+        "ops_per_s": round(len(samples) / (elapsed / 1e9), 1),
+        "p50_us": round(samples[len(samples) // 2] / 1000, 3),
+        "p99_us": round(samples[int(len(samples) * 0.99)] / 1000, 3),
+        "mean_us": round(statistics.fmean(samples) / 1000, 3),
+        "alloc_peak_bytes": peak - before,
+    }
+
+
+def run(names: List[str], duration: float) -> dict:
+    _import_without_homeassistant()
+    results = {}
+    for name in names:
+        try:
+            op = CASES[name]()
+        except ImportError as ex:
+            results[name] = {"skipped": str(ex)}
+            continue
+        results[name] = measure(op, duration)
+    return {
+        "python": sys.version.split()[0],
+        "platform": platform.platform(),
+        "cases": results,
+    }
+
+
+def compare(results: dict, baseline: dict, threshold: float) -> List[str]:
+    """Return the cases whose p50 regressed more than threshold percent."""
+    regressions = []
+    for name, current in results["cases"].items():
+        previous = baseline.get("cases", {}).get(name)
+        if not previous or "p50_us" not in previous or "p50_us" not in current:
+            continue
+        change = 100 * (current["p50_us"] - previous["p50_us"]) / previous["p50_us"]
+        current["p50_change_pct"] = round(change, 1)
+        if change > threshold:
+            regressions.append(name)
+    return regressions
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("-k", "--filter", default="", help="run cases containing this")
+    parser.add_argument("--duration", type=float, default=1.0, help="seconds per case")
+    parser.add_argument("--output", help="write results here instead of stdout")
+    parser.add_argument("--save", help="store the results as a baseline")
+    parser.add_argument("--compare", help="baseline to compare against")
+    parser.add_argument("--threshold", type=float, default=10.0, help="percent")
+    parser.add_argument("--list", action="store_true", help="list cases and exit")
+    parser.add_argument("--replay", help="recording to add replay cases for")
+    parser.add_argument(
+        "--replay-scale", type=float, default=0.0, help="round trip time factor"
+    )
+    args = parser.parse_args(argv)
+
+    if args.replay:
+        add_replay_cases(args.replay, args.replay_scale)
+
+    names = [name for name in CASES if args.filter in name]
+    if args.list:
+        print("\n".join(names))
+        return 0
+
+    results = run(names, args.duration)
+
+    regressions = []
+    if args.compare:
+        with open(args.compare) as f:
+            regressions = compare(results, json.load(f), args.threshold)
+        results["regressions"] = regressions
+
+    text = json.dumps(results, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(text + "\n")
+    else:
+        print(text)
+    if args.save:
+        with open(args.save, "w") as f:
+            f.write(json.dumps({"note": BASELINE_NOTE, **results}, indent=2) + "\n")
+
+    for name in regressions:
+        print("Regression: %s" % name, file=sys.stderr)
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,298 @@
+"""Drive many coordinators against simulated vacuums and report how they scale.
+
+Stands up ``--entries`` config entries in a bare Home Assistant instance, each
+with its own ``DreameVacuum`` client, ``DreameCoordinator`` and (optionally)
+``LivenessProber``, pointed at a simulator fleet running in a subprocess so
+its CPU is not billed to the integration::
+
+    python -m tools.loadtest --entries 100 --duration 60 --interval 5
+
+Entities are stood in for by coordinator listeners with the same contexts as
+the vacuum and sensor entities; each update writes their state to the state
+machine, as ``CoordinatorEntity`` does.
+
+Reported: polls/s, poll latency percentiles, failures, executor queue depth,
+event-loop lag, CPU per device and state writes/s.
+"""
+import argparse
+import asyncio
+import json
+import logging
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from types import SimpleNamespace
+from typing import List, Optional
+
+from homeassistant.core import HomeAssistant
+from homeassistant.helpers.update_coordinator import UpdateFailed
+
+from custom_components.xiaomi_vacuum import sensor
+from custom_components.xiaomi_vacuum.coordinator import DreameCoordinator
+from custom_components.xiaomi_vacuum.liveness import LivenessProber
+from custom_components.xiaomi_vacuum.miio import DreameVacuum
+from custom_components.xiaomi_vacuum.miio.miioprotocol import HELLO_BYTES
+from custom_components.xiaomi_vacuum.vacuum import VACUUM_STATUS_FIELDS
+
+from .simulator import DEFAULT_TOKEN
+
+_LOGGER = logging.getLogger(__name__)
+
+# Contexts of the entities one entry adds, as registered on the coordinator
+ENTITY_CONTEXTS = [VACUUM_STATUS_FIELDS] + [
+    cls._status_fields
+    for cls in vars(sensor).values()
+    if isinstance(cls, type)
+    and issubclass(cls, sensor.DreameBaseSensor)
+    and cls._status_fields is not None
+]
+
+LAG_INTERVAL = 0.05
+
+
+class Stats:
+    """Counters shared by all coordinators of a run."""
+
+    def __init__(self) -> None:
+        self.latencies = []  # type: List[float]
+        self.failures = 0
+        self.state_writes = 0
+        self.loop_lag = []  # type: List[float]
+        self.queue_depth = []  # type: List[int]
+
+    def reset(self) -> None:
+        self.__init__()
+
+
+class TimedCoordinator(DreameCoordinator):
+    """DreameCoordinator recording how long every poll takes."""
+
+    def __init__(self, stats: Stats, *args, **kwargs) -> None:
+        super().__init__(*args, **kwargs)
+        self._stats = stats
+
+    async def _async_update_data(self):
+        start = time.perf_counter()
+        try:
+            return await super()._async_update_data()
+        except UpdateFailed:
+            self._stats.failures += 1
+            raise
+        finally:
+            self._stats.latencies.append(time.perf_counter() - start)
+
+
+def _percentile(values: List[float], pct: float) -> Optional[float]:
+    if not values:
+        return None
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * pct / 100))]
+
+
+def _wait_for_simulator(host: str, port: int, timeout: float = 30) -> None:
+    """Block until the last simulated device answers a hello."""
+    stop = time.monotonic() + timeout
+    with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as s:
+        s.settimeout(0.5)
+        while time.monotonic() < stop:
+            s.sendto(HELLO_BYTES, (host, port))
+            try:
+                s.recvfrom(1024)
+                return
+            except OSError:
+                time.sleep(0.2)
+    raise TimeoutError("Simulator at %s:%s did not start" % (host, port))
+
+
+class LoadTest:
+    def __init__(self, args: argparse.Namespace) -> None:
+        self.args = args
+        self.stats = Stats()
+        self.executor = ThreadPoolExecutor(
+            max_workers=args.workers, thread_name_prefix="loadtest-executor"
+        )
+        self.coordinators = []  # type: List[TimedCoordinator]
+        self.probers = []  # type: List[LivenessProber]
+        self._unsubs = []
+
+    def _add_entities(self, hass: HomeAssistant, index: int, coordinator) -> None:
+        for number, context in enumerate(ENTITY_CONTEXTS):
+            entity_id = "sensor.loadtest_%s_%s" % (index, number)
+            field = sorted(context)[0]
+
+            def write_state(entity_id=entity_id, field=field) -> None:
+                self.stats.state_writes += 1
+                value = getattr(coordinator.data, field, None)
+                hass.states.async_set(entity_id, str(value))
+
+            self._unsubs.append(coordinator.async_add_listener(write_state, context))
+
+    async def _monitor_loop(self) -> None:
+        """Sample event-loop lag and executor queue depth."""
+        loop = asyncio.get_running_loop()
+        while True:
+            start = loop.time()
+            await asyncio.sleep(LAG_INTERVAL)
+            self.stats.loop_lag.append(loop.time() - start - LAG_INTERVAL)
+            self.stats.queue_depth.append(self.executor._work_queue.qsize())
+
+    async def _setup_entry(self, hass: HomeAssistant, index: int) -> None:
+        args = self.args
+        port = args.base_port + index
+        entry = SimpleNamespace(
+            entry_id="loadtest%05d" % index,
+            data={"host": args.host, "token": DEFAULT_TOKEN, "name": "Load %s" % index},
+            options={"polling_interval": args.interval},
+        )
+        client = DreameVacuum(args.host, DEFAULT_TOKEN, port=port)
+
+        prober = None
+        if args.liveness:
+            prober = LivenessProber(hass, args.host, port=port)
+            await prober.async_start()
+            self.probers.append(prober)
+
+        coordinator = TimedCoordinator(
+            self.stats,
+            hass,
+            client,
+            entry,
+            update_interval=timedelta(seconds=args.interval),
+            prober=prober,
+        )
+        await coordinator.async_refresh()
+        self._add_entities(hass, index, coordinator)
+        self.coordinators.append(coordinator)
+
+    async def run(self) -> dict:
+        args = self.args
+        loop = asyncio.get_running_loop()
+        loop.set_default_executor(self.executor)
+
+        with tempfile.TemporaryDirectory() as config_dir:
+            hass = HomeAssistant(config_dir)
+            monitor = loop.create_task(self._monitor_loop())
+            try:
+                setup_start = time.perf_counter()
+                await asyncio.gather(
+                    *(self._setup_entry(hass, i) for i in range(args.entries))
+                )
+                setup_time = time.perf_counter() - setup_start
+                _LOGGER.info("Set up %s entries in %.1fs", args.entries, setup_time)
+
+                # Measure the steady state only.
+                await asyncio.sleep(args.warmup)
+                self.stats.reset()
+                cpu_start = time.process_time()
+                wall_start = time.perf_counter()
+                await asyncio.sleep(args.duration)
+                wall = time.perf_counter() - wall_start
+                cpu = time.process_time() - cpu_start
+                stats = self.stats
+            finally:
+                monitor.cancel()
+                for unsub in self._unsubs:
+                    unsub()
+                for prober in self.probers:
+                    await prober.async_stop()
+                for coordinator in self.coordinators:
+                    await coordinator.async_shutdown()
+                await hass.async_stop(force=True)
+
+        latencies = stats.latencies
+        return {
+            "entries": args.entries,
+            "interval_s": args.interval,
+            "duration_s": round(wall, 2),
+            "setup_s": round(setup_time, 2),
+            "polls_per_s": round(len(latencies) / wall, 2),
+            "expected_polls_per_s": round(args.entries / args.interval, 2),
+            "failures": stats.failures,
+            "latency_ms": {
+                "p50": _ms(_percentile(latencies, 50)),
+                "p95": _ms(_percentile(latencies, 95)),
+                "p99": _ms(_percentile(latencies, 99)),
+                "max": _ms(max(latencies, default=None)),
+            },
+            "loop_lag_ms": {
+                "mean": _ms(statistics.fmean(stats.loop_lag) if stats.loop_lag else None),
+                "p99": _ms(_percentile(stats.loop_lag, 99)),
+                "max": _ms(max(stats.loop_lag, default=None)),
+            },
+            "executor_queue": {
+                "mean": round(statistics.fmean(stats.queue_depth), 2)
+                if stats.queue_depth
+                else None,
+                "max": max(stats.queue_depth, default=None),
+            },
+            "cpu_percent": round(100 * cpu / wall, 1),
+            "cpu_ms_per_device_s": round(1000 * cpu / wall / args.entries, 3),
+            "state_writes_per_s": round(stats.state_writes / wall, 1),
+        }
+
+
+def _ms(value: Optional[float]) -> Optional[float]:
+    return None if value is None else round(value * 1000, 2)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--entries", type=int, default=10)
+    parser.add_argument("--duration", type=float, default=30, help="seconds")
+    parser.add_argument("--warmup", type=float, default=5, help="seconds")
+    parser.add_argument("--interval", type=float, default=5, help="polling interval")
+    parser.add_argument("--workers", type=int, default=64, help="executor threads")
+    parser.add_argument("--liveness", action="store_true", help="run hello probers")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--base-port", type=int, default=40000)
+    parser.add_argument("--latency", type=float, default=5, help="simulator ms")
+    parser.add_argument("--jitter", type=float, default=5, help="simulator ms")
+    parser.add_argument(
+        "--no-simulator",
+        action="store_true",
+        help="use devices already listening on the base port",
+    )
+    parser.add_argument("--output", help="write the report here instead of stdout")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO)
+    logging.getLogger("custom_components.xiaomi_vacuum").setLevel(logging.WARNING)
+
+    simulator = None
+    if not args.no_simulator:
+        simulator = subprocess.Popen(
+            [
+                sys.executable,
+                "-m",
+                "tools.simulator",
+                "--count=%d" % args.entries,
+                "--host=%s" % args.host,
+                "--base-port=%d" % args.base_port,
+                "--latency=%s" % args.latency,
+                "--jitter=%s" % args.jitter,
+            ]
+        )
+    try:
+        _wait_for_simulator(args.host, args.base_port + args.entries - 1)
+        report = asyncio.run(LoadTest(args).run())
+    finally:
+        if simulator is not None:
+            simulator.terminate()
+            simulator.wait()
+
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(text + "\n")
+    else:
+        print(text)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,274 @@
+"""UDP proxy that impairs miIO traffic like a poor Wi-Fi link.
+
+Sits between a client and a (simulated) device and applies, per direction,
+packet loss, latency with jitter, reordering, duplication, truncation and
+checksum corruption::
+
+    python -m tools.netem --listen-port 50000 --target-port 40000 --loss 0.1
+
+From synchronous code::
+
+    impairment = Impairment(loss=0.1, latency=0.05, jitter=0.02, seed=1)
+    with NetemProxy(("127.0.0.1", 40000), impairment).running() as proxy:
+        DreameVacuum(proxy.address[0], token, port=proxy.address[1]).status()
+"""
+import argparse
+import asyncio
+import contextlib
+import logging
+import random
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Tuple
+
+from custom_components.xiaomi_vacuum.miio.miioprotocol import RECV_BUFFER
+
+from ._loop import BackgroundLoop
+
+_LOGGER = logging.getLogger(__name__)
+
+# miIO header: magic, length, unknown, device id, stamp, then the md5 checksum
+CHECKSUM_OFFSET = 16
+HEADER_LENGTH = 32
+# MiIOProtocol reads replies with recvfrom(RECV_BUFFER)
+RECV_LIMIT = RECV_BUFFER
+
+
+@dataclass
+class Impairment:
+    """What happens to packets travelling in one direction.
+
+    Probabilities are per packet, times in seconds."""
+
+    loss: float = 0.0
+    latency: float = 0.0
+    jitter: float = 0.0
+    reorder: float = 0.0
+    reorder_delay: float = 0.05
+    duplicate: float = 0.0
+    truncate: Optional[int] = None
+    corrupt: float = 0.0
+    seed: Optional[int] = None
+
+
+@dataclass
+class LinkStats:
+    """Counters of one direction."""
+
+    packets: int = 0
+    dropped: int = 0
+    reordered: int = 0
+    duplicated: int = 0
+    truncated: int = 0
+    corrupted: int = 0
+
+
+@dataclass
+class _Link:
+    impairment: Impairment
+    stats: LinkStats = field(default_factory=LinkStats)
+    rng: random.Random = None
+
+    def __post_init__(self):
+        if self.rng is None:
+            self.rng = random.Random(self.impairment.seed)
+
+    def schedule(self, loop, data: bytes, send) -> None:
+        """Apply the impairment and hand the packet(s) to send."""
+        imp, stats, rng = self.impairment, self.stats, self.rng
+        stats.packets += 1
+
+        if imp.loss and rng.random() < imp.loss:
+            stats.dropped += 1
+            return
+
+        if imp.corrupt and len(data) > HEADER_LENGTH and rng.random() < imp.corrupt:
+            index = CHECKSUM_OFFSET + rng.randrange(16)
+            data = data[:index] + bytes([data[index] ^ 0xFF]) + data[index + 1 :]
+            stats.corrupted += 1
+
+        if imp.truncate is not None and len(data) > imp.truncate:
+            data = data[: imp.truncate]
+            stats.truncated += 1
+
+        copies = 1
+        if imp.duplicate and rng.random() < imp.duplicate:
+            copies = 2
+            stats.duplicated += 1
+
+        for _ in range(copies):
+            delay = imp.latency
+            if imp.jitter:
+                delay += rng.uniform(0, imp.jitter)
+            if imp.reorder and rng.random() < imp.reorder:
+                delay += imp.reorder_delay
+                stats.reordered += 1
+            if delay > 0:
+                loop.call_later(delay, send, data)
+            else:
+                send(data)
+
+
+class _Upstream(asyncio.DatagramProtocol):
+    """Socket towards the target for one client address."""
+
+    def __init__(self, proxy: "NetemProxy", client) -> None:
+        self._proxy = proxy
+        self._client = client
+        self.transport = None
+
+    def connection_made(self, transport) -> None:
+        self.transport = transport
+
+    def datagram_received(self, data: bytes, addr) -> None:
+        self._proxy._from_target(data, self._client)
+
+
+class NetemProxy(asyncio.DatagramProtocol):
+    """Forward datagrams between clients and target through impaired links."""
+
+    def __init__(
+        self,
+        target: Tuple[str, int],
+        uplink: Optional[Impairment] = None,
+        downlink: Optional[Impairment] = None,
+        *,
+        listen: Tuple[str, int] = ("127.0.0.1", 0),
+    ) -> None:
+        """uplink applies to client->target packets, downlink to the replies.
+
+        A downlink is the same as the uplink unless given separately."""
+        uplink = uplink or Impairment()
+        if downlink is None:
+            downlink = Impairment(**{**uplink.__dict__})
+            if uplink.seed is not None:
+                downlink.seed = uplink.seed + 1
+        self.target = target
+        self.listen = listen
+        self.uplink = _Link(uplink)
+        self.downlink = _Link(downlink)
+        self.address = None  # type: Optional[Tuple[str, int]]
+
+        self._loop = None
+        self._transport = None
+        self._upstreams = {}  # type: Dict[Tuple[str, int], asyncio.Future]
+
+    @property
+    def stats(self) -> Dict[str, LinkStats]:
+        return {"uplink": self.uplink.stats, "downlink": self.downlink.stats}
+
+    async def start(self) -> None:
+        self._loop = asyncio.get_running_loop()
+        self._transport, _ = await self._loop.create_datagram_endpoint(
+            lambda: self, local_addr=self.listen
+        )
+        self.address = self._transport.get_extra_info("sockname")[:2]
+        _LOGGER.info("Impairing %s -> %s:%s", self.address, *self.target)
+
+    async def stop(self) -> None:
+        for upstream in self._upstreams.values():
+            if upstream.done() and not upstream.exception():
+                upstream.result()[0].close()
+            else:
+                upstream.cancel()
+        self._upstreams.clear()
+        if self._transport is not None:
+            self._transport.close()
+            self._transport = None
+
+    def datagram_received(self, data: bytes, addr) -> None:
+        self.uplink.schedule(self._loop, data, lambda d: self._to_target(d, addr))
+
+    def _to_target(self, data: bytes, client) -> None:
+        upstream = self._upstreams.get(client)
+        if upstream is None:
+            upstream = self._loop.create_task(
+                self._loop.create_datagram_endpoint(
+                    lambda: _Upstream(self, client), remote_addr=self.target
+                )
+            )
+            self._upstreams[client] = upstream
+
+        def send(task):
+            if not task.cancelled() and task.exception() is None:
+                transport, _ = task.result()
+                transport.sendto(data)
+
+        upstream.add_done_callback(send)
+
+    def _from_target(self, data: bytes, client) -> None:
+        if self._transport is None:
+            return
+        self.downlink.schedule(
+            self._loop, data, lambda d: self._transport.sendto(d, client)
+        )
+
+    @contextlib.contextmanager
+    def running(self):
+        """Run the proxy on a background thread for the duration of the block."""
+        background = BackgroundLoop().start()
+        try:
+            background.run(self.start())
+            yield self
+        finally:
+            background.run(self.stop())
+            background.stop()
+
+
+def _impairment_args(parser: argparse.ArgumentParser) -> None:
+    parser.add_argument("--loss", type=float, default=0)
+    parser.add_argument("--latency", type=float, default=0, help="ms")
+    parser.add_argument("--jitter", type=float, default=0, help="ms")
+    parser.add_argument("--reorder", type=float, default=0)
+    parser.add_argument("--reorder-delay", type=float, default=50, help="ms")
+    parser.add_argument("--duplicate", type=float, default=0)
+    parser.add_argument(
+        "--truncate", type=int, default=None, help="bytes, e.g. %d" % RECV_LIMIT
+    )
+    parser.add_argument("--corrupt", type=float, default=0)
+    parser.add_argument("--seed", type=int, default=None)
+
+
+def impairment_from_args(args: argparse.Namespace) -> Impairment:
+    return Impairment(
+        loss=args.loss,
+        latency=args.latency / 1000,
+        jitter=args.jitter / 1000,
+        reorder=args.reorder,
+        reorder_delay=args.reorder_delay / 1000,
+        duplicate=args.duplicate,
+        truncate=args.truncate,
+        corrupt=args.corrupt,
+        seed=args.seed,
+    )
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--listen-host", default="127.0.0.1")
+    parser.add_argument("--listen-port", type=int, default=50000)
+    parser.add_argument("--target-host", default="127.0.0.1")
+    parser.add_argument("--target-port", type=int, default=54321)
+    _impairment_args(parser)
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO)
+    proxy = NetemProxy(
+        (args.target_host, args.target_port),
+        impairment_from_args(args),
+        listen=(args.listen_host, args.listen_port),
+    )
+
+    async def run() -> None:
+        await proxy.start()
+        try:
+            await asyncio.Event().wait()
+        finally:
+            await proxy.stop()
+            _LOGGER.info("%s", proxy.stats)
+
+    with contextlib.suppress(KeyboardInterrupt):
+        asyncio.run(run())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,59 @@
+"""Record the traffic of a real vacuum for replay benchmarks.
+
+Polls ``miIO.info`` once and the full status every ``--interval`` seconds,
+appending every request/reply pair to a recording::
+
+    python -m tools.record --host 192.168.1.50 --token <token> --duration 600 \
+        --output capture.jsonl
+
+Replay it with ``ReplayProtocol`` or ``python -m tools.bench --replay``.
+"""
+import argparse
+import logging
+import time
+from typing import List, Optional
+
+from custom_components.xiaomi_vacuum.miio import DreameVacuum, DeviceException
+
+_LOGGER = logging.getLogger(__name__)
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--host", required=True)
+    parser.add_argument("--token", required=True)
+    parser.add_argument("--port", type=int, default=54321)
+    parser.add_argument("--interval", type=float, default=15, help="seconds")
+    parser.add_argument("--duration", type=float, default=300, help="seconds")
+    parser.add_argument("--output", default="capture.jsonl")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO)
+    vacuum = DreameVacuum(args.host, args.token, port=args.port)
+
+    info = vacuum.info()
+    vacuum.start_recording(args.output, info.model)
+    # Record the info reply as well
+    vacuum.info()
+
+    stop = time.monotonic() + args.duration
+    polls = 0
+    try:
+        while time.monotonic() < stop:
+            started = time.monotonic()
+            try:
+                vacuum.status()
+                polls += 1
+            except DeviceException as ex:
+                _LOGGER.warning("Poll failed: %s", ex)
+            time.sleep(max(0.0, args.interval - (time.monotonic() - started)))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        vacuum.stop_recording()
+
+    _LOGGER.info("Recorded %s polls to %s", polls, args.output)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,613 @@
+"""Simulated dreame.vacuum.mc1808 devices speaking miIO over UDP.
+
+Each simulated vacuum owns a UDP socket and answers the hello/handshake,
+``miIO.info``, ``get_properties``, ``set_properties`` and ``action`` using the
+same :data:`Message` structure as the integration, for every siid/piid of
+:class:`DreameStatus`. A whole fleet runs on one event loop, one loopback
+port per device::
+
+    python -m tools.simulator --count 1000 --base-port 40000 --latency 20
+
+Point a client at it with ``DreameVacuum("127.0.0.1", DEFAULT_TOKEN, port=40000)``.
+From synchronous code (pytest fixtures, benchmarks) use::
+
+    with SimulatorFleet(count=10).running() as fleet:
+        ...
+"""
+import argparse
+import asyncio
+import base64
+import contextlib
+import dataclasses
+import datetime
+import functools
+import json
+import logging
+import random
+import struct
+import time
+import zlib
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from custom_components.xiaomi_vacuum.map_decoder import HEADER, PIXEL_FLOOR, PIXEL_WALL
+from custom_components.xiaomi_vacuum.miio.dreamevacuum import DreameStatus
+from custom_components.xiaomi_vacuum.miio.protocol import Message
+
+from ._loop import BackgroundLoop
+
+_LOGGER = logging.getLogger(__name__)
+
+DEFAULT_TOKEN = "ffffffffffffffffffffffffffffffff"
+MODEL = "dreame.vacuum.mc1808"
+
+# miIO / MIoT error codes
+PROPERTY_NOT_FOUND = -4003
+PROPERTY_NOT_WRITABLE = -4004
+METHOD_NOT_FOUND = -32601
+
+# DreameStatus field -> initial value of a docked, charging robot
+INITIAL_VALUES = {
+    "battery": 80,
+    "state": 1,
+    "error": 0,
+    "status": 6,
+    "brush_left_time": 250,
+    "brush_life_level": 83,
+    "filter_life_level": 70,
+    "filter_left_time": 105,
+    "brush_left_time2": 150,
+    "brush_life_level2": 75,
+    "operating_mode": 0,
+    "area": 0,
+    "timer": 0,
+    "fan_speed": 1,
+    "last_clean": 0,
+    "total_clean_count": 42,
+    "total_area": 1234,
+    "total_log_start": 1600000000,
+    "clean_success": 1,
+    "water_level": 2,
+    "life_sieve": "9000-9000",
+    "life_brush_side": "9000-9000",
+    "life_brush_main": "18000-18000",
+    "map_view": "",
+    "audio_volume": 80,
+    "audio_language": "EN",
+    "timezone": "Europe/Rome",
+}
+
+# Rated consumable lifetimes in hours: (left time field, level field, hours)
+CONSUMABLES = (
+    ("brush_left_time", "brush_life_level", 300),
+    ("brush_left_time2", "brush_life_level2", 200),
+    ("filter_left_time", "filter_life_level", 150),
+)
+
+# Vacuum status / charge state values, see miio/dreamevacuum.py
+SWEEPING, IDLE, PAUSED, ERROR, GO_CHARGING, CHARGING = 1, 2, 3, 4, 5, 6
+CHARGE_CHARGING, CHARGE_NOT_CHARGING, CHARGE_GO_CHARGING = 1, 2, 5
+
+
+# Simulated floor plan: pixels and millimetres per pixel
+MAP_WIDTH = 160
+MAP_HEIGHT = 100
+MAP_PIXEL_SIZE = 50
+
+
+def encode_map(
+    pixels: np.ndarray,
+    *,
+    map_id: int = 1,
+    frame_id: int = 1,
+    frame_type: bytes = b"I",
+    robot: Tuple[int, int, int] = (0, 0, 0),
+    charger: Tuple[int, int, int] = (0, 0, 0),
+    pixel_size: int = MAP_PIXEL_SIZE,
+    left: int = 0,
+    top: int = 0,
+    extra: Optional[dict] = None,
+) -> str:
+    """Encode a map_view value the way the firmware does."""
+    height, width = pixels.shape
+    raw = HEADER.pack(
+        map_id,
+        frame_id,
+        frame_type,
+        *robot,
+        *charger,
+        pixel_size,
+        width,
+        height,
+        left,
+        top,
+    ) + pixels.astype(np.uint8).tobytes()
+    if extra:
+        raw += json.dumps(extra, separators=(",", ":")).encode()
+    encoded = base64.b64encode(zlib.compress(raw, 9)).decode()
+    return encoded.replace("+", "-").replace("/", "_")
+
+
+def sweep_path(x0: int, y0: int, x1: int, y1: int, spacing: int, points: int) -> str:
+    """Return a ``tr`` path zig-zagging over a rectangle, in millimetres."""
+    rows = max(1, (y1 - y0) // spacing)
+    ys = y0 + spacing * np.arange(rows + 1).repeat(2)
+    xs = np.tile([x0, x1, x1, x0], rows // 2 + 1)[: len(ys)]
+    corners = np.stack((xs, ys), axis=1)[:points]
+    deltas = np.diff(corners, axis=0)
+    start = "M%d,%d" % tuple(corners[0])
+    return start + "".join("L%d,%d" % (dx, dy) for dx, dy in deltas)
+
+
+def generate_map(
+    width: int = MAP_WIDTH,
+    height: int = MAP_HEIGHT,
+    rooms: int = 4,
+    path_points: int = 0,
+    pixel_size: int = MAP_PIXEL_SIZE,
+    path_spacing: Optional[int] = None,
+) -> str:
+    """Return a map_view value: rooms side by side with doors between them,
+    the charger in the first room and an optional cleaned path in it.
+
+    Without ``path_spacing`` the path covers the first room whatever its
+    length; with it, a longer path extends a shorter one."""
+    pixels = np.zeros((height, width), dtype=np.uint8)
+    bounds = np.linspace(1, width - 1, rooms + 1).astype(int)
+    for room, (start, end) in enumerate(zip(bounds[:-1], bounds[1:]), 1):
+        pixels[1 : height - 1, start:end] = (room << 2) | PIXEL_FLOOR
+    pixels[:, bounds] = PIXEL_WALL
+    pixels[[0, height - 1], :] = PIXEL_WALL
+    door = slice(height // 2 - 3, height // 2 + 3)
+    pixels[door, bounds[1:-1]] = PIXEL_FLOOR
+
+    # origin so that the map is centred on 0, 0 (the firmware's dock origin)
+    left = -width * pixel_size // 2
+    top = -height * pixel_size // 2
+    charger = (left + 4 * pixel_size, 0, 0)
+    extra = {}
+    if path_points:
+        x0, y0 = left + 3 * pixel_size, top + 3 * pixel_size
+        x1 = left + (bounds[1] - 2) * pixel_size
+        y1 = top + (height - 3) * pixel_size
+        spacing = path_spacing or max(1, 2 * (y1 - y0) // path_points)
+        extra["tr"] = sweep_path(x0, y0, x1, y1, spacing, path_points)
+    return encode_map(
+        pixels,
+        charger=charger,
+        robot=charger,
+        pixel_size=pixel_size,
+        left=left,
+        top=top,
+        extra=extra,
+    )
+
+
+@functools.lru_cache(maxsize=1)
+def default_map() -> str:
+    """The map every simulated vacuum starts with, encoded once."""
+    return generate_map()
+
+
+def _property_table() -> Dict[Tuple[int, int], Tuple[str, bool]]:
+    """Map (siid, piid) to (field name, writable) for every DreameStatus field."""
+    table = {}
+    for f in dataclasses.fields(DreameStatus):
+        if "piid" not in f.metadata:
+            continue
+        writable = "write" in f.metadata.get("access", [])
+        table[(f.metadata["siid"], f.metadata["piid"])] = (f.name, writable)
+    return table
+
+
+PROPERTIES = _property_table()
+
+
+class VacuumState:
+    """State machine of one simulated vacuum.
+
+    Cleaning drains the battery and grows ``area``/``timer`` while the
+    consumables wear down; a low battery sends the robot back to the dock,
+    where it charges."""
+
+    # per second of simulated time
+    DRAIN = 1 / 60
+    CHARGE = 1 / 30
+    AREA = 0.5 / 60
+    RETURN_TIME = 30
+    PATH_POINTS = 0.2  # path corners, the path is redrawn when one is added
+    PATH_SPACING = 4 * MAP_PIXEL_SIZE
+
+    def __init__(self) -> None:
+        self.values = dict(INITIAL_VALUES)
+        self.values["map_view"] = default_map()
+        self._battery = float(self.values["battery"])
+        self._area = 0.0
+        self._seconds = 0.0
+        self._returning = 0.0
+        self._path_points = 0
+        self._wear = {left: float(self.values[left]) for left, _, _ in CONSUMABLES}
+
+    def tick(self, dt: float) -> None:
+        """Advance the simulation by dt seconds."""
+        status = self.values["status"]
+        if status == SWEEPING:
+            self._battery = max(0.0, self._battery - self.DRAIN * dt)
+            self._area += self.AREA * dt
+            self._seconds += dt
+            for left, level, hours in CONSUMABLES:
+                self._wear[left] = max(0.0, self._wear[left] - dt / 3600)
+                self.values[left] = int(self._wear[left])
+                self.values[level] = int(100 * self._wear[left] / hours)
+            self.values["area"] = int(self._area)
+            self.values["timer"] = int(self._seconds // 60)
+            self._grow_path()
+            if self._battery < 15:
+                self._go_charging()
+        elif status == GO_CHARGING:
+            self._battery = max(0.0, self._battery - self.DRAIN * dt)
+            self._returning += dt
+            if self._returning >= self.RETURN_TIME:
+                self.values["status"] = CHARGING
+                self.values["state"] = CHARGE_CHARGING
+        elif status == CHARGING:
+            self._battery = min(100.0, self._battery + self.CHARGE * dt)
+
+        self.values["battery"] = int(self._battery)
+
+    def _grow_path(self) -> None:
+        points = 2 + int(self._seconds * self.PATH_POINTS)
+        if points != self._path_points:
+            self._path_points = points
+            self.values["map_view"] = generate_map(
+                path_points=points, path_spacing=self.PATH_SPACING
+            )
+
+    def start(self, mode: int = 2) -> None:
+        if self.values["status"] != PAUSED:
+            self._area = 0.0
+            self._seconds = 0.0
+            self._path_points = 0
+            self.values["area"] = 0
+            self.values["timer"] = 0
+        self.values["status"] = SWEEPING
+        self.values["state"] = CHARGE_NOT_CHARGING
+        self.values["operating_mode"] = mode
+
+    def stop(self) -> None:
+        if self.values["status"] == SWEEPING:
+            self._finish_clean()
+        if self.values["status"] != CHARGING:
+            self.values["status"] = IDLE
+
+    def _go_charging(self) -> None:
+        if self.values["status"] == SWEEPING:
+            self._finish_clean()
+        self._returning = 0.0
+        self.values["status"] = GO_CHARGING
+        self.values["state"] = CHARGE_GO_CHARGING
+
+    def _finish_clean(self) -> None:
+        self.values["total_clean_count"] += 1
+        self.values["total_area"] += int(self._area)
+        self.values["last_clean"] = int(self._seconds // 60)
+        self.values["clean_success"] = 1
+
+    def _reset_consumable(self, left: str) -> None:
+        for name, level, hours in CONSUMABLES:
+            if name == left:
+                self._wear[name] = float(hours)
+                self.values[name] = hours
+                self.values[level] = 100
+
+    def action(self, siid: int, aiid: int, params: List[dict]) -> bool:
+        """Run an action, return False if it is unknown."""
+        inputs = {p.get("piid"): p.get("value") for p in params or []}
+        if (siid, aiid) in ((3, 1), (18, 1)):
+            self.start(inputs.get(1, 2))
+        elif (siid, aiid) in ((3, 2), (18, 2)):
+            self.stop()
+        elif (siid, aiid) == (2, 1):
+            self._go_charging()
+        elif (siid, aiid) == (26, 1):
+            self._reset_consumable("brush_left_time")
+        elif (siid, aiid) == (27, 1):
+            self._reset_consumable("filter_left_time")
+        elif (siid, aiid) == (28, 1):
+            self._reset_consumable("brush_left_time2")
+        elif (siid, aiid) in ((17, 1), (21, 1), (21, 2), (21, 3), (23, 1)):
+            pass  # locate, remote control and map request have no state here
+        elif (siid, aiid) in ((24, 2), (24, 3)):
+            pass
+        else:
+            return False
+        return True
+
+
+class SimulatedVacuum(asyncio.DatagramProtocol):
+    """One simulated vacuum bound to its own UDP port."""
+
+    def __init__(
+        self,
+        device_id: int,
+        token: str = DEFAULT_TOKEN,
+        *,
+        latency: float = 0.0,
+        jitter: float = 0.0,
+        rng: Optional[random.Random] = None,
+    ) -> None:
+        self.device_id = device_id.to_bytes(4, "big")
+        self.token = bytes.fromhex(token)
+        self.latency = latency
+        self.jitter = jitter
+        self.state = VacuumState()
+        self.requests = 0
+        self.address = None  # type: Optional[Tuple[str, int]]
+
+        self._rng = rng or random.Random(device_id)
+        self._boot = time.monotonic() - self._rng.randint(1000, 100000)
+        self._transport = None  # type: Optional[asyncio.DatagramTransport]
+
+    @property
+    def uptime(self) -> int:
+        return int(time.monotonic() - self._boot)
+
+    def connection_made(self, transport) -> None:
+        self._transport = transport
+        self.address = transport.get_extra_info("sockname")
+
+    def datagram_received(self, data: bytes, addr) -> None:
+        self.requests += 1
+        if len(data) == 32:
+            reply = self._hello()
+        else:
+            try:
+                request = Message.parse(data, token=self.token).data.value
+            except Exception as ex:  # noqa: BLE001 - a real device stays silent
+                _LOGGER.debug("Dropping undecodable packet from %s: %s", addr, ex)
+                return
+            if not isinstance(request, dict):
+                return
+            reply = self._build(self.handle(request))
+
+        delay = self.latency
+        if self.jitter:
+            delay += self._rng.uniform(0, self.jitter)
+        if delay > 0:
+            asyncio.get_running_loop().call_later(
+                delay, self._transport.sendto, reply, addr
+            )
+        else:
+            self._transport.sendto(reply, addr)
+
+    def _hello(self) -> bytes:
+        header = struct.pack(">HHI4sI", 0x2131, 32, 0, self.device_id, self.uptime)
+        return header + b"\xff" * 16
+
+    def _build(self, reply: dict) -> bytes:
+        header = {
+            "length": 0,
+            "unknown": 0,
+            "device_id": self.device_id,
+            "ts": datetime.datetime.fromtimestamp(self.uptime, datetime.timezone.utc),
+        }
+        msg = {"data": {"value": reply}, "header": {"value": header}, "checksum": 0}
+        return Message.build(msg, token=self.token)
+
+    def handle(self, request: dict) -> dict:
+        """Return the reply to a decoded request."""
+        method = request.get("method")
+        params = request.get("params")
+        handler = {
+            "miIO.info": self._info,
+            "get_properties": self._get_properties,
+            "set_properties": self._set_properties,
+            "action": self._action,
+        }.get(method)
+
+        if handler is None:
+            error = {"code": METHOD_NOT_FOUND, "message": "Method not found."}
+            return {"id": request.get("id"), "error": error}
+        return {"id": request.get("id"), "result": handler(params)}
+
+    def _info(self, params) -> dict:
+        host, port = self.address or ("127.0.0.1", 54321)
+        mac = ":".join("%02X" % b for b in b"\x04\xcf" + self.device_id)
+        return {
+            "life": self.uptime,
+            "model": MODEL,
+            "token": self.token.hex(),
+            "ipflag": 1,
+            "fw_ver": "3.5.8_2044",
+            "mcu_fw_ver": "2044",
+            "miio_ver": "0.0.9",
+            "hw_ver": "Linux",
+            "mac": mac,
+            "wifi_fw_ver": "simulator",
+            "ap": {"ssid": "simulator", "bssid": "00:00:00:00:00:00", "rssi": -50},
+            "netif": {"localIp": host, "mask": "255.0.0.0", "gw": host},
+            "port": port,
+        }
+
+    def _get_properties(self, params) -> List[dict]:
+        result = []
+        for prop in params or []:
+            entry = PROPERTIES.get((prop.get("siid"), prop.get("piid")))
+            reply = dict(prop)
+            if entry is None:
+                reply["code"] = PROPERTY_NOT_FOUND
+            else:
+                reply["code"] = 0
+                reply["value"] = self.state.values[entry[0]]
+            result.append(reply)
+        return result
+
+    def _set_properties(self, params) -> List[dict]:
+        result = []
+        for prop in params or []:
+            entry = PROPERTIES.get((prop.get("siid"), prop.get("piid")))
+            reply = {k: v for k, v in prop.items() if k != "value"}
+            if entry is None:
+                reply["code"] = PROPERTY_NOT_FOUND
+            elif not entry[1]:
+                reply["code"] = PROPERTY_NOT_WRITABLE
+            else:
+                self.state.values[entry[0]] = prop.get("value")
+                reply["code"] = 0
+            result.append(reply)
+        return result
+
+    def _action(self, params) -> dict:
+        params = params or {}
+        ok = self.state.action(params.get("siid"), params.get("aiid"), params.get("in"))
+        return {
+            "did": params.get("did"),
+            "siid": params.get("siid"),
+            "aiid": params.get("aiid"),
+            "code": 0 if ok else PROPERTY_NOT_FOUND,
+            "out": [],
+        }
+
+
+class SimulatorFleet:
+    """Many simulated vacuums on consecutive ports of one host."""
+
+    def __init__(
+        self,
+        count: int = 1,
+        *,
+        host: str = "127.0.0.1",
+        base_port: int = 40000,
+        token: str = DEFAULT_TOKEN,
+        latency: float = 0.0,
+        jitter: float = 0.0,
+        speed: float = 1.0,
+        tick: float = 1.0,
+        seed: int = 0,
+    ) -> None:
+        self.host = host
+        self.base_port = base_port
+        self.token = token
+        self.speed = speed
+        self.tick_interval = tick
+
+        rng = random.Random(seed)
+        self.devices = [
+            SimulatedVacuum(
+                0x10000000 + index,
+                token,
+                latency=latency,
+                jitter=jitter,
+                rng=random.Random(rng.random()),
+            )
+            for index in range(count)
+        ]
+        self._transports = []  # type: List[asyncio.DatagramTransport]
+        self._ticker = None  # type: Optional[asyncio.Task]
+
+    @property
+    def addresses(self) -> List[Tuple[str, int]]:
+        """(host, port) of every device, in order."""
+        return [(self.host, self.base_port + i) for i in range(len(self.devices))]
+
+    async def start(self) -> None:
+        loop = asyncio.get_running_loop()
+        for device, address in zip(self.devices, self.addresses):
+            transport, _ = await loop.create_datagram_endpoint(
+                lambda device=device: device, local_addr=address
+            )
+            self._transports.append(transport)
+        self._ticker = loop.create_task(self._tick_loop())
+        _LOGGER.info(
+            "Simulating %s vacuums on %s:%s-%s",
+            len(self.devices),
+            self.host,
+            self.base_port,
+            self.base_port + len(self.devices) - 1,
+        )
+
+    async def stop(self) -> None:
+        if self._ticker is not None:
+            self._ticker.cancel()
+            with contextlib.suppress(asyncio.CancelledError):
+                await self._ticker
+            self._ticker = None
+        for transport in self._transports:
+            transport.close()
+        self._transports.clear()
+
+    async def _tick_loop(self) -> None:
+        last = time.monotonic()
+        while True:
+            await asyncio.sleep(self.tick_interval)
+            now = time.monotonic()
+            dt = (now - last) * self.speed
+            last = now
+            for device in self.devices:
+                device.state.tick(dt)
+
+    @contextlib.contextmanager
+    def running(self):
+        """Run the fleet on a background thread for the duration of the block."""
+        background = BackgroundLoop().start()
+        try:
+            background.run(self.start())
+            yield self
+        finally:
+            background.run(self.stop())
+            background.stop()
+
+
+def _raise_fd_limit(wanted: int) -> None:
+    """Allow one socket per simulated device where the platform permits."""
+    try:
+        import resource
+    except ImportError:
+        return
+    soft, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+    if soft < wanted:
+        target = wanted if hard == resource.RLIM_INFINITY else min(wanted, hard)
+        resource.setrlimit(resource.RLIMIT_NOFILE, (target, hard))
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--count", type=int, default=1)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--base-port", type=int, default=54321)
+    parser.add_argument("--token", default=DEFAULT_TOKEN)
+    parser.add_argument("--latency", type=float, default=0, help="reply delay, ms")
+    parser.add_argument("--jitter", type=float, default=0, help="extra random delay, ms")
+    parser.add_argument("--speed", type=float, default=1, help="simulated time scale")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("-v", "--verbose", action="store_true")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.DEBUG if args.verbose else logging.INFO)
+    _raise_fd_limit(args.count + 64)
+
+    fleet = SimulatorFleet(
+        args.count,
+        host=args.host,
+        base_port=args.base_port,
+        token=args.token,
+        latency=args.latency / 1000,
+        jitter=args.jitter / 1000,
+        speed=args.speed,
+        seed=args.seed,
+    )
+
+    async def run() -> None:
+        await fleet.start()
+        try:
+            await asyncio.Event().wait()
+        finally:
+            await fleet.stop()
+
+    with contextlib.suppress(KeyboardInterrupt):
+        asyncio.run(run())
+
+
+if __name__ == "__main__":
+    main()